@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""Benchmark API latency, CPU and bytes per request for the large data endpoints.
+
+Seeds a synthetic plant, builds the FastAPI app in-process from ``config.yaml`` and
+issues sequential requests through ``httpx.ASGITransport`` against ``/measurements``,
+``/measurements/bulk``, ``/export/snapshot`` and ``/export/registermaps``, once with
+``Accept-Encoding: gzip`` and once with ``identity``. Reports p50/p95 latency, CPU
+milliseconds per request and response bytes as JSON. Save a run with ``--output`` and
+pass it to ``--compare`` on a later version to see deltas.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import httpx  # noqa: E402
+
+from ems import __version__  # noqa: E402
+from ems.api.app import APIContext, create_app  # noqa: E402
+from ems.core.health import HealthRegistry  # noqa: E402
+from ems.export.service import ExportService  # noqa: E402
+from ems.store.database import Database  # noqa: E402
+from ems.utils.config import load_config  # noqa: E402
+from ems.utils.models import Measurement  # noqa: E402
+
+ENCODINGS = ("gzip", "identity")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--metrics", type=int, default=20, help="metrics per device")
+    parser.add_argument("--minutes", type=int, default=60, help="minutes of seeded history")
+    parser.add_argument("--requests", type=int, default=50, help="requests per endpoint")
+    parser.add_argument("--no-compression", action="store_true")
+    parser.add_argument("--output", type=Path, help="write the result JSON here")
+    parser.add_argument("--compare", type=Path, help="earlier result JSON to diff against")
+    return parser.parse_args()
+
+
+async def _seed(db: Database, args: argparse.Namespace, end: datetime) -> int:
+    rng = random.Random(42)
+    rows = 0
+    for minute in range(args.minutes):
+        ts = end - timedelta(minutes=args.minutes - minute)
+        batch = [
+            Measurement(
+                timestamp_utc=ts,
+                plant_id="bench",
+                device_id=f"dev-{device}",
+                metric=f"M{metric}",
+                value=round(rng.random() * 1000, 3),
+                unit="kW",
+                source="bench",
+            )
+            for device in range(args.devices)
+            for metric in range(args.metrics)
+        ]
+        await db.write_measurements(batch)
+        rows += len(batch)
+    return rows
+
+
+async def _measure(
+    client: httpx.AsyncClient, path: str, params: dict[str, Any], count: int, encoding: str
+) -> dict[str, Any]:
+    headers = {"Authorization": "Bearer bench", "Accept-Encoding": encoding}
+    await client.get(path, params=params, headers=headers)  # warm caches
+    latencies: list[float] = []
+    size = 0
+    cpu_started = time.process_time()
+    for _ in range(count):
+        started = time.perf_counter()
+        response = await client.get(path, params=params, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+        size = response.num_bytes_downloaded
+    cpu = time.process_time() - cpu_started
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+        "cpu_ms_per_request": round(cpu * 1000 / count, 3),
+        "response_bytes": size,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    config = load_config(ROOT / "config.yaml")
+    config.global_.api.auth_token = "bench"
+    config.global_.api.compression = not args.no_compression
+    point_maps = sorted(str(path) for path in (ROOT / "pointmaps").glob("*.yaml"))
+    devices = [
+        {
+            "id": f"dev-{index}",
+            "make": "Bench",
+            "model": f"M{index % len(point_maps)}",
+            "protocol": "modbus_tcp",
+            "point_map": point_maps[index % len(point_maps)],
+        }
+        for index in range(args.devices)
+    ]
+    end = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / "bench.sqlite"))
+        await db.connect()
+        seeded = await _seed(db, args, end)
+        export_service = ExportService(db, config.global_.export, devices)
+        context = APIContext(
+            config=config,
+            db=db,
+            export_service=export_service,
+            health=HealthRegistry(),
+            device_status={},
+            allow_control=False,
+            dry_run=True,
+        )
+        app = create_app(context)
+        endpoints = {
+            "measurements": ("/measurements", {"device_id": "dev-0", "limit": 500}),
+            "measurements_bulk": ("/measurements/bulk", {"limit": 10}),
+            "export_snapshot": ("/export/snapshot", {"window_s": args.minutes * 60}),
+            "export_registermaps": ("/export/registermaps", {}),
+        }
+        results: dict[str, Any] = {}
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench"
+        ) as client:
+            for name, (path, params) in endpoints.items():
+                for encoding in ENCODINGS:
+                    results[f"{name}_{encoding}"] = await _measure(
+                        client, path, params, args.requests, encoding
+                    )
+        await export_service.close()
+        await db.close()
+    flat = {
+        f"{name}_{key}": value for name, stats in results.items() for key, value in stats.items()
+    }
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "params": {
+            key: value for key, value in vars(args).items() if key not in {"output", "compare"}
+        },
+        "seeded_rows": seeded,
+        **flat,
+    }
+
+
+def compare(result: dict[str, Any], baseline: dict[str, Any]) -> dict[str, Any]:
+    # Lower is better for every reported metric.
+    deltas: dict[str, Any] = {}
+    for key, value in result.items():
+        before = baseline.get(key)
+        if not isinstance(value, (int, float)) or not isinstance(before, (int, float)):
+            continue
+        if before == 0 or key == "seeded_rows":
+            continue
+        change = (value - before) / before * 100
+        deltas[key] = {
+            "before": before,
+            "after": value,
+            "change_pct": round(change, 1),
+            "verdict": "same" if abs(change) < 5 else ("better" if change < 0 else "worse"),
+        }
+    return deltas
+
+
+def main() -> None:
+    args = parse_args()
+    result = asyncio.run(run(args))
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2))
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get("params") != result["params"]:
+            print("warning: baseline was run with different parameters", file=sys.stderr)
+        result["comparison"] = compare(result, baseline)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
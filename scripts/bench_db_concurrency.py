@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Measure poll insert latency while heavy API/export style reads hit the database."""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from ems.store.database import Database  # noqa: E402
+from ems.utils.models import Measurement  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed-rows", type=int, default=200_000)
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--points", type=int, default=25, help="points per poll")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--read-limit", type=int, default=20_000)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    return parser.parse_args()
+
+
+def _batch(device: str, ts: datetime, points: int) -> list[Measurement]:
+    return [
+        Measurement(
+            timestamp_utc=ts,
+            plant_id="bench",
+            device_id=device,
+            metric=f"M{p}",
+            value=random.random() * 1000,
+            unit="kW",
+            source="bench",
+        )
+        for p in range(points)
+    ]
+
+
+async def _seed(db: Database, args: argparse.Namespace) -> None:
+    start = datetime.now(timezone.utc) - timedelta(days=1)
+    polls = args.seed_rows // args.points
+    batch: list[Measurement] = []
+    for i in range(polls):
+        device = f"dev-{i % args.devices}"
+        batch.extend(_batch(device, start + timedelta(seconds=5 * i), args.points))
+        if len(batch) >= 10_000:
+            await db.insert_measurements(batch)
+            batch = []
+    if batch:
+        await db.insert_measurements(batch)
+
+
+async def _writer(db: Database, args: argparse.Namespace, stop: asyncio.Event) -> list[float]:
+    latencies: list[float] = []
+    i = 0
+    while not stop.is_set():
+        batch = _batch(f"dev-{i % args.devices}", datetime.now(timezone.utc), args.points)
+        started = time.perf_counter()
+        await db.insert_measurements(batch)
+        latencies.append(time.perf_counter() - started)
+        i += 1
+        await asyncio.sleep(args.poll_interval)
+    return latencies
+
+
+async def _reader(db: Database, args: argparse.Namespace, stop: asyncio.Event) -> int:
+    queries = 0
+    while not stop.is_set():
+        device = f"dev-{random.randrange(args.devices)}"
+        await db.measurements_for_device(device, limit=args.read_limit)
+        queries += 1
+    return queries
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run(args: argparse.Namespace) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / "bench.sqlite"))
+        await db.connect()
+        await _seed(db, args)
+        stop = asyncio.Event()
+        writer = asyncio.create_task(_writer(db, args, stop))
+        readers = [asyncio.create_task(_reader(db, args, stop)) for _ in range(args.readers)]
+        await asyncio.sleep(args.duration)
+        stop.set()
+        latencies = await writer
+        queries = sum(await asyncio.gather(*readers))
+        close = getattr(db, "close", None)
+        if close is not None:
+            await close()
+    return {
+        "writes": len(latencies),
+        "reads": queries,
+        "write_p50_ms": statistics.median(latencies) * 1000,
+        "write_p99_ms": _percentile(latencies, 0.99) * 1000,
+        "write_max_ms": max(latencies) * 1000,
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
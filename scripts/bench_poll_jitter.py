@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Measure poll timing jitter while the HTTP API is under load.
+
+Runs simulated pollers on the agent's event loop (each one writes a batch to SQLite
+and publishes it to the live hub on a fixed interval) while a separate load process
+hammers ``/measurements`` and ``/export/snapshot``. The API runs either on the same
+loop (``api.process: inline``) or in its own process (``api.process: separate``).
+Reports how late polls started relative to their schedule, as p50/p99/max
+milliseconds per mode, plus the number of API requests served.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import httpx  # noqa: E402
+
+from ems.api.app import APIContext  # noqa: E402
+from ems.api.ipc import LiveRelay  # noqa: E402
+from ems.api.live import LiveHub  # noqa: E402
+from ems.api.process import APIProcess, create_server  # noqa: E402
+from ems.core.health import HealthRegistry  # noqa: E402
+from ems.core.telemetry import Telemetry  # noqa: E402
+from ems.export.service import ExportService  # noqa: E402
+from ems.store.database import Database  # noqa: E402
+from ems.utils.config import AppConfig, load_config  # noqa: E402
+from ems.utils.models import Measurement  # noqa: E402
+
+MODES = ("inline", "separate")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--metrics", type=int, default=20, help="metrics per device")
+    parser.add_argument("--interval", type=float, default=0.5, help="poll interval seconds")
+    parser.add_argument("--seconds", type=float, default=20.0, help="measured duration per mode")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent API clients")
+    parser.add_argument("--history-minutes", type=int, default=120)
+    parser.add_argument("--mode", choices=[*MODES, "both"], default="both")
+    parser.add_argument("--port", type=int, default=18089)
+    parser.add_argument("--output", type=Path, help="write the result JSON here")
+    return parser.parse_args()
+
+
+def _batch(args: argparse.Namespace, device: int, ts: datetime) -> list[Measurement]:
+    return [
+        Measurement(
+            timestamp_utc=ts,
+            plant_id="bench",
+            device_id=f"dev-{device}",
+            metric=f"M{metric}",
+            value=float(metric),
+            unit="kW",
+            source="bench",
+        )
+        for metric in range(args.metrics)
+    ]
+
+
+def _load(base_url: str, token: str, clients: int, seconds: float, result: Any) -> None:
+    # Runs in its own process so the load generator never competes with the pollers.
+    deadline = time.monotonic() + seconds
+    done = [0] * clients
+
+    def worker(index: int) -> None:
+        headers = {"Authorization": f"Bearer {token}"}
+        paths = [
+            ("/measurements", {"device_id": f"dev-{index}", "limit": 5000}),
+            ("/export/snapshot", {"window_s": 1}),
+        ]
+        with httpx.Client(base_url=base_url, headers=headers, timeout=30) as client:
+            while time.monotonic() < deadline:
+                path, params = paths[done[index] % len(paths)]
+                client.get(path, params=params)
+                done[index] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.value = sum(done)
+
+
+async def _wait_ready(base_url: str) -> None:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for _ in range(200):
+            try:
+                await client.get("/health")
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("API did not come up")
+
+
+async def run_mode(args: argparse.Namespace, config: AppConfig, mode: str) -> dict[str, Any]:
+    api = config.global_.api
+    api.process = mode
+    db = Database(config.global_.storage.sqlite_path)
+    await db.connect()
+    start = datetime.now(timezone.utc) - timedelta(minutes=args.history_minutes)
+    for minute in range(args.history_minutes):
+        ts = start + timedelta(minutes=minute)
+        await db.write_measurements(
+            [m for device in range(args.devices) for m in _batch(args, device, ts)]
+        )
+    health, telemetry, device_status = HealthRegistry(), Telemetry(), {}
+    hub = LiveHub(max_subscribers=api.stream_max_clients)
+    tasks: list[asyncio.Task[Any]] = []
+    relay: LiveRelay | None = None
+    api_process: APIProcess | None = None
+    export_service = ExportService(db, config.global_.export, [])
+    if mode == "inline":
+        context = APIContext(
+            config=config,
+            db=db,
+            export_service=export_service,
+            health=health,
+            device_status=device_status,
+            live=hub,
+            telemetry=telemetry,
+            allow_control=False,
+            dry_run=True,
+        )
+        server = create_server(context)
+        tasks.append(asyncio.create_task(server.serve()))
+    else:
+        relay = LiveRelay(api.ipc_socket, hub, telemetry, health, device_status, db)
+        await relay.start()
+        api_process = APIProcess(config, health)
+        tasks.append(asyncio.create_task(api_process.run()))
+    base_url = f"http://127.0.0.1:{api.port}"
+    await _wait_ready(base_url)
+
+    lateness: list[float] = []
+    loop = asyncio.get_running_loop()
+    stop_at = loop.time() + args.seconds
+
+    async def poller(device: int) -> None:
+        target = loop.time() + args.interval * device / args.devices
+        while target < stop_at:
+            await asyncio.sleep(max(target - loop.time(), 0.0))
+            lateness.append(loop.time() - target)
+            batch = _batch(args, device, datetime.now(timezone.utc))
+            await db.insert_measurements(batch)
+            hub.publish(batch)
+            target += args.interval
+
+    served = multiprocessing.get_context("spawn").Value("i", 0)
+    load = multiprocessing.get_context("spawn").Process(
+        target=_load, args=(base_url, api.auth_token, args.clients, args.seconds, served)
+    )
+    load.start()
+    await asyncio.gather(*(poller(device) for device in range(args.devices)))
+    await asyncio.to_thread(load.join)
+
+    if api_process is not None:
+        api_process.stop()
+        tasks[0].cancel()
+    else:
+        server.should_exit = True
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if relay is not None:
+        await relay.close()
+    await export_service.close()
+    await db.close()
+    lateness.sort()
+    return {
+        "polls": len(lateness),
+        "api_requests": served.value,
+        "lateness_p50_ms": round(statistics.median(lateness) * 1000, 3),
+        "lateness_p99_ms": round(lateness[int(len(lateness) * 0.99) - 1] * 1000, 3),
+        "lateness_max_ms": round(lateness[-1] * 1000, 3),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    for mode in MODES if args.mode == "both" else (args.mode,):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = load_config(ROOT / "config.yaml")
+            config.global_.storage.sqlite_path = str(Path(tmp) / "bench.sqlite")
+            config.global_.storage.chunks.enabled = False
+            config.global_.api.ipc_socket = str(Path(tmp) / "live.sock")
+            config.global_.api.port = args.port
+            config.global_.api.bind_host = "127.0.0.1"
+            config.global_.logging.level = "WARNING"
+            results[mode] = await run_mode(args, config, mode)
+    return {"params": {k: v for k, v in vars(args).items() if k != "output"}, **results}
+
+
+def main() -> None:
+    args = parse_args()
+    result = asyncio.run(run(args))
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2, default=str))
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
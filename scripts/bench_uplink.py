@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Benchmark the uplink against an in-process ingest stand-in after a simulated outage.
+
+Seeds a synthetic plant (devices x metrics x days of minute data), queues every uplink
+window as if the link had been down, optionally compacts the backlog, then drains it.
+Reports payload build time, bytes on the wire, drain time and peak RSS as JSON. Save a
+run with ``--output`` and pass it to ``--compare`` on a later version to see deltas.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+# The ingest stand-in is a test double; tests/support holds it.
+sys.path.insert(0, str(ROOT / "tests"))
+
+import httpx  # noqa: E402
+from support.ingest_standin import IngestStandIn  # noqa: E402
+
+from ems import __version__  # noqa: E402
+from ems.store.database import Database  # noqa: E402
+from ems.uplink.publisher import UplinkPublisher  # noqa: E402
+from ems.utils.config import UplinkConfig  # noqa: E402
+from ems.utils.models import Measurement  # noqa: E402
+
+# Lower is better for every reported metric except these.
+HIGHER_IS_BETTER = {"compression_ratio"}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--metrics", type=int, default=20, help="metrics per device")
+    parser.add_argument("--days", type=float, default=1.0, help="days of backlog")
+    parser.add_argument("--poll-s", type=int, default=60, help="seconds between samples")
+    parser.add_argument("--batch-period-s", type=int, default=300)
+    parser.add_argument("--max-batch-kb", type=int, default=256)
+    parser.add_argument("--encoding", default="json", choices=["json", "msgpack"])
+    parser.add_argument("--compression", default="gzip", choices=["none", "gzip", "zstd"])
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="stand-in latency (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--compact", action="store_true", help="compact before draining")
+    parser.add_argument("--output", type=Path, help="write the result JSON here")
+    parser.add_argument("--compare", type=Path, help="earlier result JSON to diff against")
+    return parser.parse_args()
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _seed(db: Database, args: argparse.Namespace, start: datetime) -> int:
+    rng = random.Random(42)
+    steps = int(args.days * 86400 // args.poll_s)
+    batch: list[Measurement] = []
+    rows = 0
+    for step in range(steps):
+        ts = start + timedelta(seconds=step * args.poll_s)
+        for device in range(args.devices):
+            for metric in range(args.metrics):
+                batch.append(
+                    Measurement(
+                        timestamp_utc=ts,
+                        plant_id="bench",
+                        device_id=f"dev-{device}",
+                        metric=f"M{metric}",
+                        value=round(rng.random() * 1000, 3),
+                        unit="kW",
+                        source="bench",
+                    )
+                )
+        if len(batch) >= 20_000:
+            await db.write_measurements(batch)
+            rows += len(batch)
+            batch = []
+    if batch:
+        await db.write_measurements(batch)
+        rows += len(batch)
+    return rows
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    end = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    start = end - timedelta(days=args.days)
+    ingest = IngestStandIn(
+        latency_s=args.latency, failure_rate=args.failure_rate, keep_batches=False
+    )
+    config = UplinkConfig(
+        url="https://ingest.invalid/batch",
+        api_key="bench",
+        batch_period_s=args.batch_period_s,
+        max_batch_kb=args.max_batch_kb,
+        encoding=args.encoding,
+        compression=args.compression,
+        max_in_flight=args.max_in_flight,
+        backoff_initial_s=0,
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / "bench.sqlite"))
+        await db.connect()
+        seeded = await _seed(db, args, start)
+        seed_rss = _peak_rss_mb()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=ingest))
+        publisher = UplinkPublisher(db, config, client=client)
+
+        started = time.perf_counter()
+        window = timedelta(seconds=args.batch_period_s)
+        ts = start
+        while ts < end:
+            await publisher.queue_window(ts, ts + window)
+            ts += window
+        build_s = time.perf_counter() - started
+        queued_rows, queued_bytes, _ = await db.uplink_backlog()
+
+        compact_s = 0.0
+        if args.compact:
+            started = time.perf_counter()
+            await publisher.compact_backlog(now=end)
+            compact_s = time.perf_counter() - started
+        drain_rows, drain_bytes, _ = await db.uplink_backlog()
+
+        started = time.perf_counter()
+        attempts = 0
+        while (await db.uplink_backlog())[0]:
+            attempts += 1
+            await publisher.flush()
+        drain_s = time.perf_counter() - started
+        await publisher.close()
+        await db.close()
+    stats = publisher.stats
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "params": {
+            key: value for key, value in vars(args).items() if key not in {"output", "compare"}
+        },
+        "seeded_rows": seeded,
+        "windows": stats.windows,
+        "queued_batches": queued_rows,
+        "queued_bytes": queued_bytes,
+        "drained_batches": drain_rows,
+        "build_s": round(build_s, 3),
+        "build_ms_per_window": round(build_s * 1000 / max(stats.windows, 1), 3),
+        "compact_s": round(compact_s, 3),
+        "drain_s": round(drain_s, 3),
+        "drain_attempts": attempts,
+        "requests": ingest.stats.requests,
+        "bytes_on_wire": ingest.stats.bytes_received,
+        "raw_bytes": stats.raw_bytes,
+        "compression_ratio": round(stats.compression_ratio, 2),
+        "wire_bytes_per_sample": round(drain_bytes / max(seeded, 1), 4),
+        "seed_peak_rss_mb": round(seed_rss, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def compare(result: dict[str, Any], baseline: dict[str, Any]) -> dict[str, Any]:
+    deltas: dict[str, Any] = {}
+    for key, value in result.items():
+        before = baseline.get(key)
+        if not isinstance(value, (int, float)) or not isinstance(before, (int, float)):
+            continue
+        if before == 0:
+            continue
+        change = (value - before) / before * 100
+        better = change > 0 if key in HIGHER_IS_BETTER else change < 0
+        deltas[key] = {
+            "before": before,
+            "after": value,
+            "change_pct": round(change, 1),
+            "verdict": "same" if abs(change) < 5 else ("better" if better else "worse"),
+        }
+    return deltas
+
+
+def main() -> None:
+    args = parse_args()
+    result = asyncio.run(run(args))
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2))
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get("params") != result["params"]:
+            print("warning: baseline was run with different parameters", file=sys.stderr)
+        result["comparison"] = compare(result, baseline)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,67 @@
 from __future__ import annotations
 
+import base64
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, Optional, Protocol
 
-from fastapi import Depends, FastAPI, HTTPException, Request, Response, status
-from fastapi.responses import HTMLResponse
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.responses import HTMLResponse, ORJSONResponse, StreamingResponse
 from fastapi.security import (
+    HTTPAuthorizationCredentials,
     HTTPBasic,
     HTTPBasicCredentials,
     HTTPBearer,
-    HTTPAuthorizationCredentials,
 )
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, generate_latest
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+from sqlalchemy import Row
 
+from ..core.executor import WorkerPool
 from ..core.health import HealthRegistry
-from ..store.database import Database
+from ..core.telemetry import Telemetry
+from ..export.history import HISTORY_FORMATS, stream_history
+from ..export.service import ExportService
+from ..store.database import Database, MeasurementRecord
+from ..store.downsample import M4Reducer, chart_series
+from ..store.history import HistoryStore
+from ..store.maintenance import MaintenanceStats
+from ..store.tiered import WriteBufferStats
+from ..uplink.publisher import UplinkStats
 from ..utils.config import AppConfig
 from ..utils.models import ControlResult
-from ..export.service import ExportService
+from .compression import CompressionMiddleware
+from .live import LiveHub, sse_events
+from .metrics import EMSCollector
+
+
+# What /metrics reads from components; the API process gets IPC mirrors of them.
+class MaintenanceGauges(Protocol):
+    @property
+    def stats(self) -> MaintenanceStats: ...
+
+    def wal_bytes(self) -> int: ...
+
+
+class WriteBufferGauges(Protocol):
+    @property
+    def stats(self) -> WriteBufferStats: ...
+
+
+class UplinkGauges(Protocol):
+    @property
+    def stats(self) -> UplinkStats: ...
+
+
+class LoopLagGauges(Protocol):
+    @property
+    def last_lag_s(self) -> float: ...
+
+    @property
+    def max_lag_s(self) -> float: ...
 
 
 @dataclass
@@ -33,16 +73,100 @@ class APIContext:
     device_status: Dict[str, Dict[str, Any]]
     allow_control: bool
     dry_run: bool
+    maintenance: MaintenanceGauges | None = None
+    write_buffer: WriteBufferGauges | None = None
+    workers: WorkerPool | None = None
+    loop_lag: LoopLagGauges | None = None
+    history: HistoryStore | None = None
+    uplink: UplinkGauges | None = None
+    live: LiveHub | None = None
+    telemetry: Telemetry | None = None
 
 
 security_scheme = HTTPBearer(auto_error=False)
 basic_auth = HTTPBasic()
-registry = CollectorRegistry()
-requests_counter = Counter("ems_api_requests_total", "API Requests", registry=registry)
+
+
+def _row_dict(row: Row[Any] | MeasurementRecord) -> dict[str, Any]:
+    return {
+        "timestamp_utc": row.timestamp_utc.isoformat(),
+        "device_id": row.device_id,
+        "metric": row.metric,
+        "value": row.value,
+        "unit": row.unit,
+        "quality": row.quality,
+    }
+
+
+def _encode_cursor(row: Row[Any]) -> str:
+    raw = f"{row.timestamp_utc.isoformat()}|{row.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, record_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(record_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        ) from exc
+
+
+def _columnar(rows: list[Any], epoch: bool) -> list[dict[str, Any]]:
+    series: list[dict[str, Any]] = []
+    current: dict[str, Any] | None = None
+    for row in rows:
+        if current is None or (current["device_id"], current["metric"]) != (
+            row.device_id,
+            row.metric,
+        ):
+            current = {
+                "device_id": row.device_id,
+                "metric": row.metric,
+                "unit": row.unit,
+                "t": [],
+                "value": [],
+                "quality": [],
+            }
+            series.append(current)
+        ts = row.timestamp_utc
+        if epoch:
+            # SQLite drops tzinfo; stored timestamps are UTC.
+            ts = ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+        current["t"].append(ts.timestamp() if epoch else ts.isoformat())
+        current["value"].append(row.value)
+        current["quality"].append(row.quality)
+    return series
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+async def _ndjson(pages: AsyncIterator[list[Row[Any]]]) -> AsyncIterator[bytes]:
+    async for page in pages:
+        yield b"".join(orjson.dumps(_row_dict(row)) + b"\n" for row in page)
 
 
 def create_app(context: APIContext) -> FastAPI:
-    app = FastAPI(title="GES Solar EMS", version="0.1.0")
+    app = FastAPI(title="GES Solar EMS", version="0.1.0", default_response_class=ORJSONResponse)
+    api_config = context.config.global_.api
+    telemetry = context.telemetry or Telemetry()
+    registry = CollectorRegistry(auto_describe=False)
+    registry.register(EMSCollector(context, telemetry, context.config.global_.metrics))
+    if api_config.compression:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=api_config.compression_min_bytes,
+            gzip_level=api_config.gzip_level,
+            pool=context.workers,
+            offload_size=api_config.compression_offload_bytes,
+        )
     static_dir = Path(__file__).resolve().parent.parent / "ui" / "static"
     templates = Jinja2Templates(
         directory=str(Path(__file__).resolve().parent.parent / "ui" / "templates")
@@ -71,7 +195,7 @@ def create_app(context: APIContext) -> FastAPI:
 
     @app.middleware("http")
     async def count_requests(request: Request, call_next):  # type: ignore[no-untyped-def]
-        requests_counter.inc()
+        telemetry.api_requests += 1
         return await call_next(request)
 
     @app.get("/health")
@@ -91,25 +215,178 @@ def create_app(context: APIContext) -> FastAPI:
     async def devices() -> list[dict[str, Any]]:
         return list(context.device_status.values())
 
-    @app.get("/measurements")
+    @app.get("/measurements", response_model=None)
     async def measurements(
-        device_id: str, metric: Optional[str] = None, since: Optional[str] = None
-    ) -> list[dict[str, Any]]:
+        device_id: str,
+        metric: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        cursor: Optional[str] = None,
+        paged: bool = False,
+        limit: int = Query(500, ge=1, le=10000),
+        format: str = Query("json", pattern="^(json|ndjson)$"),
+    ) -> Response:
         since_dt = datetime.fromisoformat(since) if since else None
+        if paged or cursor or format == "ndjson":
+            rows = context.db.iter_measurements(
+                device_ids=[device_id],
+                metrics=[metric] if metric else None,
+                since=since_dt,
+                until=datetime.fromisoformat(until) if until else None,
+                after=_decode_cursor(cursor) if cursor else None,
+                page_size=limit,
+            )
+            if format == "ndjson":
+                return StreamingResponse(_ndjson(rows), media_type="application/x-ndjson")
+            page: list[Row[Any]] = await anext(rows, [])
+            await rows.aclose()
+            return ORJSONResponse(
+                {
+                    "items": [_row_dict(row) for row in page],
+                    "next": _encode_cursor(page[-1]) if len(page) >= limit else None,
+                }
+            )
         records = await context.db.measurements_for_device(
             device_id=device_id, metric=metric, since=since_dt
         )
-        return [
-            {
-                "timestamp_utc": rec.timestamp_utc.isoformat(),
-                "device_id": rec.device_id,
-                "metric": rec.metric,
-                "value": rec.value,
-                "unit": rec.unit,
-                "quality": rec.quality,
-            }
-            for rec in records
-        ]
+        # Returning the response directly skips FastAPI's jsonable_encoder pass.
+        return ORJSONResponse([_row_dict(rec) for rec in records])
+
+    @app.get("/measurements/bulk")
+    async def measurements_bulk(
+        device_id: list[str] = Query(default_factory=list),
+        metric: list[str] = Query(default_factory=list),
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: int = Query(500, ge=1, le=10000),
+        epoch: bool = False,
+        format: str = Query("json", pattern="^(json|ndjson)$"),
+    ) -> Response:
+        try:
+            rows = await context.db.latest_series(
+                device_ids=device_id or None,
+                metrics=metric or None,
+                since=datetime.fromisoformat(since) if since else None,
+                until=datetime.fromisoformat(until) if until else None,
+                limit=limit,
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+        series = _columnar(rows, epoch)
+        if format == "ndjson":
+            return Response(
+                content=b"".join(orjson.dumps(item) + b"\n" for item in series),
+                media_type="application/x-ndjson",
+            )
+        return Response(
+            content=orjson.dumps({"count": len(rows), "series": series}),
+            media_type="application/json",
+        )
+
+    @app.get("/stream/measurements")
+    async def stream_measurements(
+        device_id: list[str] = Query(default_factory=list),
+        metric: list[str] = Query(default_factory=list),
+    ) -> StreamingResponse:
+        if context.live is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Live stream not enabled"
+            )
+        if context.live.full:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many live subscribers"
+            )
+        return StreamingResponse(
+            sse_events(
+                context.live,
+                device_id or None,
+                metric or None,
+                min_interval_s=api_config.stream_min_interval_s,
+                keepalive_s=api_config.stream_keepalive_s,
+            ),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.get("/history")
+    async def history(
+        start: str,
+        end: str,
+        device_id: list[str] = Query(default_factory=list),
+        metric: list[str] = Query(default_factory=list),
+        columns: Optional[str] = None,
+        bucket_s: Optional[int] = Query(None, ge=1),
+        limit: int = Query(100000, ge=1, le=1000000),
+    ) -> Response:
+        if context.history is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="History not configured"
+            )
+        try:
+            table = await context.history.query(
+                start=datetime.fromisoformat(start),
+                end=datetime.fromisoformat(end),
+                device_ids=device_id or None,
+                metrics=metric or None,
+                columns=columns.split(",") if columns else None,
+                bucket_s=bucket_s,
+                # One extra row tells whether the result was truncated.
+                limit=limit + 1,
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+        body = {
+            "count": min(table.num_rows, limit),
+            "truncated": table.num_rows > limit,
+            "columns": table.slice(0, limit).to_pydict(),
+        }
+        return Response(content=orjson.dumps(body), media_type="application/json")
+
+    @app.get("/chart")
+    async def chart(
+        device_id: list[str] = Query(default_factory=list),
+        metric: list[str] = Query(default_factory=list),
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        window_s: int = Query(3600, ge=1),
+        points: int = Query(200, ge=3, le=5000),
+        method: str = Query("lttb", pattern="^(lttb|minmax)$"),
+    ) -> Response:
+        if context.history is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="History not configured"
+            )
+        try:
+            end_dt = datetime.fromisoformat(end) if end else datetime.now(timezone.utc)
+            start_dt = (
+                datetime.fromisoformat(start) if start else end_dt - timedelta(seconds=window_s)
+            )
+            # Each page is cut to first/last/min/max per output point as it is read,
+            # so memory follows ``points`` rather than the raw row count.
+            reducer = M4Reducer(start_dt, end_dt, points)
+            table = await context.history.query(
+                start=start_dt,
+                end=end_dt,
+                device_ids=device_id or None,
+                metrics=metric or None,
+                columns=["timestamp_utc", "device_id", "metric", "value"],
+                reduce=reducer,
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+        args = (table, points, method, reducer.raw_points)
+        if context.workers is not None:
+            series = await context.workers.run_thread(chart_series, *args)
+        else:
+            series = chart_series(*args)
+        body = {
+            "start": start_dt.isoformat(),
+            "end": end_dt.isoformat(),
+            "method": method,
+            "points": points,
+            "series": series,
+        }
+        return Response(content=orjson.dumps(body), media_type="application/json")
 
     @app.get("/config")
     async def get_config(token: None = Depends(require_token)) -> dict[str, Any]:
@@ -121,13 +398,69 @@ def create_app(context: APIContext) -> FastAPI:
 
     @app.get("/export/snapshot")
     async def export_snapshot(
-        window_s: int = 60, token: None = Depends(require_token)
-    ) -> dict[str, Any]:
-        return await context.export_service.snapshot(window_s)
+        request: Request,
+        window_s: int = Query(60, ge=1),
+        token: None = Depends(require_token),
+    ) -> Response:
+        cached = await context.export_service.cached_snapshot(window_s)
+        headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), cached.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=cached.body, media_type="application/json", headers=headers)
 
     @app.get("/export/registermaps")
-    async def export_registermaps(token: None = Depends(require_token)) -> dict[str, Any]:
-        return await context.export_service.register_maps()
+    async def export_registermaps(
+        request: Request, dedup: bool = False, token: None = Depends(require_token)
+    ) -> Response:
+        catalog = context.export_service.register_catalog(dedup)
+        headers = {"ETag": catalog.etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), catalog.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=catalog.body, media_type="application/json", headers=headers)
+
+    @app.get("/export/history")
+    async def export_history(
+        since: str,
+        until: Optional[str] = None,
+        device_id: list[str] = Query(default_factory=list),
+        metric: list[str] = Query(default_factory=list),
+        format: str = Query("arrow", pattern="^(arrow|parquet|csv)$"),
+        page_size: int = Query(10000, ge=100, le=100000),
+        token: None = Depends(require_token),
+    ) -> StreamingResponse:
+        try:
+            since_dt = datetime.fromisoformat(since)
+            until_dt = datetime.fromisoformat(until) if until else datetime.now(timezone.utc)
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+        pages = context.db.stream_measurements(
+            device_ids=device_id or None,
+            metrics=metric or None,
+            since=since_dt,
+            until=until_dt,
+            page_size=page_size,
+        )
+        media_type, extension = HISTORY_FORMATS[format]
+        filename = f"history-{since_dt:%Y%m%dT%H%M%S}-{until_dt:%Y%m%dT%H%M%S}.{extension}"
+        return StreamingResponse(
+            stream_history(pages, format, context.workers),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+
+    @app.get("/diagnostics/raw/{device_id}")
+    async def diagnostics_raw(
+        device_id: str,
+        since: Optional[str] = None,
+        limit: int = 20,
+        token: None = Depends(require_token),
+    ) -> list[dict[str, Any]]:
+        since_dt = datetime.fromisoformat(since) if since else None
+        blocks = await context.db.raw_register_blocks(device_id, since=since_dt, limit=limit)
+        return [
+            {"timestamp_utc": block.timestamp_utc.isoformat(), "registers": block.registers()}
+            for block in blocks
+        ]
 
     @app.post("/controls/{device_id}")
     async def controls(
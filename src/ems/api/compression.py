@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import gzip
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..core.executor import WorkerPool
+
+COMPRESSIBLE = (
+    b"application/json",
+    b"application/x-ndjson",
+    b"text/html",
+    b"text/plain",
+    b"text/css",
+    b"application/javascript",
+    b"text/javascript",
+)
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """Return ``gzip`` if an ``Accept-Encoding`` header allows it, else ``None``."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        key, _, quality = params.strip().partition("=")
+        try:
+            if key.strip() == "q" and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(name.strip().lower())
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """Gzips complete JSON/text responses; streamed bodies pass through untouched."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        pool: WorkerPool | None = None,
+        offload_size: int = 65536,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self._pool = pool
+        self.offload_size = offload_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = next(
+            (
+                value.decode("latin-1")
+                for key, value in scope["headers"]
+                if key == b"accept-encoding"
+            ),
+            "",
+        )
+        encoding = choose_encoding(accept)
+        start: Message | None = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = _with_vary(message)
+                if encoding is not None and start["status"] == 304:
+                    # Stands in for a 200 of the same representation, tagged below.
+                    start = {**start, "headers": _weaken_etag(start["headers"])}
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            assert start is not None
+            passthrough = True
+            body = message.get("body", b"")
+            if encoding is None or not self._compressible(start["headers"]):
+                await send(start)
+                await send(message)
+                return
+            # The tag depends only on the negotiated encoding, so a 304 for the same
+            # request carries the same weak tag whether or not this body is compressed.
+            start = {**start, "headers": _weaken_etag(start["headers"])}
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                await send(start)
+                await send(message)
+                return
+            if self._pool is not None and len(body) >= self.offload_size:
+                body = await self._pool.run_thread(self._compress, body, encoding)
+            else:
+                body = self._compress(body, encoding)
+            headers = [(key, value) for key, value in start["headers"] if key != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(body)).encode()),
+            ]
+            await send({**start, "headers": headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    @staticmethod
+    def _compressible(headers: list[tuple[bytes, bytes]]) -> bool:
+        content_type = b""
+        for key, value in headers:
+            if key == b"content-encoding":
+                return False
+            if key == b"content-type":
+                content_type = value
+        return content_type.startswith(COMPRESSIBLE)
+
+
+def _with_vary(start: Message) -> Message:
+    """Add ``Vary: Accept-Encoding`` to compressible responses and every 304."""
+    headers = start["headers"]
+    content_type = next((value for key, value in headers if key == b"content-type"), b"")
+    if start["status"] != 304 and not content_type.startswith(COMPRESSIBLE):
+        return start
+    vary = [value for key, value in headers if key == b"vary"]
+    if any(b"accept-encoding" in value.lower() for value in vary):
+        return start
+    headers = [(key, value) for key, value in headers if key != b"vary"]
+    headers.append((b"vary", b", ".join([*vary, b"Accept-Encoding"])))
+    return {**start, "headers": headers}
+
+
+def _weaken_etag(headers: list[tuple[bytes, bytes]]) -> list[tuple[bytes, bytes]]:
+    return [
+        (key, b"W/" + value if key == b"etag" and not value.startswith(b"W/") else value)
+        for key, value in headers
+    ]
+
+
+__all__ = ["CompressionMiddleware", "choose_encoding"]
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict
+
+import orjson
+
+from ..core.executor import LoopLagMonitor
+from ..core.health import HealthRegistry
+from ..core.telemetry import Telemetry
+from ..store.database import Database
+from ..store.maintenance import MaintenanceStats, SQLiteMaintenance
+from ..uplink.publisher import UplinkPublisher, UplinkStats
+from .live import LiveHub
+
+# One NDJSON line carries a whole conflated batch, which can be large for big plants.
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+
+def _line(message: Dict[str, Any]) -> bytes:
+    return orjson.dumps(message) + b"\n"
+
+
+def _gauges(stats: Any) -> Dict[str, Any]:
+    # /metrics only exports the numeric fields, so timestamps stay in the poller.
+    return {
+        name: value
+        for name, value in asdict(stats).items()
+        if isinstance(value, (int, float, dict))
+    }
+
+
+class LiveRelay:
+    """Serves live values and poller state from the poller process to the API process."""
+
+    def __init__(
+        self,
+        path: str,
+        hub: LiveHub,
+        telemetry: Telemetry,
+        health: HealthRegistry,
+        device_status: Dict[str, Dict[str, Any]],
+        db: Database,
+        loop_lag: LoopLagMonitor | None = None,
+        maintenance: SQLiteMaintenance | None = None,
+        uplink: UplinkPublisher | None = None,
+        state_interval_s: float = 1.0,
+    ) -> None:
+        self.path = Path(path)
+        self._hub = hub
+        self._telemetry = telemetry
+        self._health = health
+        self._device_status = device_status
+        self._db = db
+        self._loop_lag = loop_lag
+        self._maintenance = maintenance
+        self._uplink = uplink
+        self.state_interval_s = state_interval_s
+        self._server: asyncio.AbstractServer | None = None
+        self._connections: set[asyncio.Task[Any]] = set()
+
+    async def start(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(self._serve, path=str(self.path))
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        # Closing the server does not end established connections on Python 3.11.
+        for task in self._connections:
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        self.path.unlink(missing_ok=True)
+
+    def state(self) -> Dict[str, Any]:
+        components: Dict[str, Any] = {}
+        if self._maintenance is not None:
+            components["maintenance"] = {
+                **_gauges(self._maintenance.stats),
+                "wal_bytes": self._maintenance.wal_bytes(),
+            }
+        if self._uplink is not None:
+            components["uplink"] = _gauges(self._uplink.stats)
+        return {
+            "type": "state",
+            "device_status": self._device_status,
+            "health": self._health.as_dict(),
+            "telemetry": self._telemetry.state(),
+            "write_stats": asdict(self._db.write_stats),
+            "data_version": self._db.data_version,
+            "loop_lag": (
+                [self._loop_lag.last_lag_s, self._loop_lag.max_lag_s]
+                if self._loop_lag is not None
+                else [0.0, 0.0]
+            ),
+            "components": components,
+        }
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            subscription = self._hub.subscribe()
+        except RuntimeError:
+            writer.close()
+            return
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        assert task is not None
+        self._connections.add(task)
+        try:
+            writer.write(_line(self.state()))
+            next_state = loop.time() + self.state_interval_s
+            while True:
+                batch = await subscription.next_batch(max(next_state - loop.time(), 0.0))
+                if batch:
+                    writer.write(_line({"type": "measurements", "items": batch}))
+                if loop.time() >= next_state:
+                    writer.write(_line(self.state()))
+                    next_state = loop.time() + self.state_interval_s
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # Handler tasks are ours; ending quietly on close keeps asyncio from
+            # logging the cancellation as an unretrieved exception.
+            pass
+        finally:
+            self._connections.discard(task)
+            self._hub.unsubscribe(subscription)
+            writer.close()
+
+
+class RemoteLoopLag:
+    """Holds the poller's loop lag as reported over IPC, read like a LoopLagMonitor."""
+
+    def __init__(self) -> None:
+        self.last_lag_s = 0.0
+        self.max_lag_s = 0.0
+
+    def load(self, last_lag_s: float, max_lag_s: float) -> None:
+        self.last_lag_s = last_lag_s
+        self.max_lag_s = max_lag_s
+
+
+class RemoteMaintenance:
+    """Holds the poller's SQLite maintenance gauges, read like a SQLiteMaintenance."""
+
+    def __init__(self) -> None:
+        self.stats = MaintenanceStats()
+
+    def wal_bytes(self) -> int:
+        return self.stats.wal_bytes
+
+
+class RemoteUplink:
+    """Holds the poller's uplink counters, read like an UplinkPublisher."""
+
+    def __init__(self) -> None:
+        self.stats = UplinkStats()
+
+
+class LiveMirror:
+    """API-process side of :class:`LiveRelay`; mirrors its state and reconnects."""
+
+    def __init__(
+        self,
+        path: str,
+        hub: LiveHub,
+        telemetry: Telemetry,
+        health: HealthRegistry,
+        device_status: Dict[str, Dict[str, Any]],
+        db: Database,
+        reconnect_s: float = 1.0,
+    ) -> None:
+        self.path = path
+        self._hub = hub
+        self._telemetry = telemetry
+        self._health = health
+        self._device_status = device_status
+        self._db = db
+        self._reconnect_s = reconnect_s
+        self.loop_lag = RemoteLoopLag()
+        self.maintenance = RemoteMaintenance()
+        self.uplink = RemoteUplink()
+        self.connected = False
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="live-mirror")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def apply(self, message: Dict[str, Any]) -> None:
+        if message["type"] == "measurements":
+            self._hub.publish_items(message["items"])
+            return
+        self._device_status.clear()
+        self._device_status.update(message["device_status"])
+        self._health.load(message["health"])
+        self._health.update("live_ipc", healthy=True, message="connected")
+        self._telemetry.load(message["telemetry"])
+        for name, value in message["write_stats"].items():
+            setattr(self._db.write_stats, name, value)
+        self._db.data_version = message["data_version"]
+        self.loop_lag.load(*message["loop_lag"])
+        components = message["components"]
+        stats: tuple[tuple[str, object], ...] = (
+            ("maintenance", self.maintenance.stats),
+            ("uplink", self.uplink.stats),
+        )
+        for name, target in stats:
+            for field, value in components.get(name, {}).items():
+                setattr(target, field, value)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=MAX_LINE_BYTES)
+            except OSError as exc:
+                self._health.update("live_ipc", healthy=False, message=str(exc))
+                await asyncio.sleep(self._reconnect_s)
+                continue
+            self.connected = True
+            try:
+                while line := await reader.readline():
+                    self.apply(orjson.loads(line))
+            except (ConnectionError, ValueError) as exc:
+                self._health.update("live_ipc", healthy=False, message=str(exc))
+            else:
+                self._health.update("live_ipc", healthy=False, message="relay closed")
+            finally:
+                self.connected = False
+                writer.close()
+                with contextlib.suppress(ConnectionError):
+                    await writer.wait_closed()
+            await asyncio.sleep(self._reconnect_s)
+
+
+__all__ = ["LiveMirror", "LiveRelay", "RemoteLoopLag", "RemoteMaintenance", "RemoteUplink"]
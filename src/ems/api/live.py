@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator, Collection, Iterable, Sequence
+
+import orjson
+
+from ..utils.models import Measurement
+
+SeriesKey = tuple[str, str]
+
+
+class Subscription:
+    """One live client: its filters and the conflated values it has not seen yet."""
+
+    def __init__(self, device_ids: Collection[str] | None, metrics: Collection[str] | None) -> None:
+        self.device_ids = frozenset(device_ids) if device_ids else None
+        self.metrics = frozenset(metrics) if metrics else None
+        self._pending: dict[SeriesKey, dict[str, Any]] = {}
+        self._ready = asyncio.Event()
+        self.conflated = 0
+
+    def wants(self, key: SeriesKey) -> bool:
+        return (self.device_ids is None or key[0] in self.device_ids) and (
+            self.metrics is None or key[1] in self.metrics
+        )
+
+    def offer(self, key: SeriesKey, item: dict[str, Any]) -> None:
+        # A slow reader only ever holds the newest value per series.
+        if key in self._pending:
+            self.conflated += 1
+        self._pending[key] = item
+        self._ready.set()
+
+    async def next_batch(self, timeout: float) -> list[dict[str, Any]]:
+        """Wait up to ``timeout`` for updates; an empty list means nothing arrived."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        batch, self._pending = list(self._pending.values()), {}
+        return batch
+
+
+class LiveHub:
+    """Fans measurements from the poll path out to conflating stream subscribers."""
+
+    def __init__(self, max_subscribers: int = 16) -> None:
+        self.max_subscribers = max_subscribers
+        self._subscribers: set[Subscription] = set()
+        self._latest: dict[SeriesKey, dict[str, Any]] = {}
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    def latest(self) -> list[dict[str, Any]]:
+        """Latest published value of every series, in first-seen order."""
+        return list(self._latest.values())
+
+    def publish(self, measurements: Sequence[Measurement]) -> None:
+        self.publish_items(
+            {
+                "timestamp_utc": m.timestamp_utc.isoformat(),
+                "device_id": m.device_id,
+                "metric": m.metric,
+                "value": m.value,
+                "unit": m.unit,
+                "quality": m.quality.value,
+            }
+            for m in measurements
+        )
+
+    def publish_items(self, items: Iterable[dict[str, Any]]) -> None:
+        """Publish values already rendered by :meth:`publish`, e.g. from another hub."""
+        for item in items:
+            key = (item["device_id"], item["metric"])
+            self._latest[key] = item
+            for subscription in self._subscribers:
+                if subscription.wants(key):
+                    subscription.offer(key, item)
+
+    def subscribe(
+        self,
+        device_ids: Collection[str] | None = None,
+        metrics: Collection[str] | None = None,
+    ) -> Subscription:
+        if self.full:
+            raise RuntimeError("Too many live subscribers")
+        subscription = Subscription(device_ids, metrics)
+        for key, item in self._latest.items():
+            if subscription.wants(key):
+                subscription.offer(key, item)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+
+async def sse_events(
+    hub: LiveHub,
+    device_ids: Collection[str] | None = None,
+    metrics: Collection[str] | None = None,
+    min_interval_s: float = 1.0,
+    keepalive_s: float = 15.0,
+) -> AsyncIterator[bytes]:
+    """Render a live subscription, taken once iteration starts, as ``text/event-stream``."""
+    yield b"retry: 5000\n\n"
+    try:
+        subscription = hub.subscribe(device_ids, metrics)
+    except RuntimeError:
+        # Filled up since the endpoint checked; the client retries after ``retry``.
+        return
+    try:
+        while True:
+            batch = await subscription.next_batch(keepalive_s)
+            if not batch:
+                yield b": keepalive\n\n"
+                continue
+            yield b"event: measurements\ndata: " + orjson.dumps(batch) + b"\n\n"
+            await asyncio.sleep(min_interval_s)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+__all__ = ["LiveHub", "Subscription", "sse_events"]
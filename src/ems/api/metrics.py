@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Iterable, Iterator
+
+from prometheus_client.core import (
+    CounterMetricFamily,
+    GaugeMetricFamily,
+    Metric,
+    SummaryMetricFamily,
+)
+from prometheus_client.registry import Collector
+
+from ..core.telemetry import Telemetry
+from ..utils.config import MetricsConfig
+
+if TYPE_CHECKING:
+    from .app import APIContext
+
+
+class EMSCollector(Collector):
+    """Renders every EMS metric family from in-memory state at scrape time."""
+
+    def __init__(self, context: APIContext, telemetry: Telemetry, config: MetricsConfig) -> None:
+        self._context = context
+        self._telemetry = telemetry
+        self._config = config
+        self._last_value_metrics = frozenset(config.last_value_metrics)
+
+    def describe(self) -> Iterable[Metric]:
+        # Families are dynamic; skip the registry's collect-on-register probe.
+        return []
+
+    def collect(self) -> Iterator[Metric]:
+        dropped: dict[str, int] = {}
+        context, telemetry = self._context, self._telemetry
+        yield CounterMetricFamily("ems_api_requests", "API Requests", value=telemetry.api_requests)
+        yield from self._devices(dropped)
+        write = context.db.write_stats
+        yield SummaryMetricFamily(
+            "ems_db_write_seconds",
+            "Time spent committing measurement batches to SQLite",
+            count_value=write.commits,
+            sum_value=write.seconds_sum,
+        )
+        yield GaugeMetricFamily(
+            "ems_db_write_max_seconds", "Slowest measurement commit", value=write.max_s
+        )
+        yield CounterMetricFamily(
+            "ems_db_rows_written", "Measurement rows committed to SQLite", value=write.rows
+        )
+        if context.maintenance is not None:
+            stats = context.maintenance.stats
+            yield _gauge(
+                "ems_sqlite_wal_bytes", "SQLite WAL file size", context.maintenance.wal_bytes()
+            )
+            yield _gauge(
+                "ems_sqlite_freelist_pages", "Free pages in the SQLite file", stats.freelist_pages
+            )
+            yield _gauge("ems_sqlite_page_count", "Pages in the SQLite file", stats.page_count)
+            family = GaugeMetricFamily(
+                "ems_sqlite_maintenance_duration_seconds",
+                "Duration of the last run of each SQLite maintenance task",
+                labels=["task"],
+            )
+            for task, seconds in stats.durations.items():
+                family.add_metric([task], seconds)
+            yield family
+        if context.write_buffer is not None:
+            buffer_stats = context.write_buffer.stats
+            yield _gauge(
+                "ems_storage_buffered_rows",
+                "Measurements held in the RAM write tier",
+                buffer_stats.buffered_rows,
+            )
+            yield _gauge(
+                "ems_storage_flushes",
+                "Batched commits made by the RAM write tier",
+                buffer_stats.flushes,
+            )
+            yield _gauge(
+                "ems_storage_commits_avoided",
+                "Per-poll SQLite commits saved by the RAM write tier",
+                buffer_stats.commits_avoided,
+            )
+        if context.workers is not None:
+            yield _gauge(
+                "ems_worker_queue_depth",
+                "Jobs waiting for a worker pool slot",
+                context.workers.queue_depth,
+            )
+            yield _gauge(
+                "ems_worker_in_flight",
+                "Jobs submitted to the worker pool and not finished",
+                context.workers.stats.in_flight,
+            )
+            yield _gauge(
+                "ems_worker_completed",
+                "Jobs completed by the worker pool",
+                context.workers.stats.completed,
+            )
+        if context.loop_lag is not None:
+            yield _gauge(
+                "ems_event_loop_lag_seconds",
+                "Peak event loop lag over the last minute",
+                context.loop_lag.max_lag_s,
+            )
+        if context.uplink is not None:
+            uplink = context.uplink.stats
+            yield _gauge(
+                "ems_uplink_bytes_sent",
+                "Encoded uplink bytes delivered upstream",
+                uplink.bytes_sent,
+            )
+            yield _gauge(
+                "ems_uplink_compression_ratio",
+                "Uncompressed over encoded size of queued uplink batches",
+                uplink.compression_ratio,
+            )
+            yield _gauge(
+                "ems_uplink_backlog_bytes",
+                "Encoded bytes waiting in the uplink queue",
+                uplink.backlog_bytes,
+            )
+            yield _gauge(
+                "ems_uplink_backlog_rows",
+                "Batches waiting in the uplink queue",
+                uplink.backlog_rows,
+            )
+        if context.live is not None:
+            yield from self._last_values(context.live.latest(), dropped)
+        family = GaugeMetricFamily(
+            "ems_metrics_series_dropped",
+            "Series left out of a metric family by its cardinality limit",
+            labels=["family"],
+        )
+        for name, count in dropped.items():
+            family.add_metric([name], count)
+        yield family
+
+    def limit(self, family: str) -> int:
+        return self._config.family_limits.get(family, self._config.max_series)
+
+    def _devices(self, dropped: dict[str, int]) -> Iterator[Metric]:
+        devices = self._telemetry.devices
+        limit = self.limit("ems_device")
+        if len(devices) > limit:
+            dropped["ems_device"] = len(devices) - limit
+        families: dict[str, CounterMetricFamily | GaugeMetricFamily] = {
+            "polls": CounterMetricFamily(
+                "ems_device_polls", "Polls attempted per device", labels=["device"]
+            ),
+            "failures": CounterMetricFamily(
+                "ems_device_poll_failures", "Polls that raised per device", labels=["device"]
+            ),
+            "points_read": CounterMetricFamily(
+                "ems_device_points_read", "Points returned per device", labels=["device"]
+            ),
+            "decode_errors": CounterMetricFamily(
+                "ems_device_decode_errors",
+                "Points per device that decoded to no value or BAD quality",
+                labels=["device"],
+            ),
+            "last_duration_s": GaugeMetricFamily(
+                "ems_device_poll_duration_seconds",
+                "Duration of the last poll per device",
+                labels=["device"],
+            ),
+        }
+        for device_id, stats in islice(devices.items(), limit):
+            for attribute, family in families.items():
+                family.add_metric([device_id], getattr(stats, attribute))
+        yield from families.values()
+
+    def _last_values(
+        self, latest: list[dict[str, Any]], dropped: dict[str, int]
+    ) -> Iterator[Metric]:
+        family = GaugeMetricFamily(
+            "ems_last_value",
+            "Latest polled value per device and metric",
+            labels=["device", "metric", "unit"],
+        )
+        wanted = self._last_value_metrics
+        limit = self.limit("ems_last_value")
+        count = 0
+        for item in latest:
+            if item["value"] is None or (wanted and item["metric"] not in wanted):
+                continue
+            count += 1
+            if count <= limit:
+                family.add_metric(
+                    [item["device_id"], item["metric"], item["unit"] or ""], item["value"]
+                )
+        if count > limit:
+            dropped["ems_last_value"] = count - limit
+        yield family
+
+
+def _gauge(name: str, documentation: str, value: float) -> GaugeMetricFamily:
+    return GaugeMetricFamily(name, documentation, value=value)
+
+
+__all__ = ["EMSCollector"]
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from typing import Any
+
+import uvicorn
+
+from ..core.executor import WorkerPool
+from ..core.health import HealthRegistry
+from ..core.telemetry import Telemetry
+from ..export.service import ExportService
+from ..store.chunks import ChunkStore
+from ..store.database import Database
+from ..store.history import HistoryStore
+from ..utils.config import AppConfig
+from ..utils.logging import setup_logging
+from .app import APIContext, create_app
+from .ipc import LiveMirror
+from .live import LiveHub
+
+
+def create_server(context: APIContext) -> uvicorn.Server:
+    api = context.config.global_.api
+    config = uvicorn.Config(
+        create_app(context),
+        host=api.bind_host,
+        port=api.port,
+        log_config=None,
+        loop="asyncio",
+    )
+    return uvicorn.Server(config)
+
+
+class APIProcess:
+    """Runs the HTTP API and UI in a child process and restarts it if it dies."""
+
+    def __init__(
+        self, config: AppConfig, health: HealthRegistry, restart_delay_s: float = 1.0
+    ) -> None:
+        self._config = config
+        self._health = health
+        self._restart_delay_s = restart_delay_s
+        self._process: Any = None
+        self.restarts = 0
+
+    async def run(self) -> None:
+        context = multiprocessing.get_context("spawn")
+        while True:
+            # Not a daemon: the API may start its own process worker pool.
+            self._process = context.Process(
+                target=serve_api, args=(self._config, os.getpid()), name="ems-api"
+            )
+            self._process.start()
+            self._health.update(
+                "api_process", healthy=True, message="running", pid=self._process.pid
+            )
+            while self._process.is_alive():
+                await asyncio.sleep(self._restart_delay_s)
+            self._health.update(
+                "api_process",
+                healthy=False,
+                message=f"exited with code {self._process.exitcode}; restarting",
+            )
+            self.restarts += 1
+            await asyncio.sleep(self._restart_delay_s)
+
+    def stop(self, timeout_s: float = 5.0) -> None:
+        process, self._process = self._process, None
+        if process is None or not process.is_alive():
+            return
+        process.terminate()
+        process.join(timeout_s)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+
+def serve_api(config: AppConfig, parent_pid: int) -> None:
+    """Entry point of the API child process."""
+    asyncio.run(_serve_api(config, parent_pid))
+
+
+async def _serve_api(config: AppConfig, parent_pid: int) -> None:
+    setup_logging(config.global_.logging.level, config.global_.logging.json)
+    storage, api = config.global_.storage, config.global_.api
+    db = Database(
+        storage.sqlite_path,
+        pragmas=storage.sqlite,
+        read_pool_size=storage.read_pool_size,
+        read_only=True,
+    )
+    await db.connect()
+    workers = WorkerPool(
+        kind=config.global_.workers.kind, max_workers=config.global_.workers.max_workers
+    )
+    if storage.chunks.enabled:
+        db.use_chunk_store(
+            ChunkStore(
+                db,
+                chunk_s=storage.chunks.chunk_s,
+                retention_days=storage.chunks.retention_days,
+                row_retention_days=storage.retention_days,
+                pool=workers,
+            )
+        )
+    health = HealthRegistry()
+    telemetry = Telemetry()
+    device_status: dict[str, dict[str, Any]] = {}
+    live = LiveHub(max_subscribers=api.stream_max_clients)
+    mirror = LiveMirror(api.ipc_socket, live, telemetry, health, device_status, db)
+    mirror.start()
+    export_service = ExportService(
+        db, config.global_.export, [device.model_dump() for device in config.devices]
+    )
+    context = APIContext(
+        config=config,
+        db=db,
+        export_service=export_service,
+        health=health,
+        device_status=device_status,
+        workers=workers,
+        loop_lag=mirror.loop_lag,
+        maintenance=mirror.maintenance,
+        uplink=mirror.uplink,
+        history=HistoryStore(db, storage.export_parquet_dir, pool=workers),
+        live=live,
+        telemetry=telemetry,
+        allow_control=config.global_.enable_control,
+        dry_run=config.global_.dry_run,
+    )
+    server = create_server(context)
+
+    async def watch_parent() -> None:
+        # Exit instead of lingering as an orphan if the poller was killed outright.
+        while os.getppid() == parent_pid:
+            await asyncio.sleep(1.0)
+        server.should_exit = True
+
+    watchdog = asyncio.create_task(watch_parent(), name="api-parent-watch")
+    try:
+        await server.serve()
+    finally:
+        watchdog.cancel()
+        await mirror.stop()
+        await export_service.close()
+        await db.close()
+        workers.shutdown()
+
+
+__all__ = ["APIProcess", "create_server", "serve_api"]
@@ -1,19 +1,29 @@
 from __future__ import annotations
 
+import time
 from datetime import datetime, timezone
 from typing import Any, Dict
 
-import uvicorn
-
-from .api.app import APIContext, create_app
+from .api.app import APIContext
+from .api.ipc import LiveRelay
+from .api.live import LiveHub
+from .api.process import APIProcess, create_server
+from .core.executor import LoopLagMonitor, WorkerPool
 from .core.health import HealthRegistry
 from .core.scheduler import Scheduler
+from .core.telemetry import Telemetry
 from .drivers import create_driver
+from .export.service import ExportService
+from .store.chunks import ChunkStore
+from .store.compaction import ParquetCompactor
 from .store.database import Database
 from .store.exporter import ParquetExporter
+from .store.history import HistoryStore
+from .store.maintenance import SQLiteMaintenance
+from .store.tiered import WriteBuffer
 from .uplink.publisher import UplinkPublisher
-from .export.service import ExportService
 from .utils.config import AppConfig
+from .utils.http import create_client
 from .utils.logging import setup_logging
 
 
@@ -25,7 +35,39 @@ class EMSApp:
         self.scheduler = Scheduler(
             self.health, jitter_seconds=config.global_.scheduler.jitter_seconds
         )
-        self.db = Database(config.global_.storage.sqlite_path)
+        self.workers = WorkerPool(
+            kind=config.global_.workers.kind, max_workers=config.global_.workers.max_workers
+        )
+        self.loop_lag = LoopLagMonitor()
+        storage = config.global_.storage
+        self.db = Database(
+            storage.sqlite_path,
+            store_raw_registers=storage.store_raw_registers
+            or config.global_.export.include_raw_registers,
+            pragmas=storage.sqlite,
+            read_pool_size=storage.read_pool_size,
+        )
+        self.maintenance = SQLiteMaintenance(self.db, storage.maintenance, tz=config.plant.timezone)
+        self.write_buffer: WriteBuffer | None = None
+        if storage.tiered.enabled:
+            self.write_buffer = WriteBuffer(
+                self.db,
+                flush_interval_s=storage.tiered.flush_interval_s,
+                max_buffer_kb=storage.tiered.max_buffer_kb,
+                journal_path=storage.tiered.journal_path,
+                pool=self.workers,
+            )
+            self.db.use_write_buffer(self.write_buffer)
+        self.chunk_store: ChunkStore | None = None
+        if storage.chunks.enabled:
+            self.chunk_store = ChunkStore(
+                self.db,
+                chunk_s=storage.chunks.chunk_s,
+                retention_days=storage.chunks.retention_days,
+                row_retention_days=storage.retention_days,
+                pool=self.workers,
+            )
+            self.db.use_chunk_store(self.chunk_store)
         self.devices = [create_driver(device) for device in config.devices]
         self.device_status: Dict[str, Dict[str, Any]] = {
             device.device_config.id: {
@@ -37,17 +79,63 @@ class EMSApp:
             }
             for device in self.devices
         }
+        uplink = config.global_.uplink
+        # One keep-alive pool for every upstream sender; the export pushes need two slots.
+        self.http_client = create_client(
+            verify=uplink.tls_verify,
+            http2=uplink.http2,
+            max_connections=uplink.max_in_flight + 2,
+        )
         self.export_service = ExportService(
             self.db,
             config.global_.export,
             [device.model_dump() for device in config.devices],
+            client=self.http_client,
         )
-        self.uplink = UplinkPublisher(self.db, config.global_.uplink)
-        self.parquet_exporter = ParquetExporter(self.db, config.global_.storage.export_parquet_dir)
-        self._server: uvicorn.Server | None = None
+        self.uplink = UplinkPublisher(self.db, uplink, pool=self.workers, client=self.http_client)
+        self.parquet_exporter = ParquetExporter(
+            self.db, config.global_.storage.export_parquet_dir, pool=self.workers
+        )
+        self.history = HistoryStore(self.db, self.parquet_exporter.export_dir, pool=self.workers)
+        self.compactor: ParquetCompactor | None = None
+        if storage.compaction.enabled:
+            self.compactor = ParquetCompactor(
+                self.parquet_exporter.export_dir,
+                pool=self.workers,
+                monthly=storage.compaction.monthly,
+                row_group_size=storage.compaction.row_group_size,
+            )
+        self.telemetry = Telemetry()
+        self.live = LiveHub(max_subscribers=config.global_.api.stream_max_clients)
+        self.relay: LiveRelay | None = None
+        self.api_process: APIProcess | None = None
+        if config.global_.api.process == "separate":
+            self.relay = LiveRelay(
+                config.global_.api.ipc_socket,
+                self.live,
+                self.telemetry,
+                self.health,
+                self.device_status,
+                self.db,
+                loop_lag=self.loop_lag,
+                maintenance=self.maintenance,
+                uplink=self.uplink,
+                state_interval_s=config.global_.api.ipc_state_interval_s,
+            )
+            self.api_process = APIProcess(config, self.health)
 
     async def start(self) -> None:
         await self.db.connect()
+        self.loop_lag.start()
+        if self.write_buffer is not None:
+            replayed = await self.write_buffer.recover()
+            if replayed:
+                self.logger.warning("write_buffer_journal_replayed", rows=replayed)
+            self.scheduler.schedule_periodic(
+                name="storage_flush",
+                interval=self.write_buffer.flush_interval_s,
+                coro_factory=self.write_buffer.flush,
+            )
         try:
             await self.export_service.push_register_maps()
         except Exception as exc:  # noqa: BLE001
@@ -58,11 +146,26 @@ class EMSApp:
                 interval=device_config.poll_interval_s,
                 coro_factory=lambda d=device: self._poll_device(d),
             )
+        self.scheduler.schedule_periodic(
+            name="snapshot_push",
+            interval=self.config.global_.export.snapshot_push_interval_s,
+            coro_factory=self.export_service.push_snapshot,
+        )
+        self.scheduler.schedule_periodic(
+            name="register_map_push",
+            interval=self.config.global_.export.registermap_push_interval_s,
+            coro_factory=self.export_service.push_register_maps,
+        )
         self.scheduler.schedule_periodic(
             name="uplink",
             interval=self.config.global_.uplink.batch_period_s,
             coro_factory=self.uplink.publish_window,
         )
+        self.scheduler.schedule_periodic(
+            name="uplink_compaction",
+            interval=self.config.global_.uplink.backlog_compact_interval_s,
+            coro_factory=self.uplink.compact_backlog,
+        )
         self.scheduler.schedule_periodic(
             name="retention",
             interval=86400,
@@ -70,37 +173,68 @@ class EMSApp:
                 self.config.global_.storage.retention_days
             ),
         )
+        self.scheduler.schedule_periodic(
+            name="raw_register_retention",
+            interval=3600,
+            coro_factory=lambda: self.db.purge_old_raw_registers(
+                self.config.global_.storage.raw_register_retention_hours
+            ),
+        )
+        self.scheduler.schedule_periodic(
+            name="sqlite_maintenance",
+            interval=self.config.global_.storage.maintenance.interval_s,
+            coro_factory=self.maintenance.run,
+        )
+        if self.chunk_store is not None:
+            self.scheduler.schedule_periodic(
+                name="chunk_seal",
+                interval=self.config.global_.storage.chunks.chunk_s,
+                coro_factory=self.chunk_store.run,
+            )
         self.scheduler.schedule_periodic(
             name="parquet_export",
             interval=self.config.global_.storage.export_interval_s,
-            coro_factory=self.parquet_exporter.export_last_hour,
+            coro_factory=self.parquet_exporter.export,
         )
+        if self.compactor is not None:
+            self.scheduler.schedule_periodic(
+                name="parquet_compaction",
+                interval=self.config.global_.storage.compaction.interval_s,
+                coro_factory=self.compactor.run,
+            )
+        if self.api_process is not None and self.relay is not None:
+            await self.relay.start()
+            await self.api_process.run()
+            return
         api_context = APIContext(
             config=self.config,
             db=self.db,
             export_service=self.export_service,
             health=self.health,
             device_status=self.device_status,
+            maintenance=self.maintenance,
+            write_buffer=self.write_buffer,
+            workers=self.workers,
+            loop_lag=self.loop_lag,
+            history=self.history,
+            uplink=self.uplink,
+            live=self.live,
+            telemetry=self.telemetry,
             allow_control=self.config.global_.enable_control,
             dry_run=self.config.global_.dry_run,
         )
-        app = create_app(api_context)
-        config = uvicorn.Config(
-            app,
-            host=self.config.global_.api.bind_host,
-            port=self.config.global_.api.port,
-            log_config=None,
-            loop="asyncio",
-        )
-        self._server = uvicorn.Server(config)
-        await self._server.serve()
+        await create_server(api_context).serve()
 
     async def _poll_device(self, driver: Any) -> None:
         device_id = driver.device_id
+        measurements = None
+        started = time.perf_counter()
         try:
             measurements = await driver.read_points()
+            self.telemetry.record_poll(device_id, time.perf_counter() - started, measurements)
             if measurements:
                 await self.db.insert_measurements(measurements)
+                self.live.publish(measurements)
             self.device_status[device_id].update(
                 {
                     "healthy": True,
@@ -109,6 +243,8 @@ class EMSApp:
                 }
             )
         except Exception as exc:  # noqa: BLE001
+            if measurements is None:
+                self.telemetry.record_poll(device_id, time.perf_counter() - started, None)
             self.device_status[device_id].update(
                 {
                     "healthy": False,
@@ -119,9 +255,18 @@ class EMSApp:
             raise
 
     async def shutdown(self) -> None:
+        if self.api_process is not None:
+            self.api_process.stop()
+        if self.relay is not None:
+            await self.relay.close()
         await self.scheduler.shutdown()
         await self.uplink.close()
         await self.export_service.close()
+        if self.write_buffer is not None:
+            await self.write_buffer.flush()
+        await self.db.close()
+        await self.loop_lag.stop()
+        self.workers.shutdown()
 
 
 async def run_app(config: AppConfig) -> None:
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+BACKGROUND_NICE = 10
+
+
+@dataclass
+class WorkerPoolStats:
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+    busy_seconds: float = 0.0
+
+    def as_dict(self, max_workers: int) -> Dict[str, Any]:
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "queue_depth": max(self.in_flight - max_workers, 0),
+            "max_in_flight": self.max_in_flight,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+class WorkerPool:
+    """Shared executor for CPU-heavy jobs so they never run on the event loop."""
+
+    def __init__(self, kind: str = "thread", max_workers: int = 2) -> None:
+        if kind not in {"thread", "process"}:
+            raise ValueError(f"Unsupported worker pool kind {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ems-worker")
+        self._background = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="ems-background", initializer=_lower_priority
+        )
+        self._processes: Executor | None = None
+        if kind == "process":
+            self._processes = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        self.stats = WorkerPoolStats()
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self.stats.in_flight - self.max_workers, 0)
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await self._submit(self._processes or self._threads, fn, *args, **kwargs)
+
+    async def run_thread(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await self._submit(self._threads, fn, *args, **kwargs)
+
+    async def run_background(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run housekeeping work on a single niced thread so it yields CPU to polling."""
+        return await self._submit(self._background, fn, *args, **kwargs)
+
+    async def _submit(
+        self, executor: Executor, fn: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        loop = asyncio.get_running_loop()
+        stats = self.stats
+        stats.submitted += 1
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        started = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(executor, partial(fn, *args, **kwargs))
+        except Exception:
+            stats.failed += 1
+            raise
+        else:
+            stats.completed += 1
+            return result
+        finally:
+            stats.in_flight -= 1
+            stats.busy_seconds += time.perf_counter() - started
+
+    def shutdown(self) -> None:
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        self._background.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+
+
+def _lower_priority() -> None:
+    # On Linux a thread is its own scheduling entity, so this nices only this worker.
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), BACKGROUND_NICE)
+    except (AttributeError, OSError):
+        pass
+
+
+class LoopLagMonitor:
+    """Samples event-loop scheduling delay; ``max_lag_s`` is the peak over ``window_s``."""
+
+    def __init__(self, interval_s: float = 0.25, window_s: float = 60.0) -> None:
+        self._interval = interval_s
+        self._window = window_s
+        self._task: asyncio.Task[None] | None = None
+        self._samples: deque[tuple[float, float]] = deque()
+        self.last_lag_s = 0.0
+
+    @property
+    def max_lag_s(self) -> float:
+        return max((lag for _, lag in self._samples), default=self.last_lag_s)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._sample(), name="loop-lag-monitor")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def observe(self, lag_s: float, now: float) -> None:
+        self.last_lag_s = lag_s
+        self._samples.append((now, lag_s))
+        while self._samples[0][0] <= now - self._window:
+            self._samples.popleft()
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self._interval
+            await asyncio.sleep(self._interval)
+            now = loop.time()
+            self.observe(max(now - expected, 0.0), now)
+
+
+__all__ = ["LoopLagMonitor", "WorkerPool", "WorkerPoolStats"]
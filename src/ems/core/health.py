@@ -43,5 +43,18 @@ class HealthRegistry:
             for name, comp in self._components.items()
         }
 
+    def load(self, state: Dict[str, Any]) -> None:
+        """Replace all components with a snapshot produced by :meth:`as_dict`."""
+        self._components = {
+            name: ComponentHealth(
+                name=name,
+                healthy=item["healthy"],
+                message=item["message"],
+                last_heartbeat=datetime.fromisoformat(item["last_heartbeat"]),
+                extra=item["extra"],
+            )
+            for name, item in state.items()
+        }
+
 
 __all__ = ["HealthRegistry", "ComponentHealth"]
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Sequence
+
+from ..utils.models import Measurement, Quality
+
+
+@dataclass
+class DeviceTelemetry:
+    polls: int = 0
+    failures: int = 0
+    points_read: int = 0
+    decode_errors: int = 0
+    last_duration_s: float = 0.0
+    duration_sum_s: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "polls": self.polls,
+            "failures": self.failures,
+            "points_read": self.points_read,
+            "decode_errors": self.decode_errors,
+            "last_duration_s": round(self.last_duration_s, 4),
+        }
+
+
+class Telemetry:
+    """Plain counters updated once per poll or request and read at scrape time."""
+
+    def __init__(self) -> None:
+        self.devices: Dict[str, DeviceTelemetry] = {}
+        self.api_requests = 0
+
+    def record_poll(
+        self,
+        device_id: str,
+        duration_s: float,
+        measurements: Sequence[Measurement] | None,
+    ) -> None:
+        """Account one poll; ``measurements`` is ``None`` when the poll raised."""
+        stats = self.devices.get(device_id)
+        if stats is None:
+            stats = self.devices[device_id] = DeviceTelemetry()
+        stats.polls += 1
+        stats.last_duration_s = duration_s
+        stats.duration_sum_s += duration_s
+        if measurements is None:
+            stats.failures += 1
+            return
+        stats.points_read += len(measurements)
+        # Drivers mark values they could not decode or that fail quality rules as BAD.
+        stats.decode_errors += sum(
+            1 for m in measurements if m.value is None or m.quality is Quality.BAD
+        )
+
+    def state(self) -> Dict[str, Any]:
+        """Per-device counters as plain data, for mirroring into another process."""
+        return {device_id: asdict(stats) for device_id, stats in self.devices.items()}
+
+    def load(self, state: Dict[str, Any]) -> None:
+        self.devices = {device_id: DeviceTelemetry(**fields) for device_id, fields in state.items()}
+
+
+__all__ = ["DeviceTelemetry", "Telemetry"]
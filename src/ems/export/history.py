@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import io
+from typing import Any, AsyncGenerator, AsyncIterator, Sequence
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from sqlalchemy import Row
+
+from ..core.executor import WorkerPool
+
+HISTORY_SCHEMA = pa.schema(
+    [
+        pa.field("timestamp_utc", pa.timestamp("us", tz="UTC")),
+        pa.field("plant_id", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("device_id", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("metric", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("value", pa.float64()),
+        pa.field("unit", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("quality", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("source", pa.dictionary(pa.int32(), pa.string())),
+    ]
+)
+
+# format -> (media type, file extension)
+HISTORY_FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "csv": ("text/csv", "csv"),
+}
+
+
+def rows_to_batch(rows: Sequence[Row[Any]]) -> pa.RecordBatch:
+    """Convert rows shaped like ``MEASUREMENT_COLUMNS`` to a :data:`HISTORY_SCHEMA` batch."""
+    columns = list(zip(*rows)) if rows else [()] * 9
+    return pa.RecordBatch.from_arrays(
+        [
+            # SQLite drops tzinfo; naive values are read as UTC.
+            pa.array(columns[1], type=pa.timestamp("us", tz="UTC")),
+            *(
+                pa.array(columns[index], type=pa.string()).dictionary_encode()
+                for index in (2, 3, 4)
+            ),
+            pa.array(columns[5], type=pa.float64()),
+            *(
+                pa.array(columns[index], type=pa.string()).dictionary_encode()
+                for index in (6, 7, 8)
+            ),
+        ],
+        schema=HISTORY_SCHEMA,
+    )
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain."""
+
+    def __init__(self) -> None:
+        self._parts: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        chunk = bytes(data)
+        self._parts.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        # Parquet footers hold absolute offsets, so the position never resets.
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+class HistoryEncoder:
+    """Encodes measurement pages incrementally as Arrow IPC, Parquet or CSV."""
+
+    def __init__(self, format: str) -> None:
+        if format not in HISTORY_FORMATS:
+            raise ValueError(f"Unsupported history format {format}")
+        self.format = format
+        self.rows = 0
+        self._sink = _Sink()
+        self._file = pa.PythonFile(self._sink, mode="w")
+        if format == "arrow":
+            self._writer: Any = pa.ipc.new_stream(self._file, HISTORY_SCHEMA)
+        elif format == "parquet":
+            self._writer = pq.ParquetWriter(
+                self._file, HISTORY_SCHEMA, compression="zstd", use_dictionary=True
+            )
+        else:
+            self._writer = pa_csv.CSVWriter(self._file, HISTORY_SCHEMA)
+
+    def encode(self, rows: Sequence[Row[Any]]) -> bytes:
+        if rows:
+            self._writer.write_batch(rows_to_batch(rows))
+            self.rows += len(rows)
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+async def stream_history(
+    pages: AsyncGenerator[list[Row[Any]], None], format: str, pool: WorkerPool | None = None
+) -> AsyncIterator[bytes]:
+    """Encode pages from ``Database.stream_measurements`` as they arrive, on ``pool`` if given."""
+    encoder = HistoryEncoder(format)
+    try:
+        async for page in pages:
+            if pool is not None:
+                chunk = await pool.run_thread(encoder.encode, page)
+            else:
+                chunk = encoder.encode(page)
+            if chunk:
+                yield chunk
+        yield encoder.finish()
+    finally:
+        await pages.aclose()
+
+
+__all__ = [
+    "HISTORY_FORMATS",
+    "HISTORY_SCHEMA",
+    "HistoryEncoder",
+    "rows_to_batch",
+    "stream_history",
+]
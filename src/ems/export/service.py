@@ -1,35 +1,116 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
 import httpx
+import orjson
 
 from ..drivers.pointmap import load_point_map
 from ..store.database import Database
+from ..uplink.encoding import content_headers, encode_body
 from ..utils.config import ExportConfig
+from ..utils.http import create_client
+
+# Snapshots are cached per requested window; clients normally use one or two.
+MAX_CACHED_WINDOWS = 8
+
+
+@dataclass(frozen=True)
+class CachedPayload:
+    etag: str
+    body: bytes
+    payload: Any
+
+
+@dataclass
+class SnapshotPushStats:
+    pushes: int = 0
+    keyframes: int = 0
+    skipped: int = 0
+    values_sent: int = 0
+    bytes_sent: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "pushes": self.pushes,
+            "keyframes": self.keyframes,
+            "skipped": self.skipped,
+            "values_sent": self.values_sent,
+            "bytes_sent": self.bytes_sent,
+        }
 
 
 class ExportService:
+    """Serves cached snapshots and register maps to SCADA clients and the cloud."""
+
     def __init__(
-        self, db: Database, export_config: ExportConfig, devices: list[dict[str, Any]]
+        self,
+        db: Database,
+        export_config: ExportConfig,
+        devices: list[dict[str, Any]],
+        client: httpx.AsyncClient | None = None,
     ) -> None:
         self._db = db
         self._config = export_config
         self._devices = devices
-        self._client = httpx.AsyncClient(timeout=10.0, verify=True)
+        self._client = client or create_client()
+        # Distinguishes ETags across restarts, when the data version starts over.
+        self._epoch = os.urandom(4).hex()
+        self._snapshots: dict[int, tuple[tuple[int, int], CachedPayload]] = {}
+        self._snapshot_lock = asyncio.Lock()
+        self._catalogs: dict[bool, CachedPayload] = {}
+        self._pushed: dict[tuple[str, str], tuple[Any, ...]] = {}
+        self._push_seq = 0
+        self._keyframe_at: float | None = None
+        self.push_stats = SnapshotPushStats()
 
     async def close(self) -> None:
         await self._client.aclose()
 
     async def snapshot(self, window_s: int = 60) -> dict[str, Any]:
+        payload: dict[str, Any] = (await self.cached_snapshot(window_s)).payload
+        return payload
+
+    async def cached_snapshot(self, window_s: int = 60) -> CachedPayload:
+        """Return the current snapshot, rebuilding it only if its key has changed."""
+        if window_s <= 0:
+            raise ValueError("window_s must be positive")
+        key = (self._db.data_version, int(time.time() // window_s))
+        entry = self._snapshots.get(window_s)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        async with self._snapshot_lock:
+            # Concurrent pollers wait for the first rebuild instead of repeating it.
+            key = (self._db.data_version, int(time.time() // window_s))
+            entry = self._snapshots.get(window_s)
+            if entry is not None and entry[0] == key:
+                return entry[1]
+            payload = await self._build_snapshot(window_s)
+            cached = CachedPayload(
+                etag=f'"{self._epoch}-{window_s}-{key[0]}-{key[1]}"',
+                body=orjson.dumps(payload),
+                payload=payload,
+            )
+            self._snapshots.pop(window_s, None)
+            if len(self._snapshots) >= MAX_CACHED_WINDOWS:
+                del self._snapshots[next(iter(self._snapshots))]
+            self._snapshots[window_s] = (key, cached)
+            return cached
+
+    async def _build_snapshot(self, window_s: int) -> dict[str, Any]:
         cutoff = datetime.now(timezone.utc) - timedelta(seconds=window_s)
         records = await self._db.latest_measurements(since=cutoff)
         device_map: dict[str, dict[str, Any]] = {}
         for rec in records:
             device = device_map.setdefault(
                 rec.device_id,
-                {"device_id": rec.device_id, "metrics": [], "raw": {}},
+                {"device_id": rec.device_id, "metrics": []},
             )
             device["metrics"].append(
                 {
@@ -39,43 +120,165 @@ class ExportService:
                     "quality": rec.quality,
                 }
             )
-            if self._config.include_raw_registers and rec.raw is not None:
-                device.setdefault("raw", {})[rec.metric] = rec.raw
-            elif not self._config.include_raw_registers:
-                device.pop("raw", None)
+        if self._config.include_raw_registers:
+            raw = await self._db.latest_raw_registers(list(device_map))
+            for device_id, device in device_map.items():
+                device["raw"] = {
+                    metric: {"registers": registers}
+                    for metric, registers in raw.get(device_id, {}).items()
+                }
         return {
             "ts": datetime.now(timezone.utc).isoformat(),
             "devices": list(device_map.values()),
         }
 
+    async def push_snapshot(self) -> int:
+        """Push values changed since the last acknowledged push; returns how many."""
+        if not self._config.enable:
+            return 0
+        config = self._config
+        pushed_at = datetime.now(timezone.utc)
+        # One newest row per series, so neither a row cap nor repeated samples of busy
+        # series can make a quiet series drop out of the state between pushes.
+        rows = await self._db.latest_series(
+            since=pushed_at - timedelta(seconds=config.snapshot_window_s), limit=1
+        )
+        current: dict[tuple[str, str], tuple[Any, ...]] = {
+            (row.device_id, row.metric): (row.value, row.unit, row.quality) for row in rows
+        }
+        now = time.monotonic()
+        keyframe = (
+            self._keyframe_at is None
+            or now - self._keyframe_at >= config.snapshot_keyframe_interval_s
+        )
+        if keyframe:
+            changed = current
+            removed: list[tuple[str, str]] = []
+        else:
+            changed = {
+                key: value for key, value in current.items() if self._pushed.get(key) != value
+            }
+            removed = sorted(set(self._pushed) - set(current))
+            if not changed and not removed:
+                self.push_stats.skipped += 1
+                return 0
+        devices: dict[str, list[dict[str, Any]]] = {}
+        for (device_id, metric), (value, unit, quality) in changed.items():
+            devices.setdefault(device_id, []).append(
+                {"metric": metric, "value": value, "unit": unit, "quality": quality}
+            )
+        payload = {
+            "ts": pushed_at.isoformat(),
+            "seq": self._push_seq + 1,
+            "base_seq": None if keyframe else self._push_seq,
+            "keyframe": keyframe,
+            "devices": [
+                {"device_id": device_id, "metrics": metrics}
+                for device_id, metrics in devices.items()
+            ],
+            "removed": [
+                {"device_id": device_id, "metric": metric} for device_id, metric in removed
+            ],
+        }
+        body, _ = encode_body(payload, "json", config.snapshot_compression)
+        response = await self._client.post(
+            str(config.snapshot_url),
+            headers={
+                "Authorization": f"Bearer {config.auth_token}",
+                **content_headers("json", config.snapshot_compression),
+            },
+            content=body,
+        )
+        response.raise_for_status()
+        self._pushed = current
+        self._push_seq += 1
+        if keyframe:
+            self._keyframe_at = now
+            self.push_stats.keyframes += 1
+        self.push_stats.pushes += 1
+        self.push_stats.values_sent += len(changed)
+        self.push_stats.bytes_sent += len(body)
+        return len(changed)
+
     async def register_maps(self) -> dict[str, Any]:
-        payload: list[dict[str, Any]] = []
-        for device in self._devices:
-            point_map_path = device.get("point_map")
-            if not point_map_path:
-                continue
-            point_map = load_point_map(point_map_path)
-            payload.append(
-                {
-                    "device_id": device["id"],
-                    "make": device.get("make"),
-                    "model": device.get("model"),
-                    "protocol": device.get("protocol"),
-                    "map": point_map.payload,
-                    "hash": point_map.hash,
+        maps: dict[str, Any] = self.register_catalog().payload
+        return maps
+
+    def register_catalog(self, dedup: bool = False) -> CachedPayload:
+        """Return the point map catalog, inline or with ``dedup`` maps, serialized once."""
+        if dedup not in self._catalogs:
+            maps: dict[str, Any] = {}
+            devices: list[dict[str, Any]] = []
+            for device in self._devices:
+                point_map_path = device.get("point_map")
+                if not point_map_path:
+                    continue
+                point_map = load_point_map(point_map_path)
+                maps.setdefault(point_map.hash, point_map.payload)
+                devices.append(
+                    {
+                        "device_id": device["id"],
+                        "make": device.get("make"),
+                        "model": device.get("model"),
+                        "protocol": device.get("protocol"),
+                        "hash": point_map.hash,
+                    }
+                )
+            catalog_hash = hashlib.sha256(
+                orjson.dumps(devices, option=orjson.OPT_SORT_KEYS)
+            ).hexdigest()
+            payload: Any
+            if dedup:
+                payload = {"hash": catalog_hash, "maps": maps, "devices": devices}
+                etag = f'"{catalog_hash}-dedup"'
+            else:
+                payload = {
+                    "devices": [{**device, "map": maps[device["hash"]]} for device in devices]
                 }
+                etag = f'"{catalog_hash}"'
+            self._catalogs[dedup] = CachedPayload(
+                etag=etag,
+                # Point maps loaded from YAML may use integer keys.
+                body=orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS),
+                payload=payload,
             )
-        return {"devices": payload}
+        return self._catalogs[dedup]
 
-    async def push_register_maps(self) -> None:
+    async def push_register_maps(self) -> int:
+        """Push devices whose map changed since the last acknowledged push; returns how many."""
         if not self._config.enable:
-            return
-        payload = await self.register_maps()
-        await self._client.post(
+            return 0
+        catalog = self.register_catalog(dedup=True).payload
+        pushed = await self._db.register_map_pushes()
+        changed = [
+            device
+            for device in catalog["devices"]
+            if pushed.get(device["device_id"]) != device["hash"]
+        ]
+        current = {device["device_id"] for device in catalog["devices"]}
+        removed = sorted(set(pushed) - current)
+        if not changed and not removed:
+            return 0
+        payload = {
+            "hash": catalog["hash"],
+            "full": not pushed,
+            "maps": {device["hash"]: catalog["maps"][device["hash"]] for device in changed},
+            "devices": changed,
+            "removed": removed,
+        }
+        response = await self._client.post(
             str(self._config.registermap_url),
-            headers={"Authorization": f"Bearer {self._config.auth_token}"},
-            json=payload,
+            headers={
+                "Authorization": f"Bearer {self._config.auth_token}",
+                "Content-Type": "application/json",
+            },
+            content=orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS),
+        )
+        response.raise_for_status()
+        await self._db.record_register_map_pushes(
+            {device["device_id"]: device["hash"] for device in changed}, removed
         )
+        return len(changed)
 
 
-__all__ = ["ExportService"]
+__all__ = ["CachedPayload", "ExportService", "SnapshotPushStats"]
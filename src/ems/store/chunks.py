@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import AsyncGenerator, Sequence
+
+import numpy as np
+from numpy.typing import NDArray
+from sqlalchemy import DateTime, Index, Integer, LargeBinary, String, delete, func, select
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..core.executor import WorkerPool
+from .database import Base, Database, MeasurementRecord
+
+CHUNK_VERSION = 1
+
+_HEADER = struct.Struct(">BIqQ")
+
+# Delta-of-delta buckets for millisecond timestamps: (control bits, control width, value bits).
+_DOD_BUCKETS = (
+    (0b10, 2, 7),
+    (0b110, 3, 9),
+    (0b1110, 4, 12),
+    (0b11110, 5, 20),
+)
+
+
+class _BitWriter:
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._acc = 0
+        self._bits = 0
+
+    def write(self, value: int, nbits: int) -> None:
+        self._acc = (self._acc << nbits) | (value & ((1 << nbits) - 1))
+        self._bits += nbits
+        while self._bits >= 8:
+            self._bits -= 8
+            self._buf.append((self._acc >> self._bits) & 0xFF)
+        self._acc &= (1 << self._bits) - 1
+
+    def getvalue(self) -> bytes:
+        if self._bits:
+            return bytes(self._buf) + bytes([(self._acc << (8 - self._bits)) & 0xFF])
+        return bytes(self._buf)
+
+
+class _BitReader:
+    def __init__(self, data: bytes, offset: int) -> None:
+        self._data = data
+        self._pos = offset * 8
+
+    def read(self, nbits: int) -> int:
+        start = self._pos >> 3
+        end = (self._pos + nbits + 7) >> 3
+        word = int.from_bytes(self._data[start:end], "big")
+        shift = end * 8 - (self._pos + nbits)
+        self._pos += nbits
+        return (word >> shift) & ((1 << nbits) - 1)
+
+
+def _float_bits(value: float) -> int:
+    return int(struct.unpack(">Q", struct.pack(">d", value))[0])
+
+
+def _bits_float(bits: int) -> float:
+    return float(struct.unpack(">d", struct.pack(">Q", bits))[0])
+
+
+def _leading_zeros(value: int) -> int:
+    return 64 - value.bit_length()
+
+
+def _trailing_zeros(value: int) -> int:
+    return (value & -value).bit_length() - 1
+
+
+def encode_chunk(timestamps_ms: Sequence[int], values: Sequence[float]) -> bytes:
+    """Encode ascending epoch-ms timestamps and values (NaN for missing) as one chunk."""
+    count = len(timestamps_ms)
+    if count != len(values):
+        raise ValueError("timestamps and values must have the same length")
+    if count == 0:
+        return _HEADER.pack(CHUNK_VERSION, 0, 0, 0)
+    first_ts = int(timestamps_ms[0])
+    first_bits = _float_bits(float(values[0]))
+    writer = _BitWriter()
+    prev_ts, prev_delta = first_ts, 0
+    prev_bits, prev_lead, prev_trail = first_bits, -1, 0
+    for ts, value in zip(timestamps_ms[1:], values[1:]):
+        delta = int(ts) - prev_ts
+        dod = delta - prev_delta
+        if dod == 0:
+            writer.write(0, 1)
+        else:
+            for control, control_bits, value_bits in _DOD_BUCKETS:
+                if -(1 << (value_bits - 1)) < dod <= 1 << (value_bits - 1):
+                    writer.write(control, control_bits)
+                    writer.write(dod - 1 if dod > 0 else dod, value_bits)
+                    break
+            else:
+                writer.write(0b11111, 5)
+                writer.write(dod, 64)
+        prev_ts, prev_delta = int(ts), delta
+
+        bits = _float_bits(float(value))
+        xor = bits ^ prev_bits
+        if xor == 0:
+            writer.write(0, 1)
+        else:
+            lead = min(_leading_zeros(xor), 31)
+            trail = _trailing_zeros(xor)
+            writer.write(1, 1)
+            if prev_lead >= 0 and lead >= prev_lead and trail >= prev_trail:
+                writer.write(0, 1)
+                writer.write(xor >> prev_trail, 64 - prev_lead - prev_trail)
+            else:
+                meaningful = 64 - lead - trail
+                writer.write(1, 1)
+                writer.write(lead, 5)
+                writer.write(meaningful & 0x3F, 6)
+                writer.write(xor >> trail, meaningful)
+                prev_lead, prev_trail = lead, trail
+        prev_bits = bits
+    return _HEADER.pack(CHUNK_VERSION, count, first_ts, first_bits) + writer.getvalue()
+
+
+def decode_chunk(blob: bytes) -> tuple[NDArray[np.int64], NDArray[np.float64]]:
+    """Decode a chunk into ``(timestamps_ms int64, values float64)`` arrays."""
+    version, count, first_ts, first_bits = _HEADER.unpack_from(blob, 0)
+    if version != CHUNK_VERSION:
+        raise ValueError(f"Unsupported chunk version {version}")
+    timestamps = np.empty(count, dtype=np.int64)
+    values = np.empty(count, dtype=np.float64)
+    if count == 0:
+        return timestamps, values
+    reader = _BitReader(blob, _HEADER.size)
+    timestamps[0] = ts = first_ts
+    values[0] = _bits_float(first_bits)
+    delta, bits, lead, trail = 0, first_bits, 0, 0
+    for i in range(1, count):
+        if reader.read(1) == 0:
+            dod = 0
+        else:
+            for _, control_bits, value_bits in _DOD_BUCKETS:
+                if reader.read(1) == 0:
+                    raw = reader.read(value_bits)
+                    if raw >= 1 << (value_bits - 1):
+                        raw -= 1 << value_bits
+                    dod = raw + 1 if raw >= 0 else raw
+                    break
+            else:
+                dod = reader.read(64)
+                if dod >= 1 << 63:
+                    dod -= 1 << 64
+        delta += dod
+        ts += delta
+        timestamps[i] = ts
+
+        if reader.read(1) == 1:
+            if reader.read(1) == 1:
+                lead = reader.read(5)
+                meaningful = reader.read(6) or 64
+                trail = 64 - lead - meaningful
+            bits ^= reader.read(64 - lead - trail) << trail
+        values[i] = _bits_float(bits)
+    return timestamps, values
+
+
+def encode_chunks(items: Sequence[tuple[Sequence[int], Sequence[float]]]) -> list[bytes]:
+    """Encode many series at once; module-level so it can run in a process pool."""
+    return [encode_chunk(timestamps, values) for timestamps, values in items]
+
+
+class SeriesChunkRecord(Base):
+    """One sealed, compressed time chunk of a single device/metric series."""
+
+    __tablename__ = "series_chunks"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    device_id: Mapped[str] = mapped_column(String(64))
+    metric: Mapped[str] = mapped_column(String(128))
+    unit: Mapped[str | None] = mapped_column(String(32))
+    chunk_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+    chunk_end: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    count: Mapped[int] = mapped_column(Integer)
+    payload: Mapped[bytes] = mapped_column(LargeBinary)
+
+    __table_args__ = (
+        Index("idx_series_chunks_device_metric_start", "device_id", "metric", "chunk_start"),
+    )
+
+
+def _epoch_ms(ts: datetime) -> int:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(ts.timestamp() * 1000)
+
+
+def _from_epoch_ms(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+class ChunkStore:
+    """Long-term series storage that packs measurement rows into compressed chunks."""
+
+    def __init__(
+        self,
+        db: Database,
+        chunk_s: int = 3600,
+        retention_days: int = 365,
+        row_retention_days: int = 30,
+        max_chunks_per_run: int = 24,
+        pool: WorkerPool | None = None,
+    ) -> None:
+        self._db = db
+        self._pool = pool
+        self._chunk_s = chunk_s
+        self._retention_days = retention_days
+        self._row_retention_days = row_retention_days
+        self._max_chunks_per_run = max_chunks_per_run
+
+    def horizon(self) -> datetime:
+        """Oldest timestamp the measurements table keeps once its rows are sealed."""
+        return datetime.now(timezone.utc) - timedelta(days=self._row_retention_days)
+
+    async def sealed_end(self) -> datetime | None:
+        """End of the newest sealed chunk window, or None before the first seal."""
+        async with self._db.read_session() as session:
+            last_end = await session.scalar(select(func.max(SeriesChunkRecord.chunk_end)))
+        return last_end.replace(tzinfo=timezone.utc) if last_end is not None else None
+
+    async def boundary(self) -> datetime | None:
+        """Reads before this timestamp come from chunks, later ones from rows."""
+        sealed_end = await self.sealed_end()
+        return min(self.horizon(), sealed_end) if sealed_end is not None else None
+
+    def _floor(self, ts: datetime) -> datetime:
+        ms = _epoch_ms(ts)
+        step = self._chunk_s * 1000
+        return _from_epoch_ms(ms - ms % step)
+
+    async def _next_window_start(self) -> datetime | None:
+        last_end = await self.sealed_end()
+        if last_end is not None:
+            return last_end
+        async with self._db.read_session() as session:
+            first_ts = await session.scalar(select(func.min(MeasurementRecord.timestamp_utc)))
+        return self._floor(first_ts) if first_ts is not None else None
+
+    async def seal(self, now: datetime | None = None) -> int:
+        """Pack closed chunk windows not yet sealed. Returns the number of chunks written."""
+        now = now or datetime.now(timezone.utc)
+        sealed_until = self._floor(now) - timedelta(seconds=self._chunk_s)
+        window_start = await self._next_window_start()
+        written = 0
+        for _ in range(self._max_chunks_per_run):
+            if window_start is None or window_start >= sealed_until:
+                break
+            window_end = window_start + timedelta(seconds=self._chunk_s)
+            sealed = await self._seal_window(window_start, window_end)
+            written += sealed
+            window_start = window_end if sealed else await self._next_data_window(window_end)
+        return written
+
+    async def _next_data_window(self, after: datetime) -> datetime | None:
+        async with self._db.read_session() as session:
+            next_ts = await session.scalar(
+                select(func.min(MeasurementRecord.timestamp_utc)).where(
+                    MeasurementRecord.timestamp_utc >= after
+                )
+            )
+        return self._floor(next_ts) if next_ts is not None else None
+
+    async def _seal_window(self, start: datetime, end: datetime) -> int:
+        async with self._db.read_session() as session:
+            result = await session.execute(
+                select(
+                    MeasurementRecord.device_id,
+                    MeasurementRecord.metric,
+                    MeasurementRecord.unit,
+                    MeasurementRecord.timestamp_utc,
+                    MeasurementRecord.value,
+                )
+                .where(
+                    MeasurementRecord.timestamp_utc >= start,
+                    MeasurementRecord.timestamp_utc < end,
+                )
+                .order_by(
+                    MeasurementRecord.device_id,
+                    MeasurementRecord.metric,
+                    MeasurementRecord.timestamp_utc,
+                )
+            )
+            rows = result.all()
+        series: dict[tuple[str, str], tuple[str | None, list[int], list[float]]] = {}
+        for device_id, metric, unit, ts, value in rows:
+            _, stamps, values = series.setdefault((device_id, metric), (unit, [], []))
+            stamps.append(_epoch_ms(ts))
+            values.append(float("nan") if value is None else value)
+        items = [(stamps, values) for _, stamps, values in series.values()]
+        if self._pool is not None:
+            payloads = await self._pool.run(encode_chunks, items)
+        else:
+            payloads = encode_chunks(items)
+        records = [
+            SeriesChunkRecord(
+                device_id=device_id,
+                metric=metric,
+                unit=unit,
+                chunk_start=start,
+                chunk_end=end,
+                count=len(stamps),
+                payload=payload,
+            )
+            for ((device_id, metric), (unit, stamps, _)), payload in zip(series.items(), payloads)
+        ]
+        if not records:
+            return 0
+        async with self._db.session() as session:
+            session.add_all(records)
+            await session.commit()
+        return len(records)
+
+    async def read(
+        self, device_id: str, metric: str, start: datetime, end: datetime
+    ) -> tuple[NDArray[np.int64], NDArray[np.float64]]:
+        """Decode all samples of a series in ``[start, end)`` into NumPy arrays."""
+        async with self._db.read_session() as session:
+            result = await session.execute(
+                select(SeriesChunkRecord.payload)
+                .where(
+                    SeriesChunkRecord.device_id == device_id,
+                    SeriesChunkRecord.metric == metric,
+                    SeriesChunkRecord.chunk_start < end,
+                    SeriesChunkRecord.chunk_end > start,
+                )
+                .order_by(SeriesChunkRecord.chunk_start)
+            )
+            payloads = result.scalars().all()
+        return _slice(payloads, _epoch_ms(start), _epoch_ms(end))
+
+    async def iter_chunks(
+        self,
+        device_ids: Sequence[str] | None,
+        metrics: Sequence[str] | None,
+        start: datetime,
+        end: datetime,
+        limit: int | None = None,
+    ) -> AsyncGenerator[tuple[str, str, str | None, NDArray[np.int64], NDArray[np.float64]], None]:
+        """Decode matching chunks in ``[start, end)`` one at a time, by series and time."""
+        stmt = select(
+            SeriesChunkRecord.device_id,
+            SeriesChunkRecord.metric,
+            SeriesChunkRecord.unit,
+            SeriesChunkRecord.payload,
+        ).where(SeriesChunkRecord.chunk_start < end, SeriesChunkRecord.chunk_end > start)
+        if device_ids:
+            stmt = stmt.where(SeriesChunkRecord.device_id.in_(device_ids))
+        if metrics:
+            stmt = stmt.where(SeriesChunkRecord.metric.in_(metrics))
+        stmt = stmt.order_by(
+            SeriesChunkRecord.device_id, SeriesChunkRecord.metric, SeriesChunkRecord.chunk_start
+        )
+        start_ms, end_ms = _epoch_ms(start), _epoch_ms(end)
+        series: tuple[str, str] | None = None
+        samples = 0
+        async with self._db.read_session() as session:
+            result = await session.stream(stmt)
+            async for device_id, metric, unit, payload in result:
+                if (device_id, metric) != series:
+                    series, samples = (device_id, metric), 0
+                if limit is not None and samples >= limit:
+                    continue
+                timestamps, values = _slice([payload], start_ms, end_ms)
+                if limit is not None:
+                    timestamps, values = timestamps[: limit - samples], values[: limit - samples]
+                samples += len(timestamps)
+                yield device_id, metric, unit, timestamps, values
+
+    async def purge(self) -> None:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self._retention_days)
+        async with self._db.session() as session:
+            await session.execute(
+                delete(SeriesChunkRecord).where(SeriesChunkRecord.chunk_end < cutoff)
+            )
+            await session.commit()
+
+    async def run(self) -> None:
+        await self.seal()
+        await self.purge()
+
+
+def _slice(
+    payloads: Sequence[bytes], start_ms: int, end_ms: int
+) -> tuple[NDArray[np.int64], NDArray[np.float64]]:
+    if not payloads:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    decoded = [decode_chunk(payload) for payload in payloads]
+    timestamps = np.concatenate([ts for ts, _ in decoded])
+    values = np.concatenate([vals for _, vals in decoded])
+    mask = (timestamps >= start_ms) & (timestamps < end_ms)
+    return timestamps[mask], values[mask]
+
+
+__all__ = ["ChunkStore", "SeriesChunkRecord", "decode_chunk", "encode_chunk", "encode_chunks"]
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from ..core.executor import WorkerPool
+
+MARKER = "_compaction.json"
+
+
+@dataclass
+class CompactionStats:
+    partitions: int = 0
+    files_in: int = 0
+    rows: int = 0
+    recovered: int = 0
+    last_run_utc: datetime | None = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "partitions": self.partitions,
+            "files_in": self.files_in,
+            "rows": self.rows,
+            "recovered": self.recovered,
+            "last_run_utc": self.last_run_utc.isoformat() if self.last_run_utc else None,
+        }
+
+
+def _data_files(directory: Path) -> list[Path]:
+    return sorted(p for p in directory.glob("*.parquet") if not p.name.startswith((".", "_")))
+
+
+def sort_for_archive(table: pa.Table) -> pa.Table:
+    """Order rows by metric then time so row-group statistics prune well."""
+    keys = pa.table(
+        {
+            "metric": table.column("metric").cast(pa.string()),
+            "timestamp_utc": table.column("timestamp_utc"),
+        }
+    )
+    indices = pc.sort_indices(
+        keys, sort_keys=[("metric", "ascending"), ("timestamp_utc", "ascending")]
+    )
+    return table.take(indices)
+
+
+def _drop_repeats(table: pa.Table) -> pa.Table:
+    # A crash between committing part files and saving the export watermark re-exports
+    # those rows; within one device and metric, a repeated timestamp is such a copy.
+    micros = pc.cast(table.column("timestamp_utc"), pa.int64()).to_numpy(zero_copy_only=False)
+    if len(micros) < 2:
+        return table
+    keep = np.r_[True, micros[1:] != micros[:-1]]
+    return table if keep.all() else table.filter(pa.array(keep))
+
+
+def _metric_filters(dataset: ds.Dataset, batch_size: int) -> list[pc.Expression]:
+    metrics: set[str | None] = set()
+    for batch in dataset.to_batches(columns=["metric"], batch_size=batch_size):
+        metrics.update(pc.unique(batch.column("metric").cast(pa.string())).to_pylist())
+    filters = [pc.field("metric") == m for m in sorted(m for m in metrics if m is not None)]
+    if None in metrics:
+        filters.append(pc.field("metric").is_null())
+    return filters
+
+
+def compact_files(inputs: list[Path], output: Path, row_group_size: int) -> int:
+    """Merge ``inputs`` into ``output`` atomically and delete the inputs."""
+    schema = pa.unify_schemas(
+        [pq.read_schema(path) for path in inputs], promote_options="permissive"
+    )
+    dataset = ds.dataset([str(path) for path in inputs], schema=schema, format="parquet")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(f".{output.name}.tmp")
+    rows = 0
+    pending: list[pa.Table] = []
+    pending_rows = 0
+    with pq.ParquetWriter(
+        tmp, schema, compression="zstd", use_dictionary=True, write_statistics=True
+    ) as writer:
+        for metric_filter in _metric_filters(dataset, row_group_size):
+            part = _drop_repeats(sort_for_archive(dataset.to_table(filter=metric_filter)))
+            rows += part.num_rows
+            pending.append(part)
+            pending_rows += part.num_rows
+            if pending_rows < row_group_size:
+                continue
+            # Keep row groups full across metric boundaries, as a single sorted write would.
+            merged = pa.concat_tables(pending)
+            full = pending_rows - pending_rows % row_group_size
+            writer.write_table(merged.slice(0, full), row_group_size=row_group_size)
+            pending, pending_rows = [merged.slice(full)], pending_rows - full
+        if pending_rows:
+            writer.write_table(pa.concat_tables(pending), row_group_size=row_group_size)
+    marker = output.parent / MARKER
+    marker_tmp = output.parent / f".{MARKER}.tmp"
+    marker_tmp.write_text(
+        json.dumps({"output": output.name, "tmp": tmp.name, "inputs": [str(p) for p in inputs]})
+    )
+    os.replace(marker_tmp, marker)
+    os.replace(tmp, output)
+    _finish(marker, output, inputs)
+    return rows
+
+
+def _finish(marker: Path, output: Path, inputs: list[Path]) -> None:
+    for path in inputs:
+        if path != output:
+            path.unlink(missing_ok=True)
+            _prune_empty(path.parent)
+    marker.unlink(missing_ok=True)
+
+
+def _prune_empty(directory: Path) -> None:
+    for candidate in (directory, directory.parent):
+        try:
+            candidate.rmdir()
+        except OSError:
+            return
+
+
+def recover_marker(marker: Path) -> None:
+    """Complete or roll back a compaction interrupted by a crash."""
+    state = json.loads(marker.read_text())
+    tmp = marker.parent / state["tmp"]
+    if tmp.exists():
+        # Crashed before the rename: inputs are untouched, discard the partial output.
+        tmp.unlink()
+        marker.unlink()
+        return
+    _finish(marker, marker.parent / state["output"], [Path(p) for p in state["inputs"]])
+
+
+class ParquetCompactor:
+    """Merges the exporter's small per-run files into one sorted file per closed day."""
+
+    def __init__(
+        self,
+        export_dir: str | Path,
+        pool: WorkerPool | None = None,
+        monthly: bool = False,
+        row_group_size: int = 131072,
+    ) -> None:
+        self._dir = Path(export_dir)
+        self._pool = pool
+        self._monthly = monthly
+        self._row_group_size = row_group_size
+        self.stats = CompactionStats()
+
+    async def _offload(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._pool is None:
+            return fn(*args)
+        return await self._pool.run_background(fn, *args)
+
+    async def run(self, today: date | None = None) -> int:
+        today = today or datetime.now(timezone.utc).date()
+        for marker in self._dir.glob(f"date=*/device_id=*/{MARKER}"):
+            await self._offload(recover_marker, marker)
+            self.stats.recovered += 1
+        for pattern in ("day-*.parquet.tmp", "month-*.parquet.tmp"):
+            # Crashed while writing, before the marker existed: nothing else to undo.
+            for stray in self._dir.glob(f"date=*/device_id=*/.{pattern}"):
+                stray.unlink(missing_ok=True)
+        compacted = await self._compact_days(today)
+        if self._monthly:
+            compacted += await self._compact_months(today)
+        self.stats.last_run_utc = datetime.now(timezone.utc)
+        return compacted
+
+    async def _compact_days(self, today: date) -> int:
+        compacted = 0
+        for day_dir in sorted(self._dir.glob("date=????-??-??")):
+            day = date.fromisoformat(day_dir.name.split("=", 1)[1])
+            if day >= today:
+                continue
+            for device_dir in sorted(day_dir.glob("device_id=*")):
+                output = device_dir / f"day-{day:%Y%m%d}.parquet"
+                inputs = _data_files(device_dir)
+                if not inputs or inputs == [output]:
+                    continue
+                compacted += await self._compact(inputs, output)
+        return compacted
+
+    async def _compact_months(self, today: date) -> int:
+        current_month = f"{today:%Y-%m}"
+        inputs_by_target: dict[tuple[str, str], list[Path]] = {}
+        for device_dir in sorted(self._dir.glob("date=????-??-??/device_id=*")):
+            month = device_dir.parent.name.split("=", 1)[1][:7]
+            if month >= current_month:
+                continue
+            inputs_by_target.setdefault((month, device_dir.name), []).extend(
+                _data_files(device_dir)
+            )
+        compacted = 0
+        for (month, device_part), inputs in inputs_by_target.items():
+            device_dir = self._dir / f"date={month}" / device_part
+            output = device_dir / f"month-{month.replace('-', '')}.parquet"
+            compacted += await self._compact(_data_files(device_dir) + inputs, output)
+        return compacted
+
+    async def _compact(self, inputs: list[Path], output: Path) -> int:
+        rows = await self._offload(compact_files, inputs, output, self._row_group_size)
+        self.stats.partitions += 1
+        self.stats.files_in += len(inputs)
+        self.stats.rows += rows
+        return 1
+
+
+__all__ = [
+    "CompactionStats",
+    "ParquetCompactor",
+    "compact_files",
+    "recover_marker",
+    "sort_for_archive",
+]
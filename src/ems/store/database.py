@@ -1,10 +1,38 @@
 from __future__ import annotations
 
+import time
+from bisect import bisect_right
+from contextlib import AbstractAsyncContextManager, nullcontext
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Sequence
+from typing import TYPE_CHECKING, Any, AsyncGenerator, AsyncIterator, NamedTuple, Sequence
 
-from sqlalchemy import JSON, Boolean, DateTime, Float, Index, Integer, MetaData, String, select
+import numpy as np
+from numpy.typing import NDArray
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    ColumnElement,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    LargeBinary,
+    MetaData,
+    Row,
+    Select,
+    String,
+    case,
+    cast,
+    delete,
+    event,
+    func,
+    literal,
+    select,
+    tuple_,
+    update,
+)
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -12,8 +40,15 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from ..utils.config import SQLitePragmaConfig
 from ..utils.models import Measurement
+from .raw_registers import pack_register_block, unpack_register_block
+
+if TYPE_CHECKING:
+    from .chunks import ChunkStore
+    from .tiered import WriteBuffer
 
 metadata = MetaData()
 
@@ -34,13 +69,55 @@ class MeasurementRecord(Base):
     unit: Mapped[str | None] = mapped_column(String(32))
     quality: Mapped[str] = mapped_column(String(16))
     source: Mapped[str] = mapped_column(String(64))
-    raw: Mapped[dict | None] = mapped_column(JSON, nullable=True)
 
+    # AUTOINCREMENT keeps SQLite from reusing ids of deleted rows, which the Parquet
+    # exporter's id watermark relies on.
     __table_args__ = (
         Index("idx_measurements_device_metric_ts", "device_id", "metric", "timestamp_utc"),
+        {"sqlite_autoincrement": True},
     )
 
 
+class ExportWatermarkRecord(Base):
+    """Highest measurement id already handed to a named exporter."""
+
+    __tablename__ = "export_watermarks"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    last_id: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+
+class RegisterMapPushRecord(Base):
+    """Point map hash last acknowledged upstream for each device."""
+
+    __tablename__ = "registermap_pushes"
+
+    device_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    hash: Mapped[str] = mapped_column(String(64))
+    pushed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+
+class RawRegisterBlockRecord(Base):
+    """Raw registers of one device poll, packed into a single binary block."""
+
+    __tablename__ = "raw_register_blocks"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    timestamp_utc: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+    device_id: Mapped[str] = mapped_column(String(64))
+    payload: Mapped[bytes] = mapped_column(LargeBinary)
+
+    __table_args__ = (Index("idx_raw_register_blocks_device_ts", "device_id", "timestamp_utc"),)
+
+    def registers(self) -> dict[str, list[int]]:
+        return unpack_register_block(self.payload)
+
+
 class UplinkQueueRecord(Base):
     __tablename__ = "uplink_queue"
 
@@ -52,28 +129,245 @@ class UplinkQueueRecord(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+    # Encoded, compressed request body; ``payload`` then only holds the batch header.
+    body: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    content_type: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    content_encoding: Mapped[str | None] = mapped_column(String(16), nullable=True)
+
+
+# Ordered from best to worst; window aggregates report the worst quality seen.
+QUALITY_RANK = ("GOOD", "UNCERTAIN", "BAD")
+
+# How far back ``latest_series`` looks when no ``since`` is given.
+LATEST_SERIES_WINDOW = timedelta(hours=24)
+
+# Id given to rows still in the write buffer; they sort after committed rows of the
+# same timestamp, so a ``(timestamp_utc, id)`` cursor stays valid across a flush.
+BUFFERED_ID = 2**63 - 1
+
+
+class BufferedRow(NamedTuple):
+    """A write-buffered measurement shaped like a :data:`MEASUREMENT_COLUMNS` row."""
+
+    id: int
+    timestamp_utc: datetime
+    plant_id: str
+    device_id: str
+    metric: str
+    value: float | None
+    unit: str | None
+    quality: str
+    source: str | None
+
+
+@dataclass(frozen=True)
+class WindowAggregate:
+    """One series bucket yielded by :meth:`Database.iter_window_aggregates`."""
+
+    device_id: str
+    metric: str
+    bucket: int
+    plant_id: str
+    unit: str | None
+    avg: float | None
+    min: float | None
+    max: float | None
+    last: float | None
+    count: int
+    quality_rank: int
+    last_ts: datetime
+
+
+MEASUREMENT_COLUMNS = (
+    MeasurementRecord.id,
+    MeasurementRecord.timestamp_utc,
+    MeasurementRecord.plant_id,
+    MeasurementRecord.device_id,
+    MeasurementRecord.metric,
+    MeasurementRecord.value,
+    MeasurementRecord.unit,
+    MeasurementRecord.quality,
+    MeasurementRecord.source,
+)
+
+
+@dataclass
+class WriteStats:
+    commits: int = 0
+    rows: int = 0
+    seconds_sum: float = 0.0
+    last_s: float = 0.0
+    max_s: float = 0.0
 
 
 class Database:
-    def __init__(self, path: str) -> None:
+    def __init__(
+        self,
+        path: str,
+        store_raw_registers: bool = False,
+        pragmas: SQLitePragmaConfig | None = None,
+        read_pool_size: int = 4,
+        read_only: bool = False,
+    ) -> None:
         self._path = Path(path)
+        self.read_only = read_only
+        self._store_raw_registers = store_raw_registers
+        self._pragmas = pragmas or SQLitePragmaConfig()
+        self._read_pool_size = read_pool_size
         self._engine: AsyncEngine | None = None
+        self._read_engine: AsyncEngine | None = None
         self._session_factory: async_sessionmaker[AsyncSession] | None = None
+        self._read_session_factory: async_sessionmaker[AsyncSession] | None = None
+        self._chunk_store: ChunkStore | None = None
+        self._write_buffer: WriteBuffer | None = None
+        # Bumped on every measurement write so readers can cache derived views.
+        self.data_version = 0
+        self.write_stats = WriteStats()
+
+    def use_write_buffer(self, buffer: WriteBuffer) -> None:
+        """Send ``insert_measurements`` through a RAM-first buffer flushed in batches."""
+        self._write_buffer = buffer
+
+    def use_chunk_store(self, store: ChunkStore) -> None:
+        """Route reads older than the live table's retention to a chunk store."""
+        self._chunk_store = store
+
+    @property
+    def chunk_store(self) -> ChunkStore | None:
+        return self._chunk_store
 
     async def connect(self) -> None:
+        if not self.read_only:
+            await self._connect_writer()
+        self._read_engine = create_async_engine(
+            f"sqlite+aiosqlite:///file:{self._path.resolve()}?mode=ro&uri=true",
+            echo=False,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=self._read_pool_size,
+            max_overflow=0,
+        )
+        event.listen(self._read_engine.sync_engine, "connect", self._configure_reader)
+        self._read_session_factory = async_sessionmaker(self._read_engine, expire_on_commit=False)
+        if self.read_only:
+            # Another process owns the writer; anything that writes fails in SQLite.
+            self._session_factory = self._read_session_factory
+
+    async def _connect_writer(self) -> None:
         self._path.parent.mkdir(parents=True, exist_ok=True)
-        db_url = f"sqlite+aiosqlite:///{self._path}"
-        self._engine = create_async_engine(db_url, echo=False, pool_pre_ping=True)
+        # A single pooled connection serialises all writes; WAL lets the read-only
+        # pool run history/export/uplink scans concurrently without blocking it.
+        self._engine = create_async_engine(
+            f"sqlite+aiosqlite:///{self._path}",
+            echo=False,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+        )
+        event.listen(self._engine.sync_engine, "connect", self._configure_writer)
         async with self._engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_ensure_columns)
+            await conn.run_sync(_ensure_autoincrement)
         self._session_factory = async_sessionmaker(self._engine, expire_on_commit=False)
-        await self._enable_wal()
 
-    async def _enable_wal(self) -> None:
-        assert self._engine is not None
-        async with self._engine.begin() as conn:
-            await conn.exec_driver_sql("PRAGMA journal_mode=WAL;")
-            await conn.exec_driver_sql("PRAGMA synchronous=NORMAL;")
+    async def close(self) -> None:
+        for engine in (self._read_engine, self._engine):
+            if engine is not None:
+                await engine.dispose()
+        self._engine = self._read_engine = None
+        self._session_factory = self._read_session_factory = None
+
+    def _apply_pragmas(self, dbapi_conn: Any, statements: Sequence[str]) -> None:
+        cursor = dbapi_conn.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    def _common_pragmas(self) -> list[str]:
+        p = self._pragmas
+        return [
+            f"PRAGMA busy_timeout={int(p.busy_timeout)};",
+            f"PRAGMA cache_size={int(p.cache_size)};",
+            f"PRAGMA mmap_size={int(p.mmap_size)};",
+            f"PRAGMA temp_store={p.temp_store};",
+        ]
+
+    def _configure_writer(self, dbapi_conn: Any, _record: Any) -> None:
+        self._apply_pragmas(
+            dbapi_conn,
+            [
+                # Only takes effect on a fresh file; existing files need a one-off VACUUM.
+                "PRAGMA auto_vacuum=INCREMENTAL;",
+                "PRAGMA journal_mode=WAL;",
+                "PRAGMA synchronous=NORMAL;",
+                f"PRAGMA wal_autocheckpoint={int(self._pragmas.wal_autocheckpoint)};",
+                *self._common_pragmas(),
+            ],
+        )
+
+    def _configure_reader(self, dbapi_conn: Any, _record: Any) -> None:
+        self._apply_pragmas(dbapi_conn, ["PRAGMA query_only=ON;", *self._common_pragmas()])
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def wal_path(self) -> Path:
+        return self._path.with_name(self._path.name + "-wal")
+
+    async def _pragma(self, statement: str, read: bool = False) -> list[Any]:
+        # Queries that only report state run on a reader, so they work in read-only mode.
+        engine = self._read_engine if read else self._engine
+        if engine is None:
+            raise RuntimeError("Database not connected")
+        async with engine.connect() as conn:
+            # Go through the driver cursor: pragmas such as incremental_vacuum only do
+            # their work while the statement is stepped to completion by fetchall().
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            if driver is None:
+                raise RuntimeError("Database connection closed")
+            cursor = await driver.execute(statement)
+            rows = list(await cursor.fetchall())
+            await cursor.close()
+            if not read:
+                await driver.commit()
+        return rows
+
+    async def page_stats(self) -> dict[str, int]:
+        page_count = (await self._pragma("PRAGMA page_count;", read=True))[0][0]
+        freelist = (await self._pragma("PRAGMA freelist_count;", read=True))[0][0]
+        page_size = (await self._pragma("PRAGMA page_size;", read=True))[0][0]
+        auto_vacuum = (await self._pragma("PRAGMA auto_vacuum;", read=True))[0][0]
+        return {
+            "page_count": page_count,
+            "freelist_count": freelist,
+            "page_size": page_size,
+            "auto_vacuum": auto_vacuum,
+        }
+
+    async def wal_checkpoint(self, mode: str = "PASSIVE") -> tuple[int, int, int]:
+        """Run ``wal_checkpoint`` and return ``(busy, wal_frames, checkpointed_frames)``."""
+        if mode not in {"PASSIVE", "FULL", "RESTART", "TRUNCATE"}:
+            raise ValueError(f"Unsupported checkpoint mode {mode}")
+        busy, log, checkpointed = (await self._pragma(f"PRAGMA wal_checkpoint({mode});"))[0]
+        return busy, log, checkpointed
+
+    async def incremental_vacuum(self, pages: int) -> None:
+        await self._pragma(f"PRAGMA incremental_vacuum({int(pages)});")
+
+    async def vacuum(self) -> None:
+        await self._pragma("VACUUM;")
+
+    async def analyze(self, analysis_limit: int = 1000) -> None:
+        await self._pragma(f"PRAGMA analysis_limit={int(analysis_limit)};")
+        await self._pragma("ANALYZE;")
+
+    async def optimize(self) -> None:
+        await self._pragma("PRAGMA optimize;")
 
     @property
     def session(self) -> async_sessionmaker[AsyncSession]:
@@ -81,7 +375,24 @@ class Database:
             raise RuntimeError("Database not connected")
         return self._session_factory
 
+    @property
+    def read_session(self) -> async_sessionmaker[AsyncSession]:
+        if self._read_session_factory is None:
+            raise RuntimeError("Database not connected")
+        return self._read_session_factory
+
     async def insert_measurements(self, measurements: Sequence[Measurement]) -> None:
+        if self._write_buffer is not None:
+            await self._write_buffer.add(measurements)
+            self.data_version += 1
+        else:
+            await self.write_measurements(measurements)
+
+    async def write_measurements(
+        self, measurements: Sequence[Measurement], watermark: tuple[str, int] | None = None
+    ) -> None:
+        """Commit measurements straight to SQLite, bypassing any write buffer."""
+        started = time.perf_counter()
         async with self.session() as session:
             session.add_all(
                 [
@@ -94,15 +405,49 @@ class Database:
                         unit=m.unit,
                         quality=m.quality.value,
                         source=m.source,
-                        raw=m.raw,
                     )
                     for m in measurements
                 ]
             )
+            if self._store_raw_registers:
+                session.add_all(self._raw_register_blocks(measurements))
+            if watermark is not None:
+                await session.merge(
+                    ExportWatermarkRecord(
+                        name=watermark[0],
+                        last_id=watermark[1],
+                        updated_at=datetime.now(timezone.utc),
+                    )
+                )
             await session.commit()
+        self.data_version += 1
+        elapsed = time.perf_counter() - started
+        stats = self.write_stats
+        stats.commits += 1
+        stats.rows += len(measurements)
+        stats.seconds_sum += elapsed
+        stats.last_s = elapsed
+        stats.max_s = max(stats.max_s, elapsed)
+
+    @staticmethod
+    def _raw_register_blocks(
+        measurements: Sequence[Measurement],
+    ) -> list[RawRegisterBlockRecord]:
+        blocks: dict[str, tuple[datetime, list[tuple[str, list[int]]]]] = {}
+        for m in measurements:
+            if not m.raw or "registers" not in m.raw:
+                continue
+            ts, points = blocks.setdefault(m.device_id, (m.timestamp_utc, []))
+            points.append((m.metric, m.raw["registers"]))
+        return [
+            RawRegisterBlockRecord(
+                timestamp_utc=ts, device_id=device_id, payload=pack_register_block(points)
+            )
+            for device_id, (ts, points) in blocks.items()
+        ]
 
     async def latest_measurements(self, since: datetime | None = None) -> list[MeasurementRecord]:
-        async with self.session() as session:
+        async with self.read_session() as session:
             stmt = (
                 select(MeasurementRecord)
                 .order_by(MeasurementRecord.timestamp_utc.desc())
@@ -111,7 +456,7 @@ class Database:
             if since:
                 stmt = stmt.where(MeasurementRecord.timestamp_utc >= since)
             result = await session.execute(stmt)
-            return list(result.scalars())
+            return self._with_buffered(list(result.scalars()), since=since, limit=500)
 
     async def measurements_for_device(
         self,
@@ -120,7 +465,7 @@ class Database:
         since: datetime | None = None,
         limit: int = 500,
     ) -> list[MeasurementRecord]:
-        async with self.session() as session:
+        async with self.read_session() as session:
             stmt = select(MeasurementRecord).where(MeasurementRecord.device_id == device_id)
             if metric:
                 stmt = stmt.where(MeasurementRecord.metric == metric)
@@ -128,21 +473,439 @@ class Database:
                 stmt = stmt.where(MeasurementRecord.timestamp_utc >= since)
             stmt = stmt.order_by(MeasurementRecord.timestamp_utc.desc()).limit(limit)
             result = await session.execute(stmt)
+            return self._with_buffered(
+                list(result.scalars()),
+                device_id=device_id,
+                metric=metric,
+                since=since,
+                limit=limit,
+            )
+
+    async def latest_series(
+        self,
+        device_ids: Sequence[str] | None = None,
+        metrics: Sequence[str] | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        limit: int = 500,
+    ) -> list[Any]:
+        """Return up to ``limit`` newest rows per series in one query."""
+        if since is None:
+            since = (until or datetime.now(timezone.utc)) - LATEST_SERIES_WINDOW
+        filters: list[ColumnElement[bool]] = []
+        if device_ids:
+            filters.append(MeasurementRecord.device_id.in_(device_ids))
+        if metrics:
+            filters.append(MeasurementRecord.metric.in_(metrics))
+        filters.append(MeasurementRecord.timestamp_utc >= since)
+        if until:
+            filters.append(MeasurementRecord.timestamp_utc < until)
+        ranked = (
+            select(
+                *MEASUREMENT_COLUMNS,
+                func.row_number()
+                .over(
+                    partition_by=(MeasurementRecord.device_id, MeasurementRecord.metric),
+                    order_by=(
+                        MeasurementRecord.timestamp_utc.desc(),
+                        MeasurementRecord.id.desc(),
+                    ),
+                )
+                .label("rank"),
+            )
+            .where(*filters)
+            .subquery()
+        )
+        stmt = (
+            select(*(column for column in ranked.c if column.key != "rank"))
+            .where(ranked.c.rank <= limit)
+            .order_by(ranked.c.device_id, ranked.c.metric, ranked.c.timestamp_utc)
+        )
+        async with self.read_session() as session:
+            rows: list[Any] = list((await session.execute(stmt)).all())
+        pending = self.pending_measurements(device_ids, metrics, since, until)
+        if not pending:
+            return rows
+        rows.extend(_transient_record(m) for m in pending)
+        rows.sort(key=lambda row: (row.device_id, row.metric, as_utc(row.timestamp_utc)))
+        merged: list[Any] = []
+        for index, row in enumerate(rows):
+            following = rows[index + limit] if index + limit < len(rows) else None
+            # Keep only the newest ``limit`` rows of each series after the merge.
+            if following is None or (following.device_id, following.metric) != (
+                row.device_id,
+                row.metric,
+            ):
+                merged.append(row)
+        return merged
+
+    def pending_measurements(
+        self,
+        device_ids: Sequence[str] | None = None,
+        metrics: Sequence[str] | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> list[Measurement]:
+        """Measurements held in the write buffer and not yet committed to SQLite."""
+        if self._write_buffer is None:
+            return []
+        return [
+            m
+            for m in self._write_buffer.pending()
+            if (not device_ids or m.device_id in device_ids)
+            and (not metrics or m.metric in metrics)
+            and (since is None or m.timestamp_utc >= since)
+            and (until is None or m.timestamp_utc < until)
+        ]
+
+    def _buffered_rows(
+        self,
+        device_ids: Sequence[str] | None,
+        metrics: Sequence[str] | None,
+        since: datetime | None,
+        until: datetime | None,
+        after: tuple[datetime, int] | None = None,
+    ) -> list[BufferedRow]:
+        rows = sorted(
+            (
+                _buffered_row(m)
+                for m in self.pending_measurements(device_ids, metrics, since, until)
+            ),
+            key=_row_key,
+        )
+        if after is not None:
+            position = (as_utc(after[0]), after[1])
+            rows = rows[bisect_right(rows, position, key=_row_key) :]
+        return rows
+
+    def _with_buffered(
+        self,
+        records: list[MeasurementRecord],
+        limit: int,
+        device_id: str | None = None,
+        metric: str | None = None,
+        since: datetime | None = None,
+    ) -> list[MeasurementRecord]:
+        if self._write_buffer is None:
+            return records
+        pending = [
+            _transient_record(m)
+            for m in self._write_buffer.pending()
+            if (device_id is None or m.device_id == device_id)
+            and (metric is None or m.metric == metric)
+            and (since is None or m.timestamp_utc >= since)
+        ]
+        if not pending:
+            return records
+        merged = pending + records
+        merged.sort(key=lambda rec: as_utc(rec.timestamp_utc), reverse=True)
+        return merged[:limit]
+
+    async def iter_measurements(
+        self,
+        device_ids: Sequence[str] | None = None,
+        metrics: Sequence[str] | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        after: tuple[datetime, int] | None = None,
+        page_size: int = 1000,
+        after_id: int | None = None,
+    ) -> AsyncGenerator[list[Row[Any]], None]:
+        """Stream measurement rows in ascending ``(timestamp, id)`` pages."""
+        base = _measurement_query(device_ids, metrics, since, until)
+        if after_id is not None:
+            base = base.where(MeasurementRecord.id > after_id)
+        base = base.order_by(MeasurementRecord.timestamp_utc, MeasurementRecord.id)
+        cursor = after
+        while True:
+            stmt = base
+            if cursor is not None:
+                stmt = stmt.where(
+                    tuple_(MeasurementRecord.timestamp_utc, MeasurementRecord.id)
+                    > tuple_(literal(cursor[0]), literal(cursor[1]))
+                )
+            # Read the buffer first: a flush in between then shows a row twice, which the
+            # merge drops, instead of not at all.
+            buffered = (
+                []
+                if after_id is not None
+                else self._buffered_rows(device_ids, metrics, since, until, after=cursor)
+            )
+            async with self.read_session() as session:
+                result = await session.execute(stmt.limit(page_size))
+                page: list[Any] = list(result.all())
+            complete = len(page) < page_size
+            page, _ = _merge_buffered(page, buffered, final=complete)
+            if len(page) > page_size:
+                # Rows sharing the last cursor position must end up on the same page.
+                end = page_size
+                while end < len(page) and _row_key(page[end]) == _row_key(page[end - 1]):
+                    end += 1
+                page, complete = page[:end], end == len(page) and complete
+            if not page:
+                return
+            yield page
+            if complete:
+                return
+            cursor = (page[-1].timestamp_utc, page[-1].id)
+
+    async def stream_measurements(
+        self,
+        device_ids: Sequence[str] | None = None,
+        metrics: Sequence[str] | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        page_size: int = 10000,
+    ) -> AsyncGenerator[list[Row[Any]], None]:
+        """Stream rows in ``(timestamp, id)`` order from one cursor, buffered rows included."""
+        stmt = _measurement_query(device_ids, metrics, since, until).order_by(
+            MeasurementRecord.timestamp_utc, MeasurementRecord.id
+        )
+        if self._read_engine is None:
+            raise RuntimeError("Database not connected")
+        buffered = self._buffered_rows(device_ids, metrics, since, until)
+        # A Core connection skips the ORM result layer, which dominates at this volume.
+        async with self._read_engine.connect() as conn:
+            result = await conn.stream(stmt.execution_options(yield_per=page_size))
+            async for partition in result.partitions():
+                page, buffered = _merge_buffered(list(partition), buffered, final=False)
+                yield page
+        if buffered:
+            page, _ = _merge_buffered([], buffered, final=True)
+            yield page
+
+    async def iter_measurements_after_id(
+        self, after_id: int, until_id: int, page_size: int = 10000
+    ) -> AsyncIterator[list[Row[Any]]]:
+        """Stream rows with ``after_id < id <= until_id`` in id order, page by page."""
+        cursor = after_id
+        while cursor < until_id:
+            async with self.read_session() as session:
+                result = await session.execute(
+                    select(*MEASUREMENT_COLUMNS)
+                    .where(MeasurementRecord.id > cursor, MeasurementRecord.id <= until_id)
+                    .order_by(MeasurementRecord.id)
+                    .limit(page_size)
+                )
+                page = list(result.all())
+            if not page:
+                return
+            yield page
+            cursor = page[-1].id
+
+    async def iter_window_aggregates(
+        self, since: datetime, until: datetime, bucket_s: int = 60
+    ) -> AsyncIterator[WindowAggregate]:
+        """Yield per-series aggregates over ``[since, until)`` in ``bucket_s`` buckets."""
+        record = MeasurementRecord
+        bucket = (cast(func.strftime("%s", record.timestamp_utc), Integer) // bucket_s) * bucket_s
+        rank = case(
+            *((record.quality == name, index) for index, name in enumerate(QUALITY_RANK)),
+            else_=len(QUALITY_RANK) - 1,
+        )
+        samples = (
+            select(
+                record.device_id,
+                record.metric,
+                record.plant_id,
+                record.unit,
+                record.value,
+                record.timestamp_utc,
+                bucket.label("bucket"),
+                rank.label("quality_rank"),
+                func.first_value(record.value)
+                .over(
+                    partition_by=(record.device_id, record.metric, bucket),
+                    order_by=(record.timestamp_utc.desc(), record.id.desc()),
+                )
+                .label("last"),
+            )
+            .where(record.timestamp_utc >= since, record.timestamp_utc < until)
+            .subquery()
+        )
+        stmt = (
+            select(
+                samples.c.device_id,
+                samples.c.metric,
+                samples.c.bucket,
+                func.max(samples.c.plant_id).label("plant_id"),
+                func.max(samples.c.unit).label("unit"),
+                func.avg(samples.c.value).label("avg"),
+                func.min(samples.c.value).label("min"),
+                func.max(samples.c.value).label("max"),
+                func.max(samples.c.last).label("last"),
+                func.count().label("count"),
+                func.max(samples.c.quality_rank).label("quality_rank"),
+                func.max(samples.c.timestamp_utc).label("last_ts"),
+            )
+            .group_by(samples.c.device_id, samples.c.metric, samples.c.bucket)
+            .order_by(samples.c.device_id, samples.c.metric, samples.c.bucket)
+        )
+        buffer = self._write_buffer
+        # Hold off flushes so no row is both committed and still counted as buffered.
+        guard: AbstractAsyncContextManager[Any] = nullcontext()
+        if buffer is not None:
+            guard = buffer.flush_lock
+        async with guard:
+            buffered = self.pending_measurements(since=since, until=until)
+            async with self.read_session() as session:
+                rows = [WindowAggregate(*row) for row in await session.execute(stmt)]
+        if not buffered:
+            for aggregate in rows:
+                yield aggregate
+            return
+        merged = {(row.device_id, row.metric, row.bucket): row for row in rows}
+        for key, aggregate in _aggregate_buffered(buffered, bucket_s).items():
+            merged[key] = _combine(merged[key], aggregate) if key in merged else aggregate
+        for key in sorted(merged):
+            yield merged[key]
+
+    async def flush_write_buffer(self) -> int:
+        """Commit buffered measurements now so SQL-side reads see them."""
+        if self._write_buffer is None:
+            return 0
+        return await self._write_buffer.flush()
+
+    async def max_measurement_id(self) -> int:
+        async with self.read_session() as session:
+            return await session.scalar(select(func.max(MeasurementRecord.id))) or 0
+
+    async def get_watermark(self, name: str) -> int:
+        async with self.read_session() as session:
+            record = await session.get(ExportWatermarkRecord, name)
+            return record.last_id if record else 0
+
+    async def set_watermark(self, name: str, last_id: int) -> None:
+        async with self.session() as session:
+            await session.merge(
+                ExportWatermarkRecord(
+                    name=name, last_id=last_id, updated_at=datetime.now(timezone.utc)
+                )
+            )
+            await session.commit()
+
+    async def register_map_pushes(self) -> dict[str, str]:
+        """Return the acknowledged point map hash per device."""
+        async with self.read_session() as session:
+            result = await session.execute(
+                select(RegisterMapPushRecord.device_id, RegisterMapPushRecord.hash)
+            )
+            return {device_id: map_hash for device_id, map_hash in result}
+
+    async def record_register_map_pushes(
+        self, hashes: dict[str, str], removed: Sequence[str] = ()
+    ) -> None:
+        now = datetime.now(timezone.utc)
+        async with self.session() as session:
+            for device_id, map_hash in hashes.items():
+                await session.merge(
+                    RegisterMapPushRecord(device_id=device_id, hash=map_hash, pushed_at=now)
+                )
+            if removed:
+                await session.execute(
+                    delete(RegisterMapPushRecord).where(
+                        RegisterMapPushRecord.device_id.in_(removed)
+                    )
+                )
+            await session.commit()
+
+    async def series(
+        self, device_id: str, metric: str, start: datetime, end: datetime
+    ) -> tuple[NDArray[np.int64], NDArray[np.float64]]:
+        """Return ``(epoch_ms, values)`` arrays for one series over ``[start, end)``."""
+        parts: list[tuple[NDArray[np.int64], NDArray[np.float64]]] = []
+        rows_start = start
+        if self._chunk_store is not None:
+            boundary = await self._chunk_store.boundary()
+            if boundary is not None and start < boundary:
+                parts.append(
+                    await self._chunk_store.read(device_id, metric, start, min(end, boundary))
+                )
+                rows_start = boundary
+        if rows_start < end:
+            async with self.read_session() as session:
+                result = await session.execute(
+                    select(MeasurementRecord.timestamp_utc, MeasurementRecord.value)
+                    .where(
+                        MeasurementRecord.device_id == device_id,
+                        MeasurementRecord.metric == metric,
+                        MeasurementRecord.timestamp_utc >= rows_start,
+                        MeasurementRecord.timestamp_utc < end,
+                    )
+                    .order_by(MeasurementRecord.timestamp_utc)
+                )
+                rows = result.all()
+            parts.append(
+                (
+                    np.array(
+                        [int(as_utc(ts).timestamp() * 1000) for ts, _ in rows], dtype=np.int64
+                    ),
+                    np.array(
+                        [np.nan if value is None else value for _, value in rows],
+                        dtype=np.float64,
+                    ),
+                )
+            )
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        return (
+            np.concatenate([ts for ts, _ in parts]),
+            np.concatenate([values for _, values in parts]),
+        )
+
+    async def raw_register_blocks(
+        self, device_id: str, since: datetime | None = None, limit: int = 20
+    ) -> list[RawRegisterBlockRecord]:
+        async with self.read_session() as session:
+            stmt = select(RawRegisterBlockRecord).where(
+                RawRegisterBlockRecord.device_id == device_id
+            )
+            if since:
+                stmt = stmt.where(RawRegisterBlockRecord.timestamp_utc >= since)
+            stmt = stmt.order_by(RawRegisterBlockRecord.timestamp_utc.desc()).limit(limit)
+            result = await session.execute(stmt)
             return list(result.scalars())
 
+    async def latest_raw_registers(
+        self, device_ids: Sequence[str]
+    ) -> dict[str, dict[str, list[int]]]:
+        if not device_ids:
+            return {}
+        async with self.read_session() as session:
+            latest = (
+                select(func.max(RawRegisterBlockRecord.id))
+                .where(RawRegisterBlockRecord.device_id.in_(device_ids))
+                .group_by(RawRegisterBlockRecord.device_id)
+            )
+            stmt = select(RawRegisterBlockRecord).where(RawRegisterBlockRecord.id.in_(latest))
+            result = await session.execute(stmt)
+            return {block.device_id: block.registers() for block in result.scalars()}
+
     async def enqueue_uplink(
-        self, payload: dict[str, Any], ts_start: datetime, ts_end: datetime
+        self,
+        payload: dict[str, Any],
+        ts_start: datetime,
+        ts_end: datetime,
+        body: bytes | None = None,
+        headers: dict[str, str] | None = None,
     ) -> None:
+        headers = headers or {}
         async with self.session() as session:
             session.add(
                 UplinkQueueRecord(
-                    ts_start=ts_start, ts_end=ts_end, payload=payload, delivered=False
+                    ts_start=ts_start,
+                    ts_end=ts_end,
+                    payload=payload,
+                    delivered=False,
+                    body=body,
+                    content_type=headers.get("Content-Type"),
+                    content_encoding=headers.get("Content-Encoding"),
                 )
             )
             await session.commit()
 
     async def pending_uplink(self) -> list[UplinkQueueRecord]:
-        async with self.session() as session:
+        async with self.read_session() as session:
             stmt = (
                 select(UplinkQueueRecord)
                 .where(UplinkQueueRecord.delivered.is_(False))
@@ -151,21 +914,327 @@ class Database:
             result = await session.execute(stmt)
             return list(result.scalars())
 
+    async def iter_pending_uplink(
+        self, page_size: int = 50, until_id: int | None = None
+    ) -> AsyncGenerator[list[UplinkQueueRecord], None]:
+        """Page through undelivered uplink batches in queue order, ``page_size`` at a time."""
+        cursor = 0
+        while True:
+            stmt = select(UplinkQueueRecord).where(
+                UplinkQueueRecord.delivered.is_(False), UplinkQueueRecord.id > cursor
+            )
+            if until_id is not None:
+                stmt = stmt.where(UplinkQueueRecord.id <= until_id)
+            async with self.read_session() as session:
+                result = await session.execute(stmt.order_by(UplinkQueueRecord.id).limit(page_size))
+                page = list(result.scalars())
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            cursor = page[-1].id
+
     async def mark_uplink_delivered(self, record_id: int) -> None:
+        await self.mark_uplink_delivered_many([record_id])
+
+    async def mark_uplink_delivered_many(self, record_ids: Sequence[int]) -> None:
+        if not record_ids:
+            return
         async with self.session() as session:
-            stmt = select(UplinkQueueRecord).where(UplinkQueueRecord.id == record_id)
-            result = await session.execute(stmt)
-            record = result.scalar_one()
-            record.delivered = True
+            await session.execute(
+                update(UplinkQueueRecord)
+                .where(UplinkQueueRecord.id.in_(record_ids))
+                .values(delivered=True)
+            )
+            await session.commit()
+
+    async def uplink_backlog(self) -> tuple[int, int, int]:
+        """Return ``(rows, bytes, last id)`` of undelivered uplink batches."""
+        async with self.read_session() as session:
+            result = await session.execute(
+                select(
+                    func.count(UplinkQueueRecord.id),
+                    func.coalesce(func.sum(func.length(UplinkQueueRecord.body)), 0),
+                    func.coalesce(func.max(UplinkQueueRecord.id), 0),
+                ).where(UplinkQueueRecord.delivered.is_(False))
+            )
+            rows, size, last_id = result.one()
+            return rows, size, last_id
+
+    async def replace_uplink(
+        self,
+        record_ids: Sequence[int],
+        batches: Sequence[tuple[dict[str, Any], datetime, datetime, bytes, dict[str, str]]],
+    ) -> None:
+        """Atomically swap queued batches for ``(payload, ts_start, ts_end, body, headers)``."""
+        async with self.session() as session:
+            await session.execute(
+                delete(UplinkQueueRecord).where(UplinkQueueRecord.id.in_(record_ids))
+            )
+            session.add_all(
+                UplinkQueueRecord(
+                    ts_start=ts_start,
+                    ts_end=ts_end,
+                    payload=payload,
+                    delivered=False,
+                    body=body,
+                    content_type=headers.get("Content-Type"),
+                    content_encoding=headers.get("Content-Encoding"),
+                )
+                for payload, ts_start, ts_end, body, headers in batches
+            )
+            await session.commit()
+
+    async def drop_uplink(self, max_bytes: int, oldest_first: bool = True) -> int:
+        """Drop undelivered batches until at most ``max_bytes`` of bodies remain.
+
+        Batches go oldest first (or newest first); returns how many were dropped.
+        """
+        size = func.coalesce(func.length(UplinkQueueRecord.body), 0)
+        order = UplinkQueueRecord.id if oldest_first else UplinkQueueRecord.id.desc()
+        async with self.session() as session:
+            result = await session.execute(
+                select(UplinkQueueRecord.id, size)
+                .where(UplinkQueueRecord.delivered.is_(False))
+                .order_by(order)
+            )
+            rows = result.all()
+            excess = sum(row_size for _, row_size in rows) - max_bytes
+            doomed: list[int] = []
+            for record_id, row_size in rows:
+                if excess <= 0:
+                    break
+                doomed.append(record_id)
+                excess -= row_size
+            if doomed:
+                await session.execute(
+                    delete(UplinkQueueRecord).where(UplinkQueueRecord.id.in_(doomed))
+                )
+                await session.commit()
+            return len(doomed)
+
+    async def purge_delivered_uplink(self) -> None:
+        async with self.session() as session:
+            await session.execute(
+                delete(UplinkQueueRecord).where(UplinkQueueRecord.delivered.is_(True))
+            )
             await session.commit()
 
     async def purge_old_measurements(self, retention_days: int) -> None:
         cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+        if self._chunk_store is not None:
+            # Rows are only dropped once sealed; retention and sealing run on their own
+            # schedules, and a sealing backlog must not lose data.
+            sealed_end = await self._chunk_store.sealed_end()
+            if sealed_end is None:
+                return
+            cutoff = min(cutoff, sealed_end)
         async with self.session() as session:
             await session.execute(
                 MeasurementRecord.__table__.delete().where(MeasurementRecord.timestamp_utc < cutoff)
             )
             await session.commit()
 
+    async def purge_old_raw_registers(self, retention_hours: int) -> None:
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=retention_hours)
+        async with self.session() as session:
+            await session.execute(
+                delete(RawRegisterBlockRecord).where(RawRegisterBlockRecord.timestamp_utc < cutoff)
+            )
+            await session.commit()
+
+
+def _measurement_query(
+    device_ids: Sequence[str] | None,
+    metrics: Sequence[str] | None,
+    since: datetime | None,
+    until: datetime | None,
+) -> Select[Any]:
+    stmt = select(*MEASUREMENT_COLUMNS)
+    if device_ids:
+        stmt = stmt.where(MeasurementRecord.device_id.in_(device_ids))
+    if metrics:
+        stmt = stmt.where(MeasurementRecord.metric.in_(metrics))
+    if since:
+        stmt = stmt.where(MeasurementRecord.timestamp_utc >= since)
+    if until:
+        stmt = stmt.where(MeasurementRecord.timestamp_utc < until)
+    return stmt
+
+
+def _buffered_row(m: Measurement) -> BufferedRow:
+    return BufferedRow(
+        BUFFERED_ID,
+        # Naive UTC, like the timestamps SQLite hands back.
+        as_utc(m.timestamp_utc).replace(tzinfo=None),
+        m.plant_id,
+        m.device_id,
+        m.metric,
+        m.value,
+        m.unit,
+        m.quality.value,
+        m.source,
+    )
+
+
+def _row_key(row: Any) -> tuple[datetime, int]:
+    return as_utc(row.timestamp_utc), row.id
+
+
+def _merge_buffered(
+    page: list[Any], buffered: list[BufferedRow], final: bool
+) -> tuple[list[Any], list[BufferedRow]]:
+    """Fold buffered rows sorting up to the end of ``page`` into it; return the rest."""
+    if final or not page:
+        taken, rest = buffered, []
+    else:
+        split = bisect_right(buffered, _row_key(page[-1]), key=_row_key)
+        taken, rest = buffered[:split], buffered[split:]
+    if not taken:
+        return page, rest
+    # A flush racing the read may have committed a row the buffer snapshot still holds.
+    committed = {(row.device_id, row.metric, as_utc(row.timestamp_utc)) for row in page}
+    merged = page + [
+        row
+        for row in taken
+        if (row.device_id, row.metric, as_utc(row.timestamp_utc)) not in committed
+    ]
+    merged.sort(key=_row_key)
+    return merged, rest
+
+
+def _aggregate_buffered(
+    measurements: Sequence[Measurement], bucket_s: int
+) -> dict[tuple[str, str, int], WindowAggregate]:
+    aggregates: dict[tuple[str, str, int], WindowAggregate] = {}
+    for m in measurements:
+        ts = as_utc(m.timestamp_utc)
+        bucket = int(ts.timestamp()) // bucket_s * bucket_s
+        quality = m.quality.value
+        rank = QUALITY_RANK.index(quality) if quality in QUALITY_RANK else len(QUALITY_RANK) - 1
+        sample = WindowAggregate(
+            m.device_id,
+            m.metric,
+            bucket,
+            m.plant_id,
+            m.unit,
+            m.value,
+            m.value,
+            m.value,
+            m.value,
+            1,
+            rank,
+            ts,
+        )
+        key = (m.device_id, m.metric, bucket)
+        aggregates[key] = _combine(aggregates[key], sample) if key in aggregates else sample
+    return aggregates
+
+
+def _combine(a: WindowAggregate, b: WindowAggregate) -> WindowAggregate:
+    count = a.count + b.count
+    newer = b if as_utc(b.last_ts) >= as_utc(a.last_ts) else a
+    if a.avg is None or b.avg is None:
+        avg = b.avg if a.avg is None else a.avg
+    else:
+        avg = (a.avg * a.count + b.avg * b.count) / count
+    return replace(
+        a,
+        plant_id=a.plant_id or b.plant_id,
+        unit=a.unit or b.unit,
+        avg=avg,
+        min=min((v for v in (a.min, b.min) if v is not None), default=None),
+        max=max((v for v in (a.max, b.max) if v is not None), default=None),
+        last=newer.last,
+        count=count,
+        quality_rank=max(a.quality_rank, b.quality_rank),
+        last_ts=newer.last_ts,
+    )
+
+
+def _transient_record(m: Measurement) -> MeasurementRecord:
+    return MeasurementRecord(
+        timestamp_utc=m.timestamp_utc,
+        plant_id=m.plant_id,
+        device_id=m.device_id,
+        metric=m.metric,
+        value=m.value,
+        unit=m.unit,
+        quality=m.quality.value,
+        source=m.source,
+    )
+
+
+def _ensure_columns(connection: Any) -> None:
+    # create_all never alters existing tables; add nullable columns introduced since.
+    for table in Base.metadata.sorted_tables:
+        existing = {
+            row[1]
+            for row in connection.exec_driver_sql(f"PRAGMA table_info({table.name})").fetchall()
+        }
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+            )
+
+
+def _ensure_autoincrement(connection: Any) -> None:
+    # Tables created before AUTOINCREMENT was declared may hand out freed ids again;
+    # rebuild them once, keeping every row and id.
+    for table in Base.metadata.sorted_tables:
+        if not table.dialect_options["sqlite"]["autoincrement"]:
+            continue
+        sql = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+        ).scalar()
+        if sql is None or "AUTOINCREMENT" in sql.upper():
+            continue
+        legacy = f"{table.name}_legacy"
+        connection.exec_driver_sql(f"ALTER TABLE {table.name} RENAME TO {legacy}")
+        for index in table.indexes:
+            connection.exec_driver_sql(f"DROP INDEX IF EXISTS {index.name}")
+        table.create(connection)
+        columns = ", ".join(column.name for column in table.columns)
+        connection.exec_driver_sql(
+            f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {legacy}"
+        )
+        connection.exec_driver_sql(f"DROP TABLE {legacy}")
+        # Ids past the surviving rows may already be exported; never hand them out again.
+        exported = connection.exec_driver_sql("SELECT MAX(last_id) FROM export_watermarks").scalar()
+        if exported:
+            updated = connection.exec_driver_sql(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?",
+                (exported, table.name),
+            )
+            if updated.rowcount == 0:
+                connection.exec_driver_sql(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                    (table.name, exported),
+                )
+
+
+def as_utc(ts: datetime) -> datetime:
+    # SQLite drops tzinfo on round-trip; stored values are always UTC.
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
 
-__all__ = ["Database", "MeasurementRecord", "UplinkQueueRecord"]
+__all__ = [
+    "BUFFERED_ID",
+    "LATEST_SERIES_WINDOW",
+    "MEASUREMENT_COLUMNS",
+    "QUALITY_RANK",
+    "BufferedRow",
+    "Database",
+    "ExportWatermarkRecord",
+    "MeasurementRecord",
+    "RawRegisterBlockRecord",
+    "RegisterMapPushRecord",
+    "UplinkQueueRecord",
+    "WindowAggregate",
+    "WriteStats",
+    "as_utc",
+]
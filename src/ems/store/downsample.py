@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from numpy.typing import NDArray
+
+METHODS = ("lttb", "minmax")
+
+
+def lttb(x: NDArray[Any], y: NDArray[Any], points: int) -> NDArray[np.int64]:
+    """Indices of ``points`` samples chosen by Largest-Triangle-Three-Buckets."""
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for bucket in range(points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        if bucket == points - 3:
+            next_x, next_y = x[n - 1], y[n - 1]
+        else:
+            next_x = x[hi : edges[bucket + 2]].mean()
+            next_y = y[hi : edges[bucket + 2]].mean()
+        area = np.abs(
+            (x[anchor] - next_x) * (y[lo:hi] - y[anchor])
+            - (x[anchor] - x[lo:hi]) * (next_y - y[anchor])
+        )
+        anchor = lo + int(area.argmax())
+        selected[bucket + 1] = anchor
+    return selected
+
+
+def minmax(x: NDArray[Any], y: NDArray[Any], points: int) -> NDArray[np.int64]:
+    """Indices of the minimum and maximum of ``points // 2`` equal-count buckets."""
+    n = len(x)
+    if points >= n or points < 2:
+        return np.arange(n)
+    edges = np.linspace(0, n, points // 2 + 1).astype(np.int64)
+    picks: list[int] = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        chunk = y[lo:hi]
+        picks.extend((lo + int(chunk.argmin()), lo + int(chunk.argmax())))
+    # Keep time order; a flat bucket yields the same index twice.
+    return np.unique(np.asarray(picks, dtype=np.int64))
+
+
+def _series_keys(table: pa.Table) -> tuple[pa.Array, pa.Array, NDArray[np.int64]]:
+    devices = pc.dictionary_encode(table.column("device_id")).combine_chunks()
+    metrics = pc.dictionary_encode(table.column("metric")).combine_chunks()
+    keys = devices.indices.to_numpy().astype(np.int64) * len(metrics.dictionary) + (
+        metrics.indices.to_numpy()
+    )
+    return devices, metrics, keys
+
+
+class M4Reducer:
+    """Keeps the first, last, smallest and largest sample per series and pixel bucket."""
+
+    def __init__(self, start: datetime, end: datetime, buckets: int) -> None:
+        self._start_us = int(start.timestamp() * 1_000_000)
+        span_us = int(end.timestamp() * 1_000_000) - self._start_us
+        self._width_us = max(span_us // max(buckets, 1), 1)
+        self.raw_points: dict[tuple[str, str], int] = {}
+
+    def __call__(self, table: pa.Table) -> pa.Table:
+        table = table.filter(pc.is_valid(table.column("value")))
+        if table.num_rows == 0:
+            return table
+        devices, metrics, keys = _series_keys(table)
+        unique, counts = np.unique(keys, return_counts=True)
+        for key, count in zip(unique.tolist(), counts.tolist()):
+            device, metric = divmod(key, len(metrics.dictionary))
+            series = (devices.dictionary[device].as_py(), metrics.dictionary[metric].as_py())
+            self.raw_points[series] = self.raw_points.get(series, 0) + count
+        micros = pc.cast(table.column("timestamp_utc"), pa.int64()).to_numpy()
+        buckets = (micros - self._start_us) // self._width_us
+        values = table.column("value").to_numpy()
+        by_time = np.lexsort((micros, buckets, keys))
+        by_value = np.lexsort((values, buckets, keys))
+        # Both orders group rows identically, so the group edges are shared.
+        group_keys, group_buckets = keys[by_time], buckets[by_time]
+        starts = np.flatnonzero(
+            np.r_[
+                True,
+                (group_keys[1:] != group_keys[:-1]) | (group_buckets[1:] != group_buckets[:-1]),
+            ]
+        )
+        ends = np.r_[starts[1:], len(keys)] - 1
+        keep = np.unique(
+            np.concatenate([by_time[starts], by_time[ends], by_value[starts], by_value[ends]])
+        )
+        return table.take(pa.array(keep))
+
+
+def chart_series(
+    table: pa.Table,
+    points: int,
+    method: str = "lttb",
+    raw_points: dict[tuple[str, str], int] | None = None,
+) -> list[dict[str, Any]]:
+    """Reduce every device/metric series in ``table`` to at most ``points`` samples."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method {method}")
+    pick = lttb if method == "lttb" else minmax
+    table = table.filter(pc.is_valid(table.column("value")))
+    if table.num_rows == 0:
+        return []
+    devices, metrics, keys = _series_keys(table)
+    seconds = pc.cast(table.column("timestamp_utc"), pa.int64()).to_numpy() / 1_000_000
+    values = table.column("value").to_numpy()
+    order = np.lexsort((seconds, keys))
+    keys, seconds, values = keys[order], seconds[order], values[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    series = []
+    for lo, hi in zip(starts, np.r_[starts[1:], len(keys)]):
+        x, y = seconds[lo:hi], values[lo:hi]
+        chosen = pick(x, y, points)
+        device, metric = divmod(int(keys[lo]), len(metrics.dictionary))
+        device_id = devices.dictionary[device].as_py()
+        metric_name = metrics.dictionary[metric].as_py()
+        series.append(
+            {
+                "device_id": device_id,
+                "metric": metric_name,
+                "raw_points": (
+                    raw_points[(device_id, metric_name)] if raw_points else int(hi - lo)
+                ),
+                "t": x[chosen].tolist(),
+                "value": y[chosen].tolist(),
+            }
+        )
+    series.sort(key=lambda item: (item["device_id"], item["metric"]))
+    return series
+
+
+__all__ = ["METHODS", "M4Reducer", "chart_series", "lttb", "minmax"]
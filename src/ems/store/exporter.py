@@ -1,42 +1,178 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
+import os
 from pathlib import Path
+from typing import Any, Callable, Sequence
 
-import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Row
 
+from ..core.executor import WorkerPool
 from .database import Database
 
+WATERMARK = "parquet"
+
+# Partition columns (date, device_id) live in the directory names, not in the files.
+PARQUET_SCHEMA = pa.schema(
+    [
+        pa.field("id", pa.int64()),
+        pa.field("timestamp_utc", pa.timestamp("us", tz="UTC")),
+        pa.field("plant_id", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("metric", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("value", pa.float64()),
+        pa.field("unit", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("quality", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("source", pa.dictionary(pa.int32(), pa.string())),
+    ]
+)
+
+
+class _PartitionWriter:
+    def __init__(self, final_path: Path, row_group_size: int) -> None:
+        self.final_path = final_path
+        self.tmp_path = final_path.with_name(f".{final_path.name}.tmp")
+        self._row_group_size = row_group_size
+        self._pending: list[pa.Table] = []
+        self._pending_rows = 0
+        self._writer: pq.ParquetWriter | None = None
+
+    def write(self, table: pa.Table) -> None:
+        self._pending.append(table)
+        self._pending_rows += table.num_rows
+        if self._pending_rows >= self._row_group_size:
+            self._write_pending()
+
+    def _write_pending(self) -> None:
+        if not self._pending:
+            return
+        if self._writer is None:
+            self.tmp_path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(
+                self.tmp_path, PARQUET_SCHEMA, compression="zstd", use_dictionary=True
+            )
+        self._writer.write_table(pa.concat_tables(self._pending))
+        self._pending = []
+        self._pending_rows = 0
+
+    def close(self) -> None:
+        self._write_pending()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def commit(self) -> None:
+        os.replace(self.tmp_path, self.final_path)
+
+    def abort(self) -> None:
+        self._pending = []
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self.tmp_path.unlink(missing_ok=True)
+
+
+def rows_to_table(rows: Sequence[Row[Any]]) -> pa.Table:
+    columns = list(zip(*rows))
+    return pa.Table.from_arrays(
+        [
+            pa.array(columns[0], type=pa.int64()),
+            # SQLite hands back naive datetimes; Arrow reads naive values as UTC.
+            pa.array(columns[1], type=pa.timestamp("us", tz="UTC")),
+            pa.array(columns[2], type=pa.string()).dictionary_encode(),
+            pa.array(columns[4], type=pa.string()).dictionary_encode(),
+            pa.array(columns[5], type=pa.float64()),
+            pa.array(columns[6], type=pa.string()).dictionary_encode(),
+            pa.array(columns[7], type=pa.string()).dictionary_encode(),
+            pa.array(columns[8], type=pa.string()).dictionary_encode(),
+        ],
+        schema=PARQUET_SCHEMA,
+    )
+
 
 class ParquetExporter:
-    def __init__(self, db: Database, export_dir: str) -> None:
+    """Exports every measurement exactly once into Hive-partitioned Parquet files."""
+
+    def __init__(
+        self,
+        db: Database,
+        export_dir: str,
+        page_size: int = 2000,
+        row_group_size: int = 65536,
+        pool: WorkerPool | None = None,
+    ) -> None:
         self._db = db
+        self._pool = pool
         self._dir = Path(export_dir)
         self._dir.mkdir(parents=True, exist_ok=True)
+        self._page_size = page_size
+        self._row_group_size = row_group_size
+
+    @property
+    def export_dir(self) -> Path:
+        return self._dir
+
+    def _partition_path(self, date: str, device_id: str, first_id: int) -> Path:
+        partition = self._dir / f"date={date}" / f"device_id={device_id}"
+        return partition / f"part-{first_id:012d}.parquet"
+
+    async def export(self) -> list[Path]:
+        last_id = await self._db.get_watermark(WATERMARK)
+        until_id = await self._db.max_measurement_id()
+        if until_id <= last_id:
+            return []
+        writers: dict[tuple[str, str], _PartitionWriter] = {}
+        closed: list[_PartitionWriter] = []
+        try:
+            async for page in self._db.iter_measurements_after_id(
+                last_id, until_id, self._page_size
+            ):
+                await self._offload(self._write_page, page, writers, closed)
+            for writer in writers.values():
+                await self._offload(writer.close)
+        except BaseException:
+            for writer in [*closed, *writers.values()]:
+                writer.abort()
+            raise
+        finished = [*closed, *writers.values()]
+        for writer in finished:
+            writer.commit()
+        await self._db.set_watermark(WATERMARK, until_id)
+        return [writer.final_path for writer in finished]
+
+    async def _offload(self, fn: Callable[..., None], *args: Any) -> None:
+        # Arrow conversion and zstd encoding run off the loop; pages are still awaited
+        # one at a time, so only one thread ever touches the partition writers.
+        if self._pool is None:
+            fn(*args)
+        else:
+            await self._pool.run_thread(fn, *args)
+
+    def _write_page(
+        self,
+        page: Sequence[Row[Any]],
+        writers: dict[tuple[str, str], _PartitionWriter],
+        closed: list[_PartitionWriter],
+    ) -> None:
+        partitions: dict[tuple[str, str], list[Row[Any]]] = {}
+        for row in page:
+            key = (row.timestamp_utc.strftime("%Y-%m-%d"), row.device_id)
+            partitions.setdefault(key, []).append(row)
+        for (date, device_id), rows in partitions.items():
+            writer = writers.get((date, device_id))
+            if writer is None:
+                writer = _PartitionWriter(
+                    self._partition_path(date, device_id, rows[0].id), self._row_group_size
+                )
+                writers[(date, device_id)] = writer
+            writer.write(rows_to_table(rows))
+        if not page:
+            return
+        horizon = page[-1].timestamp_utc.strftime("%Y-%m-%d")
+        for key in [key for key in writers if key[0] < horizon]:
+            writer = writers.pop(key)
+            writer.close()
+            closed.append(writer)
+
 
-    async def export_last_hour(self) -> Path | None:
-        cutoff = datetime.now(timezone.utc) - timedelta(hours=1)
-        records = await self._db.latest_measurements(since=cutoff)
-        if not records:
-            return None
-        df = pd.DataFrame(
-            [
-                {
-                    "timestamp_utc": rec.timestamp_utc,
-                    "plant_id": rec.plant_id,
-                    "device_id": rec.device_id,
-                    "metric": rec.metric,
-                    "value": rec.value,
-                    "unit": rec.unit,
-                    "quality": rec.quality,
-                    "source": rec.source,
-                }
-                for rec in records
-            ]
-        )
-        filename = self._dir / f"measurements_{cutoff:%Y%m%d%H%M}.parquet"
-        df.to_parquet(filename)
-        return filename
-
-
-__all__ = ["ParquetExporter"]
+__all__ = ["PARQUET_SCHEMA", "ParquetExporter", "rows_to_table"]
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from ..core.executor import WorkerPool
+from ..utils.models import Measurement
+from .database import Database, as_utc
+from .exporter import WATERMARK
+
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+# Archive files dictionary-encode strings; reading them as plain strings lets the
+# history and SQLite halves concatenate without unifying dictionaries.
+HISTORY_SCHEMA = pa.schema(
+    [
+        pa.field("id", pa.int64()),
+        pa.field("timestamp_utc", TIMESTAMP),
+        pa.field("plant_id", pa.string()),
+        pa.field("metric", pa.string()),
+        pa.field("value", pa.float64()),
+        pa.field("unit", pa.string()),
+        pa.field("quality", pa.string()),
+        pa.field("source", pa.string()),
+        pa.field("date", pa.string()),
+        pa.field("device_id", pa.string()),
+    ]
+)
+PARTITIONING = ds.partitioning(
+    pa.schema([("date", pa.string()), ("device_id", pa.string())]), flavor="hive"
+)
+DEFAULT_COLUMNS = ("timestamp_utc", "device_id", "metric", "value")
+# Decoded chunk samples turned into one Arrow table at a time.
+CHUNK_BATCH_ROWS = 65536
+QUERY_COLUMNS = frozenset(HISTORY_SCHEMA.names) - {"date"}
+
+
+def _metric_stats_match(fragment: ds.ParquetFileFragment, metrics: Sequence[str]) -> list[int]:
+    # Arrow does not prune on dictionary-typed columns, so check min/max of the
+    # metric column by hand. Compacted files are sorted by metric, which makes this
+    # skip nearly every row group for a single-metric query.
+    metadata = fragment.metadata
+    column = metadata.schema.names.index("metric")
+    keep = []
+    for index in range(metadata.num_row_groups):
+        stats = metadata.row_group(index).column(column).statistics
+        if stats is None or not stats.has_min_max:
+            keep.append(index)
+        elif any(stats.min <= metric <= stats.max for metric in metrics):
+            keep.append(index)
+    return keep
+
+
+def _partition_span(fragment: ds.ParquetFileFragment) -> tuple[datetime, datetime]:
+    # Day partitions are named YYYY-MM-DD and compacted month partitions YYYY-MM.
+    key = ds.get_partition_keys(fragment.partition_expression)["date"]
+    if len(key) == 7:
+        first = datetime.strptime(key, "%Y-%m").replace(tzinfo=timezone.utc)
+        return first, (first + timedelta(days=32)).replace(day=1)
+    day = datetime.strptime(key, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return day, day + timedelta(days=1)
+
+
+def scan_archive(
+    export_dir: Path,
+    device_ids: Sequence[str] | None,
+    metrics: Sequence[str] | None,
+    start: datetime,
+    end: datetime,
+    columns: Sequence[str],
+    max_id: int,
+    limit: int | None = None,
+    reduce: Callable[[pa.Table], pa.Table] | None = None,
+) -> tuple[pa.Table, int]:
+    """Read matching rows from the Parquet archive; returns the table and row groups read."""
+    if not export_dir.exists():
+        return HISTORY_SCHEMA.empty_table().select(list(columns)), 0
+    dataset = ds.dataset(
+        export_dir, format="parquet", partitioning=PARTITIONING, schema=HISTORY_SCHEMA
+    )
+    start, end = as_utc(start), as_utc(end)
+    # Monthly partitions are named YYYY-MM, which sorts before any day of that month.
+    condition = (ds.field("date") >= f"{start:%Y-%m}") & (ds.field("date") <= f"{end:%Y-%m-%d}")
+    if device_ids:
+        condition &= ds.field("device_id").isin(list(device_ids))
+    row_filter = (
+        (ds.field("timestamp_utc") >= pa.scalar(start, TIMESTAMP))
+        & (ds.field("timestamp_utc") < pa.scalar(end, TIMESTAMP))
+        & (ds.field("id") <= max_id)
+    )
+    if metrics:
+        row_filter &= ds.field("metric").isin(list(metrics))
+    tables = []
+    row_groups = rows = 0
+    read_until: datetime | None = None
+    fragments = sorted(dataset.get_fragments(filter=condition & row_filter), key=_partition_span)
+    for fragment in fragments:
+        span_start, span_end = _partition_span(fragment)
+        if limit is not None and rows >= limit and read_until and span_start >= read_until:
+            break
+        read_until = max(read_until or span_end, span_end)
+        if metrics:
+            fragment = fragment.subset(row_group_ids=_metric_stats_match(fragment, metrics))
+        for piece in fragment.split_by_row_group(filter=row_filter, schema=HISTORY_SCHEMA):
+            row_groups += 1
+            table = piece.to_table(schema=HISTORY_SCHEMA, columns=list(columns), filter=row_filter)
+            rows += table.num_rows
+            tables.append(reduce(table) if reduce is not None else table)
+    if not tables:
+        return HISTORY_SCHEMA.empty_table().select(list(columns)), 0
+    return pa.concat_tables(tables), row_groups
+
+
+def measurements_to_table(rows: Sequence[Any], columns: Sequence[str]) -> pa.Table:
+    """Build a history table from SQLite rows or buffered :class:`Measurement` objects."""
+    data: dict[str, list[Any]] = {name: [] for name in columns}
+    for row in rows:
+        for name in columns:
+            value = getattr(row, name, None)
+            if name == "quality" and isinstance(row, Measurement):
+                value = row.quality.value
+            data[name].append(value)
+    return pa.table(
+        {name: pa.array(data[name], type=HISTORY_SCHEMA.field(name).type) for name in columns}
+    )
+
+
+def chunks_to_table(
+    series: Sequence[tuple[str, str, str | None, Any, Any]], columns: Sequence[str]
+) -> pa.Table:
+    """Build a history table from ``ChunkStore.iter_chunks`` items.
+
+    Chunks only keep timestamps, values and the unit, so other columns are null.
+    """
+    arrays: dict[str, list[pa.Array]] = {name: [] for name in columns}
+    for device_id, metric, unit, timestamps_ms, values in series:
+        count = len(timestamps_ms)
+        known = {
+            "timestamp_utc": pa.array(timestamps_ms, type=pa.timestamp("ms", tz="UTC")),
+            "device_id": pa.array([device_id] * count, type=pa.string()),
+            "metric": pa.array([metric] * count, type=pa.string()),
+            "unit": pa.array([unit] * count, type=pa.string()),
+            # Missing values are stored as NaN.
+            "value": pa.array(values, type=pa.float64(), from_pandas=True),
+        }
+        for name in columns:
+            field_type = HISTORY_SCHEMA.field(name).type
+            array = known.get(name)
+            arrays[name].append(
+                array.cast(field_type) if array is not None else pa.nulls(count, field_type)
+            )
+    return pa.table(
+        {
+            name: pa.chunked_array(arrays[name], type=HISTORY_SCHEMA.field(name).type)
+            for name in columns
+        }
+    )
+
+
+def aggregate(table: pa.Table, bucket_s: int) -> pa.Table:
+    """Reduce a history table to avg/min/max/count per device, metric and time bucket."""
+    width = bucket_s * 1_000_000
+    micros = pc.cast(table.column("timestamp_utc"), pa.int64())
+    buckets = pc.cast(pc.multiply(pc.divide(micros, width), width), TIMESTAMP)
+    grouped = (
+        pa.table(
+            {
+                "device_id": table.column("device_id"),
+                "metric": table.column("metric"),
+                "bucket_utc": buckets,
+                "value": table.column("value"),
+            }
+        )
+        .group_by(["device_id", "metric", "bucket_utc"])
+        .aggregate([("value", "mean"), ("value", "min"), ("value", "max"), ("value", "count")])
+    )
+    names = {"value_mean": "avg", "value_min": "min", "value_max": "max", "value_count": "count"}
+    grouped = grouped.rename_columns([names.get(name, name) for name in grouped.column_names])
+    return grouped.sort_by(
+        [("device_id", "ascending"), ("metric", "ascending"), ("bucket_utc", "ascending")]
+    )
+
+
+class HistoryStore:
+    """Answers time-range queries across chunks, the Parquet archive and SQLite."""
+
+    def __init__(
+        self, db: Database, export_dir: str | Path, pool: WorkerPool | None = None
+    ) -> None:
+        self._db = db
+        self._dir = Path(export_dir)
+        self._pool = pool
+        self.last_row_groups = 0
+
+    async def _offload(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._pool is None:
+            return fn(*args)
+        return await self._pool.run_thread(fn, *args)
+
+    async def query(
+        self,
+        start: datetime,
+        end: datetime,
+        device_ids: Sequence[str] | None = None,
+        metrics: Sequence[str] | None = None,
+        columns: Sequence[str] | None = None,
+        bucket_s: int | None = None,
+        limit: int | None = None,
+        reduce: Callable[[pa.Table], pa.Table] | None = None,
+    ) -> pa.Table:
+        """Return matching rows in timestamp order, or per-bucket aggregates."""
+        requested = list(columns or DEFAULT_COLUMNS)
+        unknown = set(requested) - QUERY_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        if bucket_s:
+            columns = list(dict.fromkeys([*requested, *DEFAULT_COLUMNS]))
+        elif limit is not None:
+            # Sorting picks the earliest rows, so it needs the timestamps.
+            columns = list(dict.fromkeys([*requested, "timestamp_utc"]))
+        else:
+            columns = requested
+        scan_limit = None if bucket_s else limit
+
+        def piece(table: pa.Table) -> pa.Table:
+            return reduce(table) if reduce is not None else table
+
+        def chunk_piece(batch: list[Any]) -> pa.Table:
+            return piece(chunks_to_table(batch, columns))
+
+        start, end = as_utc(start), as_utc(end)
+        tables = []
+        chunk_rows = 0
+        chunk_store = self._db.chunk_store
+        boundary = await chunk_store.boundary() if chunk_store is not None else None
+        if chunk_store is not None and boundary is not None and start < boundary:
+            batch: list[Any] = []
+            batch_rows = 0
+            async for item in chunk_store.iter_chunks(
+                device_ids, metrics, start, min(end, boundary), limit=scan_limit
+            ):
+                batch.append(item)
+                batch_rows += len(item[3])
+                if batch_rows >= CHUNK_BATCH_ROWS:
+                    tables.append(await self._offload(chunk_piece, batch))
+                    chunk_rows += batch_rows
+                    batch, batch_rows = [], 0
+            tables.append(await self._offload(chunk_piece, batch))
+            chunk_rows += batch_rows
+            start = boundary
+        if scan_limit is None or chunk_rows < scan_limit:
+            watermark = await self._db.get_watermark(WATERMARK)
+            archive, self.last_row_groups = await self._offload(
+                scan_archive,
+                self._dir,
+                device_ids,
+                metrics,
+                start,
+                end,
+                columns,
+                watermark,
+                scan_limit,
+                reduce,
+            )
+            tables.append(archive)
+            rows = 0
+            async for page in self._db.iter_measurements(
+                device_ids=device_ids,
+                metrics=metrics,
+                since=start,
+                until=end,
+                page_size=10000,
+                after_id=watermark,
+            ):
+                tables.append(piece(measurements_to_table(page, columns)))
+                rows += len(page)
+                if scan_limit is not None and rows >= scan_limit:
+                    break
+            pending = self._db.pending_measurements(device_ids, metrics, since=start, until=end)
+            tables.append(piece(measurements_to_table(pending, columns)))
+        table = pa.concat_tables(tables)
+        if bucket_s:
+            table = await self._offload(aggregate, table, bucket_s)
+            return table.slice(0, limit) if limit is not None else table
+        if "timestamp_utc" in columns:
+            table = table.sort_by("timestamp_utc")
+        if limit is not None:
+            table = table.slice(0, limit).select(requested)
+        return table
+
+
+__all__ = [
+    "DEFAULT_COLUMNS",
+    "HistoryStore",
+    "aggregate",
+    "chunks_to_table",
+    "scan_archive",
+]
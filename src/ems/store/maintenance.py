@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+from zoneinfo import ZoneInfo
+
+from ..utils.config import MaintenanceConfig
+from .database import Database
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+@dataclass
+class MaintenanceStats:
+    wal_bytes: int = 0
+    page_count: int = 0
+    freelist_pages: int = 0
+    page_size: int = 4096
+    auto_vacuum: int = 0
+    last_run_utc: datetime | None = None
+    last_analyze_utc: datetime | None = None
+    durations: Dict[str, float] = field(default_factory=dict)
+    runs: Dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "wal_bytes": self.wal_bytes,
+            "page_count": self.page_count,
+            "freelist_pages": self.freelist_pages,
+            "auto_vacuum": self.auto_vacuum,
+            "last_run_utc": self.last_run_utc.isoformat() if self.last_run_utc else None,
+            "durations": dict(self.durations),
+            "runs": dict(self.runs),
+        }
+
+
+class SQLiteMaintenance:
+    """Keeps the WAL and free-page count of the measurement database in check."""
+
+    def __init__(self, db: Database, config: MaintenanceConfig, tz: str = "UTC") -> None:
+        self._db = db
+        self._config = config
+        self._tz = ZoneInfo(tz)
+        self.stats = MaintenanceStats()
+
+    def wal_bytes(self) -> int:
+        try:
+            return self._db.wal_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def in_low_load_window(self, now: datetime) -> bool:
+        return now.astimezone(self._tz).hour in self._config.low_load_hours
+
+    async def _timed(self, task: str, coro: Any) -> Any:
+        started = time.perf_counter()
+        result = await coro
+        self.stats.durations[task] = time.perf_counter() - started
+        self.stats.runs[task] = self.stats.runs.get(task, 0) + 1
+        return result
+
+    async def run(self, now: datetime | None = None) -> MaintenanceStats:
+        now = now or datetime.now(timezone.utc)
+        cfg = self._config
+        low_load = self.in_low_load_window(now)
+        wal_mb = self.wal_bytes() / (1024 * 1024)
+
+        pages = await self._db.page_stats()
+        if low_load:
+            if pages["auto_vacuum"] != AUTO_VACUUM_INCREMENTAL and cfg.convert_auto_vacuum:
+                # Switching an existing file to incremental auto-vacuum needs a full rebuild.
+                await self._timed("vacuum", self._db.vacuum())
+                pages = await self._db.page_stats()
+            elif pages["freelist_count"] >= cfg.vacuum_min_free_pages:
+                await self._timed(
+                    "incremental_vacuum", self._db.incremental_vacuum(cfg.vacuum_pages_per_run)
+                )
+                pages = await self._db.page_stats()
+            last = self.stats.last_analyze_utc
+            if last is None or now - last >= timedelta(hours=cfg.analyze_interval_h):
+                await self._timed("analyze", self._db.analyze())
+                self.stats.last_analyze_utc = now
+            else:
+                await self._timed("optimize", self._db.optimize())
+
+        # Checkpoint last so frames written by vacuum/analyze are folded in as well.
+        if wal_mb >= cfg.wal_truncate_mb or (low_load and wal_mb >= cfg.wal_passive_mb):
+            await self._timed("checkpoint_truncate", self._db.wal_checkpoint("TRUNCATE"))
+        elif wal_mb >= cfg.wal_passive_mb:
+            await self._timed("checkpoint_passive", self._db.wal_checkpoint("PASSIVE"))
+
+        self.stats.wal_bytes = self.wal_bytes()
+        self.stats.page_count = pages["page_count"]
+        self.stats.freelist_pages = pages["freelist_count"]
+        self.stats.page_size = pages["page_size"]
+        self.stats.auto_vacuum = pages["auto_vacuum"]
+        self.stats.last_run_utc = now
+        return self.stats
+
+
+__all__ = ["MaintenanceStats", "SQLiteMaintenance"]
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import struct
+from typing import Sequence
+
+BLOCK_VERSION = 1
+
+_HEADER = struct.Struct(">B")
+_POINT_HEADER = struct.Struct(">BB")
+
+
+def pack_register_block(points: Sequence[tuple[str, Sequence[int]]]) -> bytes:
+    """Pack the registers read for one device poll into a single binary block."""
+    parts = [_HEADER.pack(BLOCK_VERSION)]
+    for metric, registers in points:
+        name = metric.encode("utf-8")
+        if len(name) > 255 or len(registers) > 255:
+            raise ValueError(f"Point {metric} too large for register block")
+        parts.append(_POINT_HEADER.pack(len(name), len(registers)))
+        parts.append(name)
+        parts.append(struct.pack(f">{len(registers)}H", *registers))
+    return b"".join(parts)
+
+
+def unpack_register_block(blob: bytes) -> dict[str, list[int]]:
+    """Decode a block produced by :func:`pack_register_block` into metric -> registers."""
+    (version,) = _HEADER.unpack_from(blob, 0)
+    if version != BLOCK_VERSION:
+        raise ValueError(f"Unsupported register block version {version}")
+    offset = _HEADER.size
+    points: dict[str, list[int]] = {}
+    while offset < len(blob):
+        name_len, count = _POINT_HEADER.unpack_from(blob, offset)
+        offset += _POINT_HEADER.size
+        metric = blob[offset : offset + name_len].decode("utf-8")
+        offset += name_len
+        points[metric] = list(struct.unpack_from(f">{count}H", blob, offset))
+        offset += 2 * count
+    return points
+
+
+__all__ = ["pack_register_block", "unpack_register_block"]
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Sequence
+
+import orjson
+
+from ..core.executor import WorkerPool
+from ..utils.models import Measurement
+from .database import Database
+
+# Sequence number of the last journal committed to SQLite, stored with each batch.
+WATERMARK = "write_buffer"
+
+
+@dataclass
+class WriteBufferStats:
+    polls: int = 0
+    rows: int = 0
+    flushes: int = 0
+    rows_flushed: int = 0
+    replayed_rows: int = 0
+    buffered_rows: int = 0
+    buffered_bytes: int = 0
+
+    @property
+    def commits_avoided(self) -> int:
+        return max(self.polls - self.flushes, 0)
+
+    @property
+    def write_reduction(self) -> float:
+        """Poll commits per actual SQLite commit (1.0 means no reduction)."""
+        return self.polls / self.flushes if self.flushes else float(self.polls)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "polls": self.polls,
+            "rows": self.rows,
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "replayed_rows": self.replayed_rows,
+            "buffered_rows": self.buffered_rows,
+            "buffered_bytes": self.buffered_bytes,
+            "commits_avoided": self.commits_avoided,
+            "write_reduction": round(self.write_reduction, 2),
+        }
+
+
+class WriteBuffer:
+    """RAM-first tier in front of :class:`Database` that batches SD-card commits."""
+
+    def __init__(
+        self,
+        db: Database,
+        flush_interval_s: int = 300,
+        max_buffer_kb: int = 4096,
+        journal_path: str | None = None,
+        pool: WorkerPool | None = None,
+    ) -> None:
+        self._db = db
+        self._pool = pool
+        self.flush_interval_s = flush_interval_s
+        self._max_bytes = max_buffer_kb * 1024
+        self._journal = Path(journal_path) if journal_path else None
+        if self._journal is not None:
+            self._journal.parent.mkdir(parents=True, exist_ok=True)
+        self._buffer: list[Measurement] = []
+        # The batch being committed stays readable until SQLite has it.
+        self._flushing: list[Measurement] = []
+        self._seq: int | None = None
+        self._lock = asyncio.Lock()
+        # Orders journal appends against the rotation in :meth:`flush`.
+        self._journal_lock = asyncio.Lock()
+        self.stats = WriteBufferStats()
+
+    @property
+    def flush_lock(self) -> asyncio.Lock:
+        """Held while a batch is committed; hold it to read SQLite and the buffer consistently."""
+        return self._lock
+
+    async def _offload(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._pool is None:
+            return fn(*args)
+        return await self._pool.run_thread(fn, *args)
+
+    def _flushing_journal(self, seq: int) -> Path | None:
+        if self._journal is None:
+            return None
+        return self._journal.with_name(f"{self._journal.name}.flushing.{seq}")
+
+    def pending(self) -> list[Measurement]:
+        return self._flushing + self._buffer
+
+    async def add(self, measurements: Sequence[Measurement]) -> None:
+        if not measurements:
+            return
+        lines = b"".join(orjson.dumps(m.model_dump(mode="json")) + b"\n" for m in measurements)
+        async with self._journal_lock:
+            if self._journal is not None:
+                await self._offload(_append_journal, self._journal, lines)
+            self._buffer.extend(measurements)
+        self.stats.polls += 1
+        self.stats.rows += len(measurements)
+        self.stats.buffered_rows = len(self._buffer)
+        self.stats.buffered_bytes += len(lines)
+        if self.stats.buffered_bytes >= self._max_bytes:
+            await self.flush()
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self._buffer:
+                return 0
+            if self._seq is None:
+                self._seq = await self._db.get_watermark(WATERMARK)
+            seq = self._seq + 1
+            flushing = self._flushing_journal(seq)
+            async with self._journal_lock:
+                batch, self._buffer = self._buffer, []
+                self._flushing = batch
+                batch_bytes = self.stats.buffered_bytes
+                if self._journal is not None and flushing is not None and self._journal.exists():
+                    # Rotate first so polls arriving during the commit go to a fresh journal.
+                    os.replace(self._journal, flushing)
+            self.stats.buffered_rows = len(self._buffer)
+            self.stats.buffered_bytes = 0
+            try:
+                await self._db.write_measurements(batch, watermark=(WATERMARK, seq))
+            except Exception:
+                self._buffer = batch + self._buffer
+                self.stats.buffered_rows = len(self._buffer)
+                self.stats.buffered_bytes += batch_bytes
+                async with self._journal_lock:
+                    if flushing is not None and flushing.exists() and self._journal is not None:
+                        _merge_journals(flushing, self._journal)
+                raise
+            finally:
+                self._flushing = []
+            self._seq = seq
+            if flushing is not None:
+                flushing.unlink(missing_ok=True)
+            self.stats.flushes += 1
+            self.stats.rows_flushed += len(batch)
+            return len(batch)
+
+    async def recover(self) -> int:
+        """Replay journals left behind by a crash into SQLite. Call once after connect."""
+        if self._journal is None:
+            return 0
+        committed = await self._db.get_watermark(WATERMARK)
+        prefix = f"{self._journal.name}.flushing."
+        journals = {
+            int(path.name[len(prefix) :]): path
+            for path in self._journal.parent.glob(f"{prefix}*")
+            if path.name[len(prefix) :].isdigit()
+        }
+        if self._journal.exists():
+            # Give the live journal a sequence number too, so its replay is idempotent.
+            seq = max([committed, *journals]) + 1
+            journals[seq] = self._journal.with_name(f"{prefix}{seq}")
+            os.replace(self._journal, journals[seq])
+        replayed = 0
+        for seq, path in sorted(journals.items()):
+            measurements = _read_journal(path)
+            if seq > committed and measurements:
+                await self._db.write_measurements(measurements, watermark=(WATERMARK, seq))
+                committed = seq
+                replayed += len(measurements)
+            path.unlink()
+        self._seq = committed
+        self.stats.replayed_rows += replayed
+        return replayed
+
+
+def _append_journal(path: Path, lines: bytes) -> None:
+    with path.open("ab") as fh:
+        fh.write(lines)
+
+
+def _read_journal(path: Path) -> list[Measurement]:
+    measurements: list[Measurement] = []
+    for line in path.read_bytes().splitlines():
+        try:
+            measurements.append(Measurement.model_validate(orjson.loads(line)))
+        except ValueError:
+            # A crash mid-append leaves a torn last line; everything before it is intact.
+            continue
+    return measurements
+
+
+def _merge_journals(flushing: Path, journal: Path) -> None:
+    newer = journal.read_bytes() if journal.exists() else b""
+    journal.write_bytes(flushing.read_bytes() + newer)
+    flushing.unlink()
+
+
+__all__ = ["WATERMARK", "WriteBuffer", "WriteBufferStats"]
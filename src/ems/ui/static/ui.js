@@ -24,23 +24,63 @@ async function loadDevices() {
   });
 }
 
-async function loadMeasurements() {
+const latest = new Map();
+let renderPending = false;
+let streaming = true;
+
+function renderMeasurements() {
+  renderPending = false;
   const tbody = document.getElementById('measurement-body');
+  const rows = [...latest.values()].sort(
+    (a, b) => a.device_id.localeCompare(b.device_id) || a.metric.localeCompare(b.metric),
+  );
   tbody.innerHTML = '';
-  const devices = await fetchJSON('/devices');
-  for (const device of devices) {
-    const rows = await fetchJSON(`/measurements?device_id=${device.device_id}`);
-    rows.slice(0, 5).forEach((row) => {
-      const tr = document.createElement('tr');
-      tr.innerHTML = `<td>${row.timestamp_utc}</td><td>${row.device_id}</td><td>${row.metric}</td><td>${row.value?.toFixed?.(2) ?? row.value}</td><td>${row.unit ?? ''}</td>`;
-      tbody.appendChild(tr);
-    });
+  rows.forEach((row) => {
+    const tr = document.createElement('tr');
+    tr.innerHTML = `<td>${row.timestamp_utc}</td><td>${row.device_id}</td><td>${row.metric}</td><td>${row.value?.toFixed?.(2) ?? row.value}</td><td>${row.unit ?? ''}</td>`;
+    tbody.appendChild(tr);
+  });
+}
+
+function applyRows(rows) {
+  rows.forEach((row) => latest.set(`${row.device_id}|${row.metric}`, row));
+  if (!renderPending) {
+    renderPending = true;
+    requestAnimationFrame(renderMeasurements);
   }
 }
 
+async function loadMeasurements() {
+  // One columnar request for the whole plant; used when the live stream is unavailable.
+  const body = await fetchJSON('/measurements/bulk?limit=1');
+  applyRows(
+    body.series.map((series) => ({
+      timestamp_utc: series.t[0],
+      device_id: series.device_id,
+      metric: series.metric,
+      value: series.value[0],
+      unit: series.unit,
+    })),
+  );
+}
+
+function streamMeasurements() {
+  // The server sends the current value of every series first, then conflated updates.
+  const source = new EventSource(`${API_BASE}/stream/measurements`);
+  source.addEventListener('measurements', (event) => applyRows(JSON.parse(event.data)));
+  source.onerror = (err) => {
+    console.error('Live stream interrupted', err);
+    if (source.readyState === EventSource.CLOSED) {
+      // The server refused the stream (e.g. too many clients); poll instead.
+      streaming = false;
+      loadMeasurements().catch((error) => console.error('Refresh failed', error));
+    }
+  };
+}
+
 async function refresh() {
   try {
-    await Promise.all([loadDevices(), loadMeasurements()]);
+    await Promise.all([loadDevices(), streaming ? null : loadMeasurements()]);
   } catch (err) {
     console.error('Refresh failed', err);
   } finally {
@@ -49,5 +89,6 @@ async function refresh() {
 }
 
 document.addEventListener('DOMContentLoaded', () => {
+  streamMeasurements();
   refresh();
 });
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Sequence
+
+from .encoding import decode_body, pack_batches
+
+AGGREGATES = ("avg", "min", "max", "last", "count")
+
+
+def downsample_series(series: dict[str, Any], period_s: int, base_s: int = 0) -> dict[str, Any]:
+    """Re-bucket one series to ``period_s``; averages are weighted by sample count."""
+    buckets: dict[int, dict[str, Any]] = {}
+    for index, offset in enumerate(series["t"]):
+        key = offset - (base_s + offset) % period_s
+        count = series["count"][index]
+        avg = series["avg"][index]
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {
+                "sum": 0.0,
+                "weight": 0,
+                "min": None,
+                "max": None,
+                "last": None,
+                "count": 0,
+                "quality": 0,
+            }
+        if avg is not None:
+            bucket["sum"] += avg * count
+            bucket["weight"] += count
+        for name, pick in (("min", min), ("max", max)):
+            value = series[name][index]
+            if value is not None:
+                bucket[name] = value if bucket[name] is None else pick(bucket[name], value)
+        if series["last"][index] is not None:
+            bucket["last"] = series["last"][index]
+        bucket["count"] += count
+        bucket["quality"] = max(bucket["quality"], series["quality"][index])
+    result = {key: value for key, value in series.items() if not isinstance(value, list)}
+    result["t"] = list(buckets)
+    result["avg"] = [b["sum"] / b["weight"] if b["weight"] else None for b in buckets.values()]
+    for name in ("min", "max", "last", "count", "quality"):
+        result[name] = [b[name] for b in buckets.values()]
+    return result
+
+
+def merge_windows(
+    rows: Sequence[tuple[bytes, str | None, str | None]],
+    max_bytes: int,
+    encoding: str,
+    compression: str,
+    downsample_s: int | None = None,
+) -> list[tuple[dict[str, Any], bytes, int]]:
+    """Merge consecutive queued windows into as few bodies of ``max_bytes`` as possible."""
+    windows = sorted(
+        (decode_body(*row) for row in rows), key=lambda w: datetime.fromisoformat(w["ts_start"])
+    )
+    periods = {
+        (
+            downsample_s
+            if downsample_s and w["sample_period_s"] < downsample_s
+            else w["sample_period_s"]
+        )
+        for w in windows
+    }
+    if len(periods) > 1:
+        raise ValueError(f"Cannot merge windows with sample periods {sorted(periods)}")
+    period = periods.pop()
+    origin = datetime.fromisoformat(windows[0]["ts_start"])
+    merged: dict[tuple[str, str], dict[str, Any]] = {}
+    for window in windows:
+        shift = int((datetime.fromisoformat(window["ts_start"]) - origin).total_seconds())
+        for series in window["series"]:
+            key = (series["device_id"], series["metric"])
+            target = merged.get(key)
+            if target is None:
+                target = merged[key] = {
+                    name: [] if isinstance(value, list) else value for name, value in series.items()
+                }
+            target["t"].extend(offset + shift for offset in series["t"])
+            for name, values in series.items():
+                if name != "t" and isinstance(values, list):
+                    target[name].extend(values)
+    series_list = list(merged.values())
+    if any(w["sample_period_s"] < period for w in windows):
+        # Also folds buckets that straddled a window boundary back into one sample.
+        base_s = int(origin.timestamp())
+        series_list = [downsample_series(series, period, base_s) for series in series_list]
+    header = {
+        "plant_id": next((w["plant_id"] for w in windows if w.get("plant_id")), None),
+        "ts_start": windows[0]["ts_start"],
+        "ts_end": max(w["ts_end"] for w in windows),
+        "sample_period_s": period,
+        "quality_levels": windows[0]["quality_levels"],
+        "merged_windows": sum(
+            {w["ts_start"]: w.get("merged_windows", 1) for w in windows}.values()
+        ),
+    }
+    return pack_batches(header, series_list, max_bytes, encoding, compression)
+
+
+__all__ = ["downsample_series", "merge_windows"]
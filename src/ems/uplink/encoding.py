@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import gzip
+from typing import Any, Sequence
+
+import orjson
+import pyarrow as pa
+
+try:  # msgpack is optional; JSON is always available.
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
+ENCODINGS = {"json": "application/json", "msgpack": "application/msgpack"}
+COMPRESSIONS = ("none", "gzip", "zstd")
+# Queued bodies stay far below this once decompressed; anything larger is rejected.
+MAX_DECODED_BYTES = 64 * 1024 * 1024
+
+
+def check_codec(encoding: str, compression: str) -> None:
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unsupported uplink encoding {encoding}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported uplink compression {compression}")
+    if encoding == "msgpack" and msgpack is None:
+        raise ValueError("msgpack encoding requires the msgpack package")
+
+
+def content_headers(encoding: str, compression: str) -> dict[str, str]:
+    headers = {"Content-Type": ENCODINGS[encoding]}
+    if compression != "none":
+        headers["Content-Encoding"] = compression
+    return headers
+
+
+def encode_body(payload: dict[str, Any], encoding: str, compression: str) -> tuple[bytes, int]:
+    """Serialize and compress ``payload``; returns the body and its uncompressed size."""
+    raw = msgpack.packb(payload) if encoding == "msgpack" else orjson.dumps(payload)
+    if compression == "gzip":
+        return gzip.compress(raw, compresslevel=6, mtime=0), len(raw)
+    if compression == "zstd":
+        # Arrow bundles libzstd and emits a standard zstd frame.
+        return pa.compress(raw, codec="zstd", asbytes=True), len(raw)
+    return raw, len(raw)
+
+
+def decode_body(
+    body: bytes,
+    content_type: str | None,
+    content_encoding: str | None,
+    max_output_size: int = MAX_DECODED_BYTES,
+) -> dict[str, Any]:
+    """Inverse of :func:`encode_body`; bodies over ``max_output_size`` raise ValueError."""
+    if content_encoding in ("gzip", "zstd"):
+        # Streaming decompression does not need the content size in the zstd frame
+        # header and stops reading once the limit is passed.
+        stream = pa.CompressedInputStream(pa.BufferReader(body), content_encoding)
+        body = stream.read(max_output_size + 1)
+        if len(body) > max_output_size:
+            raise ValueError(f"Decompressed body exceeds {max_output_size} bytes")
+    payload: dict[str, Any]
+    if content_type == ENCODINGS["msgpack"]:
+        if msgpack is None:
+            raise ValueError("msgpack encoding requires the msgpack package")
+        payload = msgpack.unpackb(body)
+    else:
+        payload = orjson.loads(body)
+    return payload
+
+
+def _split_series(series: dict[str, Any]) -> list[dict[str, Any]]:
+    half = len(series["t"]) // 2
+    head, tail = dict(series), dict(series)
+    for key, values in series.items():
+        if isinstance(values, list):
+            head[key], tail[key] = values[:half], values[half:]
+    return [head, tail]
+
+
+def pack_batches(
+    header: dict[str, Any],
+    series: Sequence[dict[str, Any]],
+    max_bytes: int,
+    encoding: str,
+    compression: str,
+) -> list[tuple[dict[str, Any], bytes, int]]:
+    """Split a window into ``(part header, body, raw size)`` bodies of at most ``max_bytes``."""
+    parts: list[tuple[list[dict[str, Any]], bytes, int]] = []
+    pending: list[list[dict[str, Any]]] = [list(series)]
+    while pending:
+        chunk = pending.pop(0)
+        body, raw_size = encode_body({**header, "series": chunk}, encoding, compression)
+        if len(body) <= max_bytes or (len(chunk) == 1 and len(chunk[0]["t"]) <= 1):
+            parts.append((chunk, body, raw_size))
+        elif len(chunk) > 1:
+            middle = len(chunk) // 2
+            pending[:0] = [chunk[:middle], chunk[middle:]]
+        else:
+            pending[:0] = [[part] for part in _split_series(chunk[0])]
+    return [
+        ({**header, "part": index, "parts": len(parts), "series": len(chunk)}, body, raw_size)
+        for index, (chunk, body, raw_size) in enumerate(parts)
+    ]
+
+
+__all__ = ["check_codec", "content_headers", "decode_body", "encode_body", "pack_batches"]
@@ -1,19 +1,88 @@
 from __future__ import annotations
 
+import asyncio
+import random
+from contextlib import aclosing
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Callable, Dict
 
 import httpx
 
-from ..store.database import Database, MeasurementRecord
+from ..core.executor import WorkerPool
+from ..store.database import QUALITY_RANK, Database, UplinkQueueRecord, as_utc
 from ..utils.config import UplinkConfig
+from ..utils.http import create_client
+from .backlog import merge_windows
+from .encoding import check_codec, content_headers, pack_batches
+
+SAMPLE_PERIOD_S = 60
+AGGREGATES = ("avg", "min", "max", "last", "count")
+
+
+@dataclass
+class UplinkStats:
+    windows: int = 0
+    batches: int = 0
+    raw_bytes: int = 0
+    encoded_bytes: int = 0
+    bytes_sent: int = 0
+    delivered: int = 0
+    failed_posts: int = 0
+    backoff_s: float = 0.0
+    backlog_rows: int = 0
+    backlog_bytes: int = 0
+    compacted_rows: int = 0
+    dropped_batches: int = 0
+
+    @property
+    def compression_ratio(self) -> float:
+        """Uncompressed over encoded size of everything queued so far."""
+        return self.raw_bytes / self.encoded_bytes if self.encoded_bytes else 1.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "windows": self.windows,
+            "batches": self.batches,
+            "raw_bytes": self.raw_bytes,
+            "encoded_bytes": self.encoded_bytes,
+            "bytes_sent": self.bytes_sent,
+            "delivered": self.delivered,
+            "failed_posts": self.failed_posts,
+            "backoff_s": round(self.backoff_s, 1),
+            "backlog_rows": self.backlog_rows,
+            "backlog_bytes": self.backlog_bytes,
+            "compacted_rows": self.compacted_rows,
+            "dropped_batches": self.dropped_batches,
+            "compression_ratio": round(self.compression_ratio, 2),
+        }
 
 
 class UplinkPublisher:
-    def __init__(self, db: Database, config: UplinkConfig) -> None:
+    """Queues uplink windows as per-minute aggregates and drains the backlog."""
+
+    def __init__(
+        self,
+        db: Database,
+        config: UplinkConfig,
+        pool: WorkerPool | None = None,
+        client: httpx.AsyncClient | None = None,
+    ) -> None:
+        check_codec(config.encoding, config.compression)
         self._db = db
         self._config = config
-        self._client = httpx.AsyncClient(timeout=10.0, verify=config.tls_verify)
+        self._pool = pool
+        self._headers = content_headers(config.encoding, config.compression)
+        self._client = client or create_client(
+            verify=config.tls_verify, http2=config.http2, max_connections=config.max_in_flight
+        )
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = asyncio.Lock()
+        # Backlog gauges are kept current on enqueue and ack; the first drain and every
+        # compaction reset them from the queue table.
+        self._backlog_synced = False
+        self.stats = UplinkStats()
 
     async def close(self) -> None:
         await self._client.aclose()
@@ -22,49 +91,238 @@ class UplinkPublisher:
         now = datetime.now(timezone.utc)
         ts_end = now.replace(second=0, microsecond=0)
         ts_start = ts_end - timedelta(seconds=self._config.batch_period_s)
-        records = await self._db.latest_measurements(since=ts_start)
-        payload = self._build_payload(records, ts_start, ts_end)
-        await self._db.enqueue_uplink(payload, ts_start, ts_end)
+        await self.queue_window(ts_start, ts_end)
         await self.flush()
 
-    async def flush(self) -> None:
-        pending = await self._db.pending_uplink()
-        for row in pending:
+    async def queue_window(self, ts_start: datetime, ts_end: datetime) -> int:
+        """Aggregate, encode and enqueue one window; returns the number of batches."""
+        header, series = await self._build_payload(ts_start, ts_end)
+        batches = await self._offload(
+            pack_batches,
+            header,
+            series,
+            self._config.max_batch_kb * 1024,
+            self._config.encoding,
+            self._config.compression,
+        )
+        for part_header, body, raw_size in batches:
+            await self._db.enqueue_uplink(
+                part_header, ts_start, ts_end, body=body, headers=self._headers
+            )
+            self.stats.raw_bytes += raw_size
+            self.stats.encoded_bytes += len(body)
+            self.stats.backlog_rows += 1
+            self.stats.backlog_bytes += len(body)
+        self.stats.windows += 1
+        self.stats.batches += len(batches)
+        return len(batches)
+
+    async def _offload(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._pool is None:
+            return fn(*args)
+        return await self._pool.run(fn, *args)
+
+    async def flush(self) -> int:
+        """Deliver queued batches; returns how many were acknowledged."""
+        loop = asyncio.get_running_loop()
+        if loop.time() < self._retry_at:
+            return 0
+        async with self._lock:
+            return await self._drain(loop)
+
+    async def _drain(self, loop: asyncio.AbstractEventLoop) -> int:
+        if not self._backlog_synced:
+            await self._sync_backlog()
+        semaphore = asyncio.Semaphore(self._config.max_in_flight)
+        delivered = 0
+        retry_after: float | None = None
+        async with aclosing(self._db.iter_pending_uplink(self._config.drain_page_size)) as pages:
+            async for page in pages:
+                results = await asyncio.gather(*(self._post(row, semaphore) for row in page))
+                acked_rows = [row for row, (ok, _) in zip(page, results) if ok]
+                acked = [row.id for row in acked_rows]
+                await self._db.mark_uplink_delivered_many(acked)
+                delivered += len(acked)
+                self.stats.delivered += len(acked)
+                self.stats.backlog_rows -= len(acked)
+                self.stats.backlog_bytes -= sum(len(row.body or b"") for row in acked_rows)
+                if len(acked) < len(page):
+                    retry_after = max((hint or 0.0 for _, hint in results), default=0.0)
+                    break
+            else:
+                self._failures = 0
+                self.stats.backoff_s = 0.0
+                return delivered
+        self._failures += 1
+        delay = min(
+            self._config.backoff_initial_s * 2 ** (self._failures - 1), self._config.backoff_max_s
+        )
+        # Jitter keeps a fleet of gateways from reconnecting in lockstep.
+        self.stats.backoff_s = max(delay * random.uniform(0.5, 1.0), retry_after or 0.0)
+        self._retry_at = loop.time() + self.stats.backoff_s
+        return delivered
+
+    async def compact_backlog(self, now: datetime | None = None) -> int:
+        """Merge and downsample queued windows, enforce the budget; returns rows rewritten."""
+        config = self._config
+        now = now or datetime.now(timezone.utc)
+        cutoff = (
+            now - timedelta(hours=config.backlog_downsample_after_h)
+            if config.backlog_downsample_after_h is not None
+            else None
+        )
+        max_bytes = config.max_batch_kb * 1024
+        rewritten = 0
+        async with self._lock:
+            await self._db.purge_delivered_uplink()
+            _, _, last_id = await self._db.uplink_backlog()
+            group: list[UplinkQueueRecord] = []
+            group_old = False
+            group_bytes = 0
+            group_period = 0
+            async with aclosing(
+                self._db.iter_pending_uplink(config.drain_page_size, until_id=last_id)
+            ) as pages:
+                async for page in pages:
+                    for row in page:
+                        old = cutoff is not None and as_utc(row.ts_end) <= cutoff
+                        period = self._target_period(row, old)
+                        # Downsampling shrinks old windows, so more of them fit per batch.
+                        limit = max_bytes * (
+                            config.backlog_downsample_s // SAMPLE_PERIOD_S if old else 1
+                        )
+                        if row.body is None or (
+                            group
+                            and (
+                                old != group_old
+                                or period != group_period
+                                or group_bytes + len(row.body) > limit
+                                or row.content_type != group[0].content_type
+                                or row.content_encoding != group[0].content_encoding
+                            )
+                        ):
+                            rewritten += await self._rewrite(group, group_old)
+                            group, group_bytes = [], 0
+                        if row.body is not None:
+                            group.append(row)
+                            group_bytes += len(row.body)
+                            group_old = old
+                            group_period = period
+            rewritten += await self._rewrite(group, group_old)
+            dropped = await self._db.drop_uplink(
+                int(config.backlog_max_mb * 1024 * 1024),
+                oldest_first=config.backlog_drop_policy == "oldest",
+            )
+            await self._sync_backlog()
+        self.stats.compacted_rows += rewritten
+        self.stats.dropped_batches += dropped
+        return rewritten
+
+    async def _sync_backlog(self) -> None:
+        rows, size, _ = await self._db.uplink_backlog()
+        self.stats.backlog_rows, self.stats.backlog_bytes = rows, size
+        self._backlog_synced = True
+
+    def _target_period(self, row: UplinkQueueRecord, old: bool) -> int:
+        """Sample period ``row`` will have once compacted; only equal periods merge."""
+        period = int(row.payload.get("sample_period_s", SAMPLE_PERIOD_S))
+        if old and period < self._config.backlog_downsample_s:
+            return self._config.backlog_downsample_s
+        return period
+
+    async def _rewrite(self, group: list[UplinkQueueRecord], old: bool) -> int:
+        downsample_s = self._config.backlog_downsample_s if old else None
+        needs_downsample = downsample_s is not None and any(
+            row.payload.get("sample_period_s", SAMPLE_PERIOD_S) < downsample_s for row in group
+        )
+        if len(group) < 2 and not needs_downsample:
+            return 0
+        batches = await self._offload(
+            merge_windows,
+            [(row.body, row.content_type, row.content_encoding) for row in group],
+            self._config.max_batch_kb * 1024,
+            self._config.encoding,
+            self._config.compression,
+            downsample_s,
+        )
+        if len(batches) >= len(group) and not needs_downsample:
+            return 0
+        ts_start = min(row.ts_start for row in group)
+        ts_end = max(row.ts_end for row in group)
+        await self._db.replace_uplink(
+            [row.id for row in group],
+            [(header, ts_start, ts_end, body, self._headers) for header, body, _ in batches],
+        )
+        return len(group)
+
+    async def _post(
+        self, row: UplinkQueueRecord, semaphore: asyncio.Semaphore
+    ) -> tuple[bool, float | None]:
+        headers = {"Authorization": f"Bearer {self._config.api_key}"}
+        async with semaphore:
             try:
-                await self._client.post(
-                    str(self._config.url),
-                    headers={"Authorization": f"Bearer {self._config.api_key}"},
-                    json=row.payload,
-                )
+                if row.body is None:
+                    # Rows queued before bodies were stored carry the full JSON payload.
+                    response = await self._client.post(
+                        str(self._config.url), headers=headers, json=row.payload
+                    )
+                else:
+                    headers["Content-Type"] = row.content_type or "application/json"
+                    if row.content_encoding:
+                        headers["Content-Encoding"] = row.content_encoding
+                    response = await self._client.post(
+                        str(self._config.url), headers=headers, content=row.body
+                    )
             except httpx.HTTPError:
-                continue
-            else:
-                await self._db.mark_uplink_delivered(row.id)
-
-    def _build_payload(
-        self, records: list[MeasurementRecord], ts_start: datetime, ts_end: datetime
-    ) -> dict[str, Any]:
-        devices: dict[str, list[dict[str, Any]]] = {}
-        for rec in records:
-            devices.setdefault(rec.device_id, []).append(
-                {
-                    "ts": rec.timestamp_utc.isoformat(),
-                    "metric": rec.metric,
-                    "value": rec.value,
-                    "unit": rec.unit,
-                    "quality": rec.quality,
+                self.stats.failed_posts += 1
+                return False, None
+        if not response.is_success:
+            self.stats.failed_posts += 1
+            return False, _retry_after(response)
+        self.stats.bytes_sent += len(row.body) if row.body is not None else 0
+        return True, None
+
+    async def _build_payload(
+        self, ts_start: datetime, ts_end: datetime
+    ) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+        plant_id: str | None = None
+        origin = int(ts_start.timestamp())
+        series: list[dict[str, Any]] = []
+        current: dict[str, Any] | None = None
+        async for row in self._db.iter_window_aggregates(ts_start, ts_end, SAMPLE_PERIOD_S):
+            plant_id = plant_id or row.plant_id
+            if current is None or (current["device_id"], current["metric"]) != (
+                row.device_id,
+                row.metric,
+            ):
+                current = {
+                    "device_id": row.device_id,
+                    "metric": row.metric,
+                    "unit": row.unit,
+                    "t": [],
+                    "quality": [],
+                    **{name: [] for name in AGGREGATES},
                 }
-            )
-        return {
-            "plant_id": records[0].plant_id if records else None,
+                series.append(current)
+            current["t"].append(row.bucket - origin)
+            current["quality"].append(row.quality_rank)
+            for name in AGGREGATES:
+                current[name].append(getattr(row, name))
+        header = {
+            "plant_id": plant_id,
             "ts_start": ts_start.isoformat(),
             "ts_end": ts_end.isoformat(),
-            "sample_period_s": 60,
-            "devices": [
-                {"device_id": device_id, "samples": samples}
-                for device_id, samples in devices.items()
-            ],
+            "sample_period_s": SAMPLE_PERIOD_S,
+            "quality_levels": list(QUALITY_RANK),
         }
+        return header, series
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
 
 
-__all__ = ["UplinkPublisher"]
+__all__ = ["UplinkPublisher", "UplinkStats"]
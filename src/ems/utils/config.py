@@ -47,6 +47,36 @@ class UplinkConfig(BaseModel):
     batch_period_s: int = 300
     max_batch_kb: int = 512
     tls_verify: bool = True
+    encoding: str = "json"
+    compression: str = "gzip"
+    max_in_flight: int = 4
+    drain_page_size: int = 50
+    http2: bool = False
+    backoff_initial_s: float = 5.0
+    backoff_max_s: float = 600.0
+    backlog_compact_interval_s: int = 900
+    backlog_downsample_after_h: float | None = 24
+    backlog_downsample_s: int = 900
+    backlog_max_mb: float = 256
+    backlog_drop_policy: str = "oldest"
+
+    @validator("encoding")
+    def _encoding(cls, value: str) -> str:
+        if value not in {"json", "msgpack"}:
+            raise ValueError("encoding must be json or msgpack")
+        return value
+
+    @validator("compression")
+    def _compression(cls, value: str) -> str:
+        if value not in {"none", "gzip", "zstd"}:
+            raise ValueError("compression must be none, gzip or zstd")
+        return value
+
+    @validator("backlog_drop_policy")
+    def _drop_policy(cls, value: str) -> str:
+        if value not in {"oldest", "newest"}:
+            raise ValueError("backlog_drop_policy must be oldest or newest")
+        return value
 
 
 class ExportConfig(BaseModel):
@@ -55,6 +85,63 @@ class ExportConfig(BaseModel):
     registermap_url: HttpUrl
     auth_token: str
     include_raw_registers: bool = False
+    registermap_push_interval_s: int = 3600
+    snapshot_push_interval_s: int = 10
+    snapshot_keyframe_interval_s: int = 300
+    snapshot_window_s: int = 60
+    snapshot_compression: str = "gzip"
+
+    @validator("snapshot_compression")
+    def _snapshot_compression(cls, value: str) -> str:
+        if value not in {"none", "gzip", "zstd"}:
+            raise ValueError("snapshot_compression must be none, gzip or zstd")
+        return value
+
+
+class SQLitePragmaConfig(BaseModel):
+    mmap_size: int = 64 * 1024 * 1024
+    cache_size: int = -16000
+    temp_store: str = "MEMORY"
+    busy_timeout: int = 5000
+    wal_autocheckpoint: int = 1000
+
+    @validator("temp_store")
+    def _temp_store(cls, value: str) -> str:
+        value = value.upper()
+        if value not in {"DEFAULT", "FILE", "MEMORY"}:
+            raise ValueError("temp_store must be DEFAULT, FILE or MEMORY")
+        return value
+
+
+class ChunkStoreConfig(BaseModel):
+    enabled: bool = False
+    chunk_s: int = 3600
+    retention_days: int = 365
+
+
+class MaintenanceConfig(BaseModel):
+    interval_s: int = 300
+    wal_passive_mb: float = 16
+    wal_truncate_mb: float = 64
+    low_load_hours: List[int] = Field(default_factory=lambda: [1, 2, 3, 4])
+    vacuum_min_free_pages: int = 1024
+    vacuum_pages_per_run: int = 4096
+    analyze_interval_h: int = 24
+    convert_auto_vacuum: bool = False
+
+
+class TieredStorageConfig(BaseModel):
+    enabled: bool = False
+    flush_interval_s: int = 300
+    max_buffer_kb: int = 4096
+    journal_path: str | None = "/dev/shm/ems/measurements.journal"
+
+
+class CompactionConfig(BaseModel):
+    enabled: bool = True
+    interval_s: int = 3600
+    monthly: bool = False
+    row_group_size: int = 131072
 
 
 class StorageConfig(BaseModel):
@@ -62,12 +149,37 @@ class StorageConfig(BaseModel):
     retention_days: int = 30
     export_parquet_dir: str
     export_interval_s: int = 3600
+    store_raw_registers: bool = False
+    raw_register_retention_hours: int = 24
+    read_pool_size: int = 4
+    sqlite: SQLitePragmaConfig = Field(default_factory=SQLitePragmaConfig)
+    chunks: ChunkStoreConfig = Field(default_factory=ChunkStoreConfig)
+    maintenance: MaintenanceConfig = Field(default_factory=MaintenanceConfig)
+    tiered: TieredStorageConfig = Field(default_factory=TieredStorageConfig)
+    compaction: CompactionConfig = Field(default_factory=CompactionConfig)
 
 
 class APIConfig(BaseModel):
     bind_host: str = "0.0.0.0"
     port: int = 8080
     auth_token: str
+    stream_max_clients: int = 16
+    stream_min_interval_s: float = 1.0
+    stream_keepalive_s: float = 15.0
+    compression: bool = True
+    compression_min_bytes: int = 1024
+    compression_offload_bytes: int = 65536
+    gzip_level: int = 6
+    # "separate" serves the API/UI from its own process so requests cannot delay polls.
+    process: str = "inline"
+    ipc_socket: str = "data/ems-live.sock"
+    ipc_state_interval_s: float = 1.0
+
+    @validator("process")
+    def _process(cls, value: str) -> str:
+        if value not in {"inline", "separate"}:
+            raise ValueError("process must be inline or separate")
+        return value
 
 
 class UIConfig(BaseModel):
@@ -92,6 +204,25 @@ class SchedulerConfig(BaseModel):
     watchdog_interval_s: int = 30
 
 
+class WorkerPoolConfig(BaseModel):
+    kind: str = "thread"
+    max_workers: int = 2
+
+    @validator("kind")
+    def _kind(cls, value: str) -> str:
+        if value not in {"thread", "process"}:
+            raise ValueError("kind must be thread or process")
+        return value
+
+
+class MetricsConfig(BaseModel):
+    # Series per metric family; families not listed use ``max_series``.
+    max_series: int = 1000
+    family_limits: Dict[str, int] = Field(default_factory=lambda: {"ems_last_value": 500})
+    # Metrics exported as ``ems_last_value``; empty exports every metric up to the limit.
+    last_value_metrics: List[str] = Field(default_factory=list)
+
+
 class GlobalConfig(BaseModel):
     enable_control: bool = False
     dry_run: bool = True
@@ -103,6 +234,16 @@ class GlobalConfig(BaseModel):
     logging: LoggingConfig = Field(default_factory=LoggingConfig)
     security: SecurityConfig
     scheduler: SchedulerConfig = Field(default_factory=SchedulerConfig)
+    workers: WorkerPoolConfig = Field(default_factory=WorkerPoolConfig)
+    metrics: MetricsConfig = Field(default_factory=MetricsConfig)
+
+    @validator("api")
+    def _api_process(cls, value: APIConfig, values: Dict[str, Any]) -> APIConfig:
+        storage = values.get("storage")
+        # The API process reads SQLite directly and would not see rows still in RAM.
+        if value.process == "separate" and storage is not None and storage.tiered.enabled:
+            raise ValueError("api.process separate cannot be combined with storage.tiered")
+        return value
 
 
 class PlantConfig(BaseModel):
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import importlib.util
+
+import httpx
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def create_client(
+    verify: bool = True,
+    http2: bool = False,
+    max_connections: int = 8,
+    timeout: float = 10.0,
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> httpx.AsyncClient:
+    """Pooled keep-alive client shared by upstream senders, HTTP/2 if ``h2`` is installed."""
+    return httpx.AsyncClient(
+        timeout=timeout,
+        verify=verify,
+        http2=http2 and http2_available(),
+        limits=httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        ),
+        transport=transport,
+    )
+
+
+__all__ = ["create_client", "http2_available"]
@@ -0,0 +1,91 @@
+"""In-process stand-in for the cloud ingest endpoint, used by tests and bench_uplink.py."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from ems.uplink.encoding import decode_body
+
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+@dataclass
+class IngestStats:
+    requests: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    bytes_received: int = 0
+    max_concurrent: int = 0
+    batches: list[dict[str, Any]] = field(default_factory=list)
+
+
+class IngestStandIn:
+    """In-process ASGI stand-in for the cloud ingest endpoint.
+
+    Serve it with ``httpx.ASGITransport`` to exercise the uplink without a network.
+    Each request waits ``latency_s`` and fails with 503 at ``failure_rate``. Accepted
+    bodies are decoded according to their content headers and, with ``keep_batches``,
+    retained for inspection.
+    """
+
+    def __init__(
+        self,
+        latency_s: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+        keep_batches: bool = True,
+    ) -> None:
+        self.latency_s = latency_s
+        self.failure_rate = failure_rate
+        self.keep_batches = keep_batches
+        self._random = random.Random(seed)
+        self._concurrent = 0
+        self.stats = IngestStats()
+
+    async def __call__(self, scope: dict[str, Any], receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return
+        body = b""
+        more = True
+        while more:
+            message = await receive()
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+        self.stats.requests += 1
+        self._concurrent += 1
+        self.stats.max_concurrent = max(self.stats.max_concurrent, self._concurrent)
+        try:
+            if self.latency_s:
+                await asyncio.sleep(self.latency_s)
+        finally:
+            self._concurrent -= 1
+        if self._random.random() < self.failure_rate:
+            self.stats.rejected += 1
+            await _respond(send, 503)
+            return
+        self.stats.accepted += 1
+        self.stats.bytes_received += len(body)
+        if self.keep_batches:
+            headers = {key.decode(): value.decode() for key, value in scope["headers"]}
+            self.stats.batches.append(
+                decode_body(body, headers.get("content-type"), headers.get("content-encoding"))
+            )
+        await _respond(send, 200)
+
+
+async def _respond(send: Send, status: int) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", b"2")],
+        }
+    )
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+__all__ = ["IngestStandIn", "IngestStats"]
@@ -1,10 +1,25 @@
+import io
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import orjson
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 import pytest
 from httpx import AsyncClient
 
 from ems.api.app import APIContext, create_app
+from ems.api.live import LiveHub
+from ems.core.executor import LoopLagMonitor, WorkerPool
 from ems.core.health import HealthRegistry
+from ems.core.telemetry import Telemetry
+from ems.export.service import ExportService
 from ems.store.database import Database
-from ems.utils.config import AppConfig
+from ems.utils.config import AppConfig, load_config
+from ems.utils.models import Measurement
+
+CONFIG_PATH = Path(__file__).resolve().parents[1] / "config.yaml"
 
 
 class DummyExportService:
@@ -79,3 +94,438 @@ async def test_health_endpoint(tmp_path):
         cfg = await client.get("/config", headers={"Authorization": "Bearer token"})
         assert cfg.status_code == 200
         assert cfg.json()["global"]["api"]["auth_token"] == "***"
+
+
+@pytest.mark.asyncio
+async def test_measurements_cursor_and_ndjson(tmp_path):
+    config = load_config(CONFIG_PATH)
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    start = datetime.now(timezone.utc) - timedelta(minutes=30)
+    await db.insert_measurements(
+        [
+            Measurement(
+                timestamp_utc=start + timedelta(seconds=10 * (i // 2)),
+                plant_id="plant",
+                device_id="dev",
+                metric=f"M{i % 2}",
+                value=float(i),
+                source="test",
+            )
+            for i in range(25)
+        ]
+    )
+    app = create_app(
+        APIContext(
+            config=config,
+            db=db,
+            export_service=DummyExportService(),
+            health=HealthRegistry(),
+            device_status={},
+            allow_control=False,
+            dry_run=True,
+        )
+    )
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        values, cursor = [], None
+        while True:
+            params = {"device_id": "dev", "paged": "true", "limit": 10}
+            if cursor:
+                params["cursor"] = cursor
+            page = (await client.get("/measurements", params=params)).json()
+            values.extend(item["value"] for item in page["items"])
+            cursor = page["next"]
+            if cursor is None:
+                break
+        assert values == [float(i) for i in range(25)]
+        resp = await client.get(
+            "/measurements", params={"device_id": "dev", "format": "ndjson", "limit": 7}
+        )
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        lines = [orjson.loads(line) for line in resp.text.splitlines()]
+        assert [line["value"] for line in lines] == values
+        bad = await client.get("/measurements", params={"device_id": "dev", "cursor": "!!"})
+        assert bad.status_code == 400
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_export_snapshot_etag(tmp_path):
+    config = load_config(CONFIG_PATH)
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    config.global_.api.compression_min_bytes = 16
+    service = ExportService(db, config.global_.export, devices=[])
+    measurement = Measurement(
+        timestamp_utc=datetime.now(timezone.utc),
+        plant_id="plant",
+        device_id="dev",
+        metric="AC_P",
+        value=1.0,
+        source="test",
+    )
+    await db.insert_measurements([measurement])
+    app = create_app(
+        APIContext(
+            config=config,
+            db=db,
+            export_service=service,
+            health=HealthRegistry(),
+            device_status={},
+            allow_control=False,
+            dry_run=True,
+        )
+    )
+    headers = {"Authorization": "Bearer LOCAL_API_TOKEN"}
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        first = await client.get("/export/snapshot", params={"window_s": 3600}, headers=headers)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        # The gzip body differs from the identity one, so only a weak tag is shared.
+        assert first.headers["content-encoding"] == "gzip"
+        assert etag.startswith('W/"')
+        identity = await client.get(
+            "/export/snapshot",
+            params={"window_s": 3600},
+            headers={**headers, "Accept-Encoding": "identity"},
+        )
+        assert identity.headers["etag"] == etag.removeprefix("W/")
+        assert identity.headers["vary"] == "Accept-Encoding"
+        assert first.json()["devices"][0]["metrics"][0]["value"] == 1.0
+        again = await client.get("/export/snapshot", params={"window_s": 3600}, headers=headers)
+        assert again.content == first.content
+        cached = await client.get(
+            "/export/snapshot",
+            params={"window_s": 3600},
+            headers={**headers, "If-None-Match": etag},
+        )
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == etag
+        assert cached.headers["vary"] == "Accept-Encoding"
+        await db.insert_measurements([measurement.model_copy(update={"value": 2.0})])
+        fresh = await client.get(
+            "/export/snapshot",
+            params={"window_s": 3600},
+            headers={**headers, "If-None-Match": etag},
+        )
+        assert fresh.status_code == 200
+        assert fresh.headers["etag"] != etag
+        # Below the size threshold the body stays plain, but the tag matches the 304's.
+        config.global_.api.compression_min_bytes = 1 << 20
+        small = create_app(
+            APIContext(
+                config=config,
+                db=db,
+                export_service=service,
+                health=HealthRegistry(),
+                device_status={},
+                allow_control=False,
+                dry_run=True,
+            )
+        )
+        async with AsyncClient(app=small, base_url="http://test") as small_client:
+            plain = await small_client.get(
+                "/export/snapshot", params={"window_s": 3600}, headers=headers
+            )
+            assert "content-encoding" not in plain.headers
+            revalidated = await small_client.get(
+                "/export/snapshot",
+                params={"window_s": 3600},
+                headers={**headers, "If-None-Match": plain.headers["etag"]},
+            )
+            assert revalidated.status_code == 304
+            assert revalidated.headers["etag"] == plain.headers["etag"]
+            assert plain.headers["etag"].startswith('W/"')
+    await service.close()
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_export_registermaps_keeps_devices_shape(tmp_path):
+    config = load_config(CONFIG_PATH)
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    point_map = tmp_path / "map.yaml"
+    point_map.write_text("points:\n  - name: AC_P\n    address: 40083\n")
+    devices = [{"id": "inv-1", "make": "Acme", "point_map": str(point_map)}]
+    service = ExportService(db, config.global_.export, devices)
+    app = create_app(
+        APIContext(
+            config=config,
+            db=db,
+            export_service=service,
+            health=HealthRegistry(),
+            device_status={},
+            allow_control=False,
+            dry_run=True,
+        )
+    )
+    headers = {"Authorization": "Bearer LOCAL_API_TOKEN"}
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        resp = await client.get("/export/registermaps", headers=headers)
+        dedup = await client.get("/export/registermaps", params={"dedup": True}, headers=headers)
+    body = resp.json()
+    assert list(body) == ["devices"]
+    assert body["devices"][0]["device_id"] == "inv-1"
+    assert body["devices"][0]["make"] == "Acme"
+    assert body["devices"][0]["map"] == {"points": [{"name": "AC_P", "address": 40083}]}
+    assert body["devices"][0]["hash"] == dedup.json()["devices"][0]["hash"]
+    assert resp.headers["etag"] != dedup.headers["etag"]
+    await service.close()
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_measurements_bulk_columnar(tmp_path):
+    config = load_config(CONFIG_PATH)
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    start = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(minutes=10)
+    await db.insert_measurements(
+        [
+            Measurement(
+                timestamp_utc=start + timedelta(seconds=i),
+                plant_id="plant",
+                device_id=f"dev-{i % 3}",
+                metric=metric,
+                value=float(i),
+                source="test",
+            )
+            for i in range(30)
+            for metric in ("AC_P", "AC_Q")
+        ]
+    )
+    stale = Measurement(
+        timestamp_utc=start - timedelta(days=2),
+        plant_id="plant",
+        device_id="dev-stale",
+        metric="AC_P",
+        value=1.0,
+        source="test",
+    )
+    await db.insert_measurements([stale])
+    app = create_app(
+        APIContext(
+            config=config,
+            db=db,
+            export_service=DummyExportService(),
+            health=HealthRegistry(),
+            device_status={},
+            allow_control=False,
+            dry_run=True,
+        )
+    )
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        resp = await client.get(
+            "/measurements/bulk",
+            params={"device_id": ["dev-0", "dev-2"], "metric": "AC_P", "limit": 4, "epoch": True},
+        )
+        assert resp.status_code == 200
+        body = resp.json()
+        assert [(s["device_id"], s["metric"]) for s in body["series"]] == [
+            ("dev-0", "AC_P"),
+            ("dev-2", "AC_P"),
+        ]
+        assert body["series"][0]["value"] == [18.0, 21.0, 24.0, 27.0]
+        assert body["series"][1]["t"][-1] == start.timestamp() + 29
+        assert body["count"] == 8
+        lines = (await client.get("/measurements/bulk", params={"format": "ndjson"})).text
+        # Without ``since`` only the last day is ranked, so the stale series drops out.
+        assert len(lines.splitlines()) == 6
+        since = (start - timedelta(days=3)).isoformat()
+        lines = (
+            await client.get("/measurements/bulk", params={"format": "ndjson", "since": since})
+        ).text
+        assert len(lines.splitlines()) == 7
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_large_responses_are_compressed(tmp_path):
+    config = load_config(CONFIG_PATH)
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    start = datetime.now(timezone.utc) - timedelta(minutes=10)
+    await db.insert_measurements(
+        [
+            Measurement(
+                timestamp_utc=start + timedelta(seconds=i),
+                plant_id="plant",
+                device_id="dev",
+                metric="AC_P",
+                value=float(i),
+                source="test",
+            )
+            for i in range(200)
+        ]
+    )
+    pool = WorkerPool(max_workers=1)
+    config.global_.api.compression_offload_bytes = 4096
+    app = create_app(
+        APIContext(
+            config=config,
+            db=db,
+            export_service=DummyExportService(),
+            health=HealthRegistry(),
+            device_status={},
+            allow_control=False,
+            dry_run=True,
+            workers=pool,
+        )
+    )
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        params = {"device_id": "dev"}
+        plain = await client.get(
+            "/measurements", params=params, headers={"Accept-Encoding": "identity"}
+        )
+        assert "content-encoding" not in plain.headers
+        packed = await client.get(
+            "/measurements", params=params, headers={"Accept-Encoding": "gzip"}
+        )
+        assert packed.headers["content-encoding"] == "gzip"
+        assert packed.headers["vary"] == "Accept-Encoding"
+        assert int(packed.headers["content-length"]) < len(plain.content) / 3
+        assert packed.json() == plain.json()
+        assert len(plain.content) >= 4096 and pool.stats.completed == 1
+        small = await client.get("/devices", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in small.headers
+        assert pool.stats.completed == 1
+    pool.shutdown()
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_metrics_render_cached_state(tmp_path):
+    config = load_config(CONFIG_PATH)
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    now = datetime.now(timezone.utc)
+    batch = [
+        Measurement(
+            timestamp_utc=now,
+            plant_id="plant",
+            device_id=f"inv-{device}",
+            metric=metric,
+            value=None if metric == "BAD" else 1.5,
+            unit="kW",
+            source="test",
+        )
+        for device in range(3)
+        for metric in ("AC_P", "AC_Q", "BAD")
+    ]
+    await db.write_measurements(batch)
+    telemetry = Telemetry()
+    live = LiveHub()
+    for device in range(3):
+        telemetry.record_poll(f"inv-{device}", 0.25, batch[device * 3 : device * 3 + 3])
+    telemetry.record_poll("inv-0", 0.5, None)
+    live.publish(batch)
+    loop_lag = LoopLagMonitor()
+    loop_lag.observe(0.5, now=0.0)
+    loop_lag.observe(0.01, now=1.0)
+    config.global_.metrics.family_limits = {"ems_last_value": 4, "ems_device": 2}
+    config.global_.metrics.last_value_metrics = ["AC_P", "AC_Q"]
+    app = create_app(
+        APIContext(
+            config=config,
+            db=db,
+            export_service=DummyExportService(),
+            health=HealthRegistry(),
+            device_status={},
+            allow_control=False,
+            dry_run=True,
+            telemetry=telemetry,
+            live=live,
+            loop_lag=loop_lag,
+        )
+    )
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        text = (await client.get("/metrics")).text
+        # Scraping does not reset the peak; only the window moving past it does.
+        assert "ems_event_loop_lag_seconds 0.5" in (await client.get("/metrics")).text
+        loop_lag.observe(0.02, now=61.0)
+        assert "ems_event_loop_lag_seconds 0.02" in (await client.get("/metrics")).text
+    assert "ems_event_loop_lag_seconds 0.5" in text
+    assert 'ems_device_polls_total{device="inv-0"} 2.0' in text
+    assert 'ems_device_poll_failures_total{device="inv-0"} 1.0' in text
+    assert 'ems_device_decode_errors_total{device="inv-1"} 1.0' in text
+    assert 'ems_device_polls_total{device="inv-2"}' not in text
+    assert text.count("ems_last_value{") == 4
+    assert 'ems_metrics_series_dropped{family="ems_last_value"} 2.0' in text
+    assert 'ems_metrics_series_dropped{family="ems_device"} 1.0' in text
+    assert "ems_db_write_seconds_count 1.0" in text
+    assert "ems_api_requests_total" in text
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_export_history_streams_formats(tmp_path):
+    config = load_config(CONFIG_PATH)
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    await db.insert_measurements(
+        [
+            Measurement(
+                timestamp_utc=start + timedelta(seconds=i),
+                plant_id="plant",
+                device_id=f"dev-{i % 2}",
+                metric="AC_P",
+                value=float(i),
+                unit="kW",
+                source="test",
+            )
+            for i in range(450)
+        ]
+    )
+    app = create_app(
+        APIContext(
+            config=config,
+            db=db,
+            export_service=DummyExportService(),
+            health=HealthRegistry(),
+            device_status={},
+            allow_control=False,
+            dry_run=True,
+        )
+    )
+    headers = {"Authorization": "Bearer LOCAL_API_TOKEN"}
+    params = {
+        "since": start.isoformat(),
+        "until": (start + timedelta(seconds=400)).isoformat(),
+        "device_id": "dev-0",
+        "page_size": 100,
+    }
+    expected = [float(i) for i in range(0, 400, 2)]
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        assert (await client.get("/export/history", params=params)).status_code == 401
+        resp = await client.get("/export/history", params=params, headers=headers)
+        assert resp.headers["content-type"] == "application/vnd.apache.arrow.stream"
+        assert "history-20240101T000000" in resp.headers["content-disposition"]
+        table = pa.ipc.open_stream(resp.content).read_all()
+        assert table.column("value").to_pylist() == expected
+        assert set(table.column("device_id").to_pylist()) == {"dev-0"}
+        assert table.column("timestamp_utc")[0].as_py() == start
+
+        resp = await client.get(
+            "/export/history", params={**params, "format": "parquet"}, headers=headers
+        )
+        parquet = pq.ParquetFile(io.BytesIO(resp.content))
+        assert parquet.metadata.num_row_groups == 2
+        assert parquet.read().column("value").to_pylist() == expected
+
+        resp = await client.get(
+            "/export/history", params={**params, "format": "csv"}, headers=headers
+        )
+        assert resp.headers["content-type"].startswith("text/csv")
+        assert pa_csv.read_csv(io.BytesIO(resp.content)).column("value").to_pylist() == expected
+
+        empty = await client.get(
+            "/export/history", params={**params, "device_id": "missing"}, headers=headers
+        )
+        assert pa.ipc.open_stream(empty.content).read_all().num_rows == 0
+        bad = await client.get(
+            "/export/history", params={**params, "since": "yesterday"}, headers=headers
+        )
+        assert bad.status_code == 400
+    await db.close()
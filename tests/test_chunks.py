@@ -0,0 +1,129 @@
+import math
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+import pytest
+from httpx import AsyncClient
+
+from ems.api.app import APIContext, create_app
+from ems.core.health import HealthRegistry
+from ems.store.chunks import ChunkStore, decode_chunk, encode_chunk
+from ems.store.database import Database
+from ems.store.history import HistoryStore
+from ems.utils.config import load_config
+from ems.utils.models import Measurement
+
+CONFIG_PATH = Path(__file__).resolve().parents[1] / "config.yaml"
+
+
+def test_chunk_roundtrip_irregular_series():
+    timestamps = [1_700_000_000_000 + 5000 * i + (i % 7) * 13 for i in range(720)]
+    timestamps[100] += 90_000_000  # large gap exercises the wide delta-of-delta bucket
+    timestamps[101:] = [ts + 90_000_000 for ts in timestamps[101:]]
+    values = [math.sin(i / 10) * 500 for i in range(720)]
+    values[5] = float("nan")
+    values[6:9] = [42.0, 42.0, 42.0]
+    blob = encode_chunk(timestamps, values)
+    assert len(blob) < 720 * 16
+    ts, vals = decode_chunk(blob)
+    assert ts.tolist() == timestamps
+    np.testing.assert_array_equal(vals, np.array(values))
+
+
+@pytest.mark.asyncio
+async def test_series_reads_older_data_from_chunks(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    store = ChunkStore(db, chunk_s=3600, row_retention_days=1)
+    db.use_chunk_store(store)
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(days=2)
+    await db.insert_measurements(
+        [
+            Measurement(
+                timestamp_utc=start + timedelta(minutes=i),
+                plant_id="plant",
+                device_id="dev",
+                metric="AC_P",
+                value=float(i),
+                source="test",
+            )
+            for i in range(0, 2 * 24 * 60, 10)
+        ]
+    )
+    assert await store.seal() > 0
+    while await store.seal():
+        pass
+    await db.purge_old_measurements(retention_days=1)
+    ts, values = await db.series("dev", "AC_P", start, now)
+    assert len(ts) == len(values) == 2 * 24 * 6
+    assert np.all(np.diff(ts) > 0)
+    assert values[0] == 0.0
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_purged_rows_stay_readable_through_history_api(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    store = ChunkStore(db, chunk_s=3600, row_retention_days=1, max_chunks_per_run=6)
+    db.use_chunk_store(store)
+    now = datetime.now(timezone.utc)
+    start = (now - timedelta(days=3)).replace(minute=0, second=0, microsecond=0)
+    await db.insert_measurements(
+        [
+            Measurement(
+                timestamp_utc=start + timedelta(minutes=i),
+                plant_id="plant",
+                device_id="dev",
+                metric=metric,
+                value=None if i == 30 else float(i),
+                unit="kW",
+                source="test",
+            )
+            for i in range(0, 3 * 24 * 60, 10)
+            for metric in ("AC_P", "AC_Q")
+        ]
+    )
+    # Nothing is sealed yet, so retention must not drop anything.
+    await db.purge_old_measurements(retention_days=1)
+    assert len(await db.latest_series(metrics=["AC_P"], since=start, limit=10000)) == 3 * 24 * 6
+    # A partly sealed backlog only releases rows up to the sealed end.
+    await store.seal()
+    await db.purge_old_measurements(retention_days=1)
+    remaining = await db.latest_series(metrics=["AC_P"], since=start, limit=10000)
+    assert remaining[0].timestamp_utc.replace(tzinfo=timezone.utc) == start + timedelta(hours=6)
+    while await store.seal():
+        pass
+    await db.purge_old_measurements(retention_days=1)
+
+    app = create_app(
+        APIContext(
+            config=load_config(CONFIG_PATH),
+            db=db,
+            export_service=None,
+            health=HealthRegistry(),
+            device_status={},
+            allow_control=False,
+            dry_run=True,
+            history=HistoryStore(db, tmp_path / "exports"),
+        )
+    )
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        resp = await client.get(
+            "/history",
+            params={
+                "start": start.isoformat(),
+                "end": now.isoformat(),
+                "metric": "AC_P",
+                "columns": "timestamp_utc,value,unit",
+            },
+        )
+    columns = resp.json()["columns"]
+    assert resp.status_code == 200
+    assert len(columns["value"]) == 3 * 24 * 6
+    assert columns["value"][:4] == [0.0, 10.0, 20.0, None]
+    assert columns["unit"][0] == "kW"
+    assert columns["timestamp_utc"] == sorted(columns["timestamp_utc"])
+    await db.close()
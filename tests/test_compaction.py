@@ -0,0 +1,137 @@
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import pytest
+
+from ems.core.executor import WorkerPool
+from ems.store.compaction import MARKER, ParquetCompactor, compact_files, recover_marker
+from ems.store.exporter import PARQUET_SCHEMA, _PartitionWriter, rows_to_table
+
+
+class _Row(tuple):
+    timestamp_utc = property(lambda self: self[1])
+
+
+def _write_part(directory, first_id, count, metric):
+    start = datetime(2026, 3, 1, tzinfo=timezone.utc) + timedelta(minutes=first_id)
+    rows = [
+        _Row(
+            (
+                first_id + i,
+                start + timedelta(seconds=30 * i),
+                "plant",
+                "inv-1",
+                metric,
+                float(i),
+                "kW",
+                "GOOD",
+                "test",
+            )
+        )
+        for i in range(count)
+    ]
+    writer = _PartitionWriter(directory / f"part-{first_id:012d}.parquet", 65536)
+    writer.write(rows_to_table(rows))
+    writer.close()
+    writer.commit()
+
+
+@pytest.mark.asyncio
+async def test_compaction_merges_closed_days_sorted(tmp_path):
+    day_dir = tmp_path / "date=2026-03-01" / "device_id=inv-1"
+    today_dir = tmp_path / "date=2026-03-02" / "device_id=inv-1"
+    _write_part(day_dir, 1, 50, "AC_P")
+    _write_part(day_dir, 100, 40, "AC_Q")
+    _write_part(day_dir, 200, 30, "AC_P")
+    _write_part(today_dir, 300, 10, "AC_P")
+    pool = WorkerPool(max_workers=1)
+    compactor = ParquetCompactor(tmp_path, pool=pool)
+    try:
+        assert await compactor.run(today=date(2026, 3, 2)) == 1
+        assert [p.name for p in day_dir.iterdir()] == ["day-20260301.parquet"]
+        assert len(list(today_dir.glob("part-*.parquet"))) == 1
+        table = pq.read_table(day_dir / "day-20260301.parquet")
+        assert table.num_rows == 120
+        metrics = table.column("metric").cast("string").to_pylist()
+        assert metrics == sorted(metrics)
+        p_times = [
+            ts for ts, m in zip(table.column("timestamp_utc").to_pylist(), metrics) if m == "AC_P"
+        ]
+        assert p_times == sorted(p_times)
+        dataset = ds.dataset(tmp_path, format="parquet", partitioning="hive")
+        assert dataset.count_rows() == 130
+
+        # A late export into a compacted day is folded into the existing file.
+        _write_part(day_dir, 400, 5, "AC_Q")
+        assert await compactor.run(today=date(2026, 3, 2)) == 1
+        assert pq.read_metadata(day_dir / "day-20260301.parquet").num_rows == 125
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_compaction_monthly_rollup(tmp_path):
+    for day in (1, 2):
+        _write_part(tmp_path / f"date=2026-03-0{day}" / "device_id=inv-1", day * 100, 10, "AC_P")
+    compactor = ParquetCompactor(tmp_path, monthly=True)
+    await compactor.run(today=date(2026, 4, 1))
+    assert [p.name for p in tmp_path.iterdir()] == ["date=2026-03"]
+    month = tmp_path / "date=2026-03" / "device_id=inv-1" / "month-202603.parquet"
+    assert pq.read_table(month).schema.equals(PARQUET_SCHEMA)
+    assert pq.read_metadata(month).num_rows == 20
+
+
+def test_compact_files_streams_into_full_row_groups(tmp_path):
+    day_dir = tmp_path / "date=2026-03-01" / "device_id=inv-1"
+    _write_part(day_dir, 1, 50, "AC_P")
+    _write_part(day_dir, 100, 40, "AC_Q")
+    _write_part(day_dir, 200, 30, "AC_P")
+    output = day_dir / "day-20260301.parquet"
+    assert compact_files(sorted(day_dir.glob("part-*.parquet")), output, 32) == 120
+    metadata = pq.read_metadata(output)
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [
+        32,
+        32,
+        32,
+        24,
+    ]
+    metrics = pq.read_table(output).column("metric").cast("string").to_pylist()
+    assert metrics == ["AC_P"] * 80 + ["AC_Q"] * 40
+
+
+@pytest.mark.asyncio
+async def test_compaction_drops_rows_exported_twice(tmp_path):
+    day_dir = tmp_path / "date=2026-03-01" / "device_id=inv-1"
+    _write_part(day_dir, 1, 20, "AC_P")
+    compactor = ParquetCompactor(tmp_path)
+    await compactor.run(today=date(2026, 3, 2))
+    # Crash after the part was committed but before the watermark: it is exported again.
+    _write_part(day_dir, 1, 20, "AC_P")
+    _write_part(day_dir, 1, 20, "AC_Q")
+    await compactor.run(today=date(2026, 3, 2))
+    table = pq.read_table(day_dir / "day-20260301.parquet")
+    assert table.num_rows == 40
+    assert compactor.stats.rows == 20 + 40
+
+
+def test_recover_marker_rolls_back_or_finishes(tmp_path):
+    day_dir = tmp_path / "date=2026-03-01" / "device_id=inv-1"
+    _write_part(day_dir, 1, 10, "AC_P")
+    part = day_dir / "part-000000000001.parquet"
+    output = day_dir / "day-20260301.parquet"
+    tmp = day_dir / ".day-20260301.parquet.tmp"
+    marker = day_dir / MARKER
+
+    # Crash before the rename: the partial output is dropped, inputs stay.
+    tmp.write_bytes(b"partial")
+    marker.write_text(json.dumps({"output": output.name, "tmp": tmp.name, "inputs": [str(part)]}))
+    recover_marker(marker)
+    assert part.exists() and not tmp.exists() and not marker.exists()
+
+    # Crash after the rename: the leftover inputs are removed.
+    output.write_bytes(part.read_bytes())
+    marker.write_text(json.dumps({"output": output.name, "tmp": tmp.name, "inputs": [str(part)]}))
+    recover_marker(marker)
+    assert [p.name for p in day_dir.iterdir()] == [output.name]
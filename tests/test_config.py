@@ -1,8 +1,9 @@
-from ems.utils.config import load_config
+import pytest
+from pydantic import ValidationError
 
+from ems.utils.config import load_config
 
-def test_env_override(tmp_path, monkeypatch):
-    config_text = """
+CONFIG_TEXT = """
 version: 1
 plant:
   id: test
@@ -52,8 +53,21 @@ can:
   interface: can0
 devices: []
 """
+
+
+def test_env_override(tmp_path, monkeypatch):
     path = tmp_path / "config.yaml"
-    path.write_text(config_text)
+    path.write_text(CONFIG_TEXT)
     monkeypatch.setenv("EMS_GLOBAL__ENABLE_CONTROL", "true")
     config = load_config(path)
     assert config.global_.enable_control is True
+
+
+def test_separate_api_process_rejects_tiered_storage(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    path.write_text(CONFIG_TEXT)
+    monkeypatch.setenv("EMS_GLOBAL__API__PROCESS", "separate")
+    assert load_config(path).global_.api.process == "separate"
+    monkeypatch.setenv("EMS_GLOBAL__STORAGE__TIERED__ENABLED", "true")
+    with pytest.raises(ValidationError, match="storage.tiered"):
+        load_config(path)
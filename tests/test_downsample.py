@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pytest
+from httpx import AsyncClient
+
+from ems.api.app import APIContext, create_app
+from ems.core.health import HealthRegistry
+from ems.store.database import Database
+from ems.store.downsample import M4Reducer, lttb, minmax
+from ems.store.history import HistoryStore
+from ems.utils.config import load_config
+from ems.utils.models import Measurement
+
+CONFIG_PATH = Path(__file__).resolve().parents[1] / "config.yaml"
+
+
+def test_lttb_keeps_endpoints_and_spike():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[437] = 25.0
+    chosen = lttb(x, y, 50)
+    assert len(chosen) == 50
+    assert chosen[0] == 0 and chosen[-1] == 999
+    assert np.all(np.diff(chosen) > 0)
+    assert 437 in chosen
+    assert len(lttb(x[:10], y[:10], 50)) == 10
+
+
+def test_minmax_keeps_extremes_per_bucket():
+    x = np.arange(100, dtype=float)
+    y = np.zeros(100)
+    y[10], y[90] = -5.0, 7.0
+    chosen = minmax(x, y, 10)
+    assert len(chosen) <= 10
+    assert {10, 90} <= set(chosen.tolist())
+    assert np.all(np.diff(chosen) > 0)
+
+
+def test_m4_reducer_keeps_extremes_and_counts():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    stamps = [start + timedelta(seconds=i) for i in range(1000)]
+    values = [0.0] * 1000
+    values[437], values[438] = 25.0, -25.0
+    table = pa.table(
+        {
+            "timestamp_utc": pa.array(stamps, type=pa.timestamp("us", tz="UTC")),
+            "device_id": ["pv"] * 1000,
+            "metric": ["p_w"] * 1000,
+            "value": values,
+        }
+    )
+    reducer = M4Reducer(start, start + timedelta(seconds=1000), 10)
+    first = reducer(table.slice(0, 500))
+    second = reducer(table.slice(500))
+    reduced = pa.concat_tables([first, second])
+    assert reduced.num_rows <= 40
+    kept = reduced.column("value").to_pylist()
+    assert 25.0 in kept and -25.0 in kept
+    assert reduced.column("timestamp_utc")[0].as_py() == stamps[0]
+    assert reduced.column("timestamp_utc")[-1].as_py() == stamps[-1]
+    assert reducer.raw_points == {("pv", "p_w"): 1000}
+
+
+@pytest.mark.asyncio
+async def test_chart_endpoint_returns_fixed_points(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    end = datetime.now(timezone.utc).replace(microsecond=0)
+    await db.insert_measurements(
+        [
+            Measurement(
+                timestamp_utc=end - timedelta(seconds=i),
+                plant_id="plant",
+                device_id=device,
+                metric="AC_P",
+                value=float(i % 17),
+                source="test",
+            )
+            for i in range(1, 2001)
+            for device in ("inv-1", "inv-2")
+        ]
+    )
+    history = HistoryStore(db, tmp_path / "exports")
+    app = create_app(
+        APIContext(
+            config=load_config(CONFIG_PATH),
+            db=db,
+            export_service=None,
+            health=HealthRegistry(),
+            device_status={},
+            allow_control=False,
+            dry_run=True,
+            history=history,
+        )
+    )
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        for method in ("lttb", "minmax"):
+            resp = await client.get(
+                "/chart",
+                params={"metric": "AC_P", "window_s": 3600, "points": 100, "method": method},
+            )
+            assert resp.status_code == 200
+            series = resp.json()["series"]
+            assert [item["device_id"] for item in series] == ["inv-1", "inv-2"]
+            assert all(item["raw_points"] == 2000 for item in series)
+            assert all(len(item["t"]) == len(item["value"]) <= 100 for item in series)
+            assert series[0]["t"] == sorted(series[0]["t"])
+        bad = await client.get("/chart", params={"method": "mean"})
+        assert bad.status_code == 422
+    await db.close()
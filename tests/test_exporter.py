@@ -1,5 +1,8 @@
-from datetime import datetime, timezone
+import gzip
+from datetime import datetime, timedelta, timezone
 
+import httpx
+import orjson
 import pytest
 
 from ems.export.service import ExportService
@@ -34,3 +37,236 @@ async def test_snapshot_payload(tmp_path):
     snapshot = await service.snapshot(window_s=60)
     assert snapshot["devices"]
     await service.close()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_joins_raw_register_blocks(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"), store_raw_registers=True)
+    await db.connect()
+    now = datetime.now(timezone.utc)
+    await db.insert_measurements(
+        [
+            Measurement(
+                timestamp_utc=now,
+                plant_id="plant",
+                device_id="dev",
+                metric=metric,
+                value=1.0,
+                source="test",
+                raw={"registers": registers},
+            )
+            for metric, registers in (("AC_P", [1, 2]), ("AC_Q", [65535]))
+        ]
+    )
+    blocks = await db.raw_register_blocks("dev")
+    assert len(blocks) == 1
+    assert blocks[0].registers() == {"AC_P": [1, 2], "AC_Q": [65535]}
+    export_config = ExportConfig(
+        enable=False,
+        snapshot_url="https://example.com/snapshot",
+        registermap_url="https://example.com/maps",
+        auth_token="token",
+        include_raw_registers=True,
+    )
+    service = ExportService(db, export_config, devices=[])
+    snapshot = await service.snapshot(window_s=60)
+    assert snapshot["devices"][0]["raw"]["AC_Q"] == {"registers": [65535]}
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_register_maps_keep_inline_shape_and_integer_keys(tmp_path):
+    point_map = tmp_path / "map.yaml"
+    point_map.write_text("points:\n  - name: MODE\n    states:\n      0: idle\n      1: running\n")
+    devices = [{"id": f"inv-{i}", "point_map": str(point_map)} for i in range(2)]
+    export_config = ExportConfig(
+        enable=False,
+        snapshot_url="https://example.com/snapshot",
+        registermap_url="https://example.com/maps",
+        auth_token="token",
+    )
+    service = ExportService(Database(str(tmp_path / "db.sqlite")), export_config, devices)
+    inline = service.register_catalog()
+    body = orjson.loads(inline.body)["devices"]
+    assert [device["device_id"] for device in body] == ["inv-0", "inv-1"]
+    assert body[0]["map"]["points"][0]["states"] == {"0": "idle", "1": "running"}
+    assert body[0]["hash"] == body[1]["hash"]
+    assert await service.register_maps() == inline.payload
+
+    dedup = service.register_catalog(dedup=True)
+    assert dedup.etag != inline.etag
+    assert orjson.loads(dedup.body)["maps"] == {body[0]["hash"]: body[0]["map"]}
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_register_map_push_sends_only_changes(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    maps = {}
+    for name in ("a", "b"):
+        maps[name] = tmp_path / f"{name}.yaml"
+        maps[name].write_text(f"points:\n  - name: {name}\n")
+    devices = [{"id": f"inv-{i}", "point_map": str(maps["a"])} for i in range(3)]
+    export_config = ExportConfig(
+        enable=True,
+        snapshot_url="https://example.com/snapshot",
+        registermap_url="https://example.com/maps",
+        auth_token="token",
+    )
+    posted = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        posted.append(orjson.loads(request.content))
+        return httpx.Response(200)
+
+    service = ExportService(
+        db,
+        export_config,
+        devices=devices,
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    catalog = service.register_catalog(dedup=True).payload
+    assert len(catalog["maps"]) == 1
+    assert await service.push_register_maps() == 3
+    assert posted[0]["full"] and len(posted[0]["maps"]) == 1
+    assert await service.push_register_maps() == 0
+    assert len(posted) == 1
+    await service.close()
+
+    # A restart with one device remapped and another decommissioned.
+    devices = [devices[0], {"id": "inv-1", "point_map": str(maps["b"])}]
+    service = ExportService(
+        db,
+        export_config,
+        devices=devices,
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    assert await service.push_register_maps() == 1
+    delta = posted[-1]
+    assert not delta["full"]
+    assert [device["device_id"] for device in delta["devices"]] == ["inv-1"]
+    assert delta["removed"] == ["inv-2"]
+    assert await db.register_map_pushes() == {
+        "inv-0": catalog["devices"][0]["hash"],
+        "inv-1": delta["devices"][0]["hash"],
+    }
+    await service.close()
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_push_sends_deltas_between_keyframes(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    now = datetime.now(timezone.utc)
+
+    def measurement(metric: str, value: float) -> Measurement:
+        return Measurement(
+            timestamp_utc=now,
+            plant_id="plant",
+            device_id="dev",
+            metric=metric,
+            value=value,
+            source="test",
+        )
+
+    await db.insert_measurements([measurement("AC_P", 1.0), measurement("AC_Q", 2.0)])
+    export_config = ExportConfig(
+        enable=True,
+        snapshot_url="https://example.com/snapshot",
+        registermap_url="https://example.com/maps",
+        auth_token="token",
+        snapshot_keyframe_interval_s=3600,
+    )
+    posted = []
+    status = [200]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.headers["content-encoding"] == "gzip"
+        posted.append(orjson.loads(gzip.decompress(request.content)))
+        return httpx.Response(status[0])
+
+    service = ExportService(
+        db,
+        export_config,
+        devices=[],
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    assert await service.push_snapshot() == 2
+    assert posted[0]["keyframe"] and posted[0]["seq"] == 1
+    assert await service.push_snapshot() == 0
+    assert len(posted) == 1
+
+    now += timedelta(seconds=1)
+    await db.insert_measurements([measurement("AC_P", 5.0)])
+    status[0] = 503
+    with pytest.raises(httpx.HTTPStatusError):
+        await service.push_snapshot()
+    status[0] = 200
+    assert await service.push_snapshot() == 1
+    delta = posted[-1]
+    assert not delta["keyframe"] and delta["base_seq"] == 1 and delta["seq"] == 2
+    assert delta["devices"] == [
+        {
+            "device_id": "dev",
+            "metrics": [{"metric": "AC_P", "value": 5.0, "unit": None, "quality": "GOOD"}],
+        }
+    ]
+    assert service.push_stats.keyframes == 1
+    await service.close()
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_push_keeps_quiet_series_next_to_busy_ones(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    now = datetime.now(timezone.utc)
+    busy = [
+        Measurement(
+            timestamp_utc=now - timedelta(milliseconds=i),
+            plant_id="plant",
+            device_id="dev",
+            metric="AC_P",
+            value=float(i),
+            source="test",
+        )
+        for i in range(600)
+    ]
+    quiet = Measurement(
+        timestamp_utc=now - timedelta(seconds=10),
+        plant_id="plant",
+        device_id="dev",
+        metric="E_TOTAL",
+        value=42.0,
+        source="test",
+    )
+    await db.insert_measurements([*busy, quiet])
+    export_config = ExportConfig(
+        enable=True,
+        snapshot_url="https://example.com/snapshot",
+        registermap_url="https://example.com/maps",
+        auth_token="token",
+        snapshot_compression="none",
+        snapshot_keyframe_interval_s=3600,
+    )
+    posted = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        posted.append(orjson.loads(request.content))
+        return httpx.Response(200)
+
+    service = ExportService(
+        db,
+        export_config,
+        devices=[],
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    assert await service.push_snapshot() == 2
+    metrics = {m["metric"]: m["value"] for m in posted[0]["devices"][0]["metrics"]}
+    assert metrics == {"AC_P": 0.0, "E_TOTAL": 42.0}
+    assert await service.push_snapshot() == 0
+    assert len(posted) == 1
+    await service.close()
+    await db.close()
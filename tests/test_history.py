@@ -0,0 +1,98 @@
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from httpx import AsyncClient
+
+from ems.api.app import APIContext, create_app
+from ems.core.health import HealthRegistry
+from ems.store.compaction import ParquetCompactor
+from ems.store.database import Database
+from ems.store.exporter import ParquetExporter
+from ems.store.history import HistoryStore
+from ems.utils.config import load_config
+from ems.utils.models import Measurement
+
+CONFIG_PATH = Path(__file__).resolve().parents[1] / "config.yaml"
+
+
+def _batch(start, count, metric):
+    return [
+        Measurement(
+            timestamp_utc=start + timedelta(minutes=10 * i),
+            plant_id="plant",
+            device_id="inv-1",
+            metric=metric,
+            value=float(i),
+            unit="kW",
+            source="test",
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_history_merges_archive_and_recent_rows(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    start = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    await db.insert_measurements(_batch(start, 288, "AC_P") + _batch(start, 288, "AC_Q"))
+    exporter = ParquetExporter(db, str(tmp_path / "exports"), page_size=100)
+    await exporter.export()
+    await ParquetCompactor(tmp_path / "exports", row_group_size=64).run(today=date(2026, 3, 3))
+    # Newer rows only exist in SQLite until the next export.
+    await db.insert_measurements(_batch(start + timedelta(days=2), 6, "AC_P"))
+
+    history = HistoryStore(db, tmp_path / "exports")
+    end = start + timedelta(days=3)
+    table = await history.query(start, end, metrics=["AC_P"], columns=["timestamp_utc", "value"])
+    assert table.column_names == ["timestamp_utc", "value"]
+    assert table.num_rows == 294
+    timestamps = table.column("timestamp_utc").to_pylist()
+    assert timestamps == sorted(timestamps)
+    # Compacted files are sorted by metric, so AC_Q-only row groups are skipped:
+    # each day has 5 groups of 64 rows and AC_P fills the first 144 rows.
+    assert history.last_row_groups == 6
+
+    # A limited query stops after the first day's partition.
+    first = await history.query(start, end, metrics=["AC_P"], columns=["value"], limit=5)
+    assert first.column_names == ["value"]
+    assert first.column("value").to_pylist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert history.last_row_groups == 3
+
+    hourly = await history.query(start, start + timedelta(hours=2), bucket_s=3600)
+    assert hourly.column("count").to_pylist() == [6, 6, 6, 6]
+    assert hourly.column("avg").to_pylist() == [2.5, 8.5, 2.5, 8.5]
+
+    app = create_app(
+        APIContext(
+            config=load_config(CONFIG_PATH),
+            db=db,
+            export_service=None,
+            health=HealthRegistry(),
+            device_status={},
+            allow_control=False,
+            dry_run=True,
+            history=history,
+        )
+    )
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        resp = await client.get(
+            "/history",
+            params={
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "metric": "AC_P",
+                "columns": "value",
+                "limit": 10,
+            },
+        )
+        bad = await client.get(
+            "/history", params={"start": start.isoformat(), "end": end.isoformat(), "columns": "x"}
+        )
+    body = resp.json()
+    assert resp.status_code == 200
+    assert body["truncated"] is True
+    assert body["columns"]["value"] == [float(i) for i in range(10)]
+    assert bad.status_code == 400
+    await db.close()
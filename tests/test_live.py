@@ -0,0 +1,145 @@
+import asyncio
+from datetime import datetime, timezone
+
+import orjson
+import pytest
+
+from ems.api.ipc import LiveMirror, LiveRelay
+from ems.api.live import LiveHub, sse_events
+from ems.core.health import HealthRegistry
+from ems.core.telemetry import Telemetry
+from ems.store.database import Database
+from ems.store.maintenance import SQLiteMaintenance
+from ems.uplink.publisher import UplinkPublisher
+from ems.utils.config import MaintenanceConfig, UplinkConfig
+from ems.utils.models import Measurement
+
+
+def _measurement(device_id: str, metric: str, value: float) -> Measurement:
+    return Measurement(
+        timestamp_utc=datetime.now(timezone.utc),
+        plant_id="plant",
+        device_id=device_id,
+        metric=metric,
+        value=value,
+        source="test",
+    )
+
+
+@pytest.mark.asyncio
+async def test_hub_filters_and_conflates():
+    hub = LiveHub(max_subscribers=2)
+    hub.publish([_measurement("inv-1", "AC_P", 1.0)])
+    everything = hub.subscribe()
+    inverter_2 = hub.subscribe(device_ids=["inv-2"], metrics=["AC_P"])
+    with pytest.raises(RuntimeError):
+        hub.subscribe()
+    # New subscribers start from the latest known values.
+    assert [item["value"] for item in await everything.next_batch(0.1)] == [1.0]
+    assert await inverter_2.next_batch(0.01) == []
+    for value in (2.0, 3.0, 4.0):
+        hub.publish([_measurement("inv-2", "AC_P", value), _measurement("inv-2", "AC_Q", value)])
+    batch = await inverter_2.next_batch(0.1)
+    assert [(item["metric"], item["value"]) for item in batch] == [("AC_P", 4.0)]
+    assert inverter_2.conflated == 2
+    assert len(await everything.next_batch(0.1)) == 2
+
+
+@pytest.mark.asyncio
+async def test_sse_events_stream_and_unsubscribe():
+    hub = LiveHub()
+    events = sse_events(hub, device_ids=["inv-1"], min_interval_s=0, keepalive_s=0.01)
+    # Nothing is held until the body is iterated.
+    assert hub.subscribers == 0
+    assert await anext(events) == b"retry: 5000\n\n"
+    assert await anext(events) == b": keepalive\n\n"
+    hub.publish([_measurement("inv-1", "AC_P", 5.0)])
+    frame = await anext(events)
+    header, data = frame.split(b"\ndata: ")
+    assert header == b"event: measurements"
+    assert orjson.loads(data)[0]["value"] == 5.0
+    await events.aclose()
+    assert hub.subscribers == 0
+
+
+@pytest.mark.asyncio
+async def test_relay_mirrors_poller_state_into_api_process(tmp_path):
+    writer = Database(str(tmp_path / "db.sqlite"))
+    await writer.connect()
+    await writer.write_measurements([_measurement("inv-1", "AC_P", 1.0)])
+    reader = Database(str(tmp_path / "db.sqlite"), read_only=True)
+    await reader.connect()
+    assert len(await reader.latest_measurements()) == 1
+
+    hub, telemetry, health = LiveHub(), Telemetry(), HealthRegistry()
+    health.update("poll-inv-1", healthy=True, message="ok")
+    telemetry.record_poll("inv-1", 0.05, [_measurement("inv-1", "AC_P", 1.0)])
+    device_status = {"inv-1": {"device_id": "inv-1", "healthy": True}}
+    maintenance = SQLiteMaintenance(writer, MaintenanceConfig())
+    maintenance.stats.freelist_pages = 12
+    maintenance.stats.durations["analyze"] = 0.5
+    uplink = UplinkPublisher(writer, UplinkConfig(url="https://uplink.example.com", api_key="key"))
+    uplink.stats.backlog_rows = 3
+    relay = LiveRelay(
+        str(tmp_path / "live.sock"),
+        hub,
+        telemetry,
+        health,
+        device_status,
+        writer,
+        maintenance=maintenance,
+        uplink=uplink,
+        state_interval_s=0.05,
+    )
+    await relay.start()
+    mirror_hub, mirror_telemetry, mirror_health = LiveHub(), Telemetry(), HealthRegistry()
+    mirror_status: dict = {}
+    mirror = LiveMirror(
+        str(relay.path),
+        mirror_hub,
+        mirror_telemetry,
+        mirror_health,
+        mirror_status,
+        reader,
+        reconnect_s=0.05,
+    )
+    mirror.start()
+    try:
+        subscription = mirror_hub.subscribe()
+        hub.publish([_measurement("inv-1", "AC_P", 7.0)])
+        for _ in range(50):
+            batch = await subscription.next_batch(0.1)
+            if batch and batch[-1]["value"] == 7.0:
+                break
+        else:
+            pytest.fail("relayed value never arrived")
+        assert mirror_status == device_status
+        assert mirror_telemetry.devices["inv-1"].points_read == 1
+        assert reader.write_stats.rows == 1
+        assert reader.data_version == writer.data_version
+        assert mirror_health.as_dict()["live_ipc"]["healthy"]
+        assert mirror_health.as_dict()["poll-inv-1"]["message"] == "ok"
+        assert mirror.maintenance.wal_bytes() == maintenance.wal_bytes() > 0
+        assert mirror.maintenance.stats.freelist_pages == 12
+        assert mirror.maintenance.stats.durations == {"analyze": 0.5}
+        assert mirror.uplink.stats.backlog_rows == 3
+        with pytest.raises(Exception):
+            await reader.write_measurements([_measurement("inv-1", "AC_P", 2.0)])
+
+        # The mirror reconnects when the poller side restarts.
+        await relay.close()
+        await asyncio.sleep(0.1)
+        assert not mirror.connected
+        assert not mirror_health.as_dict()["live_ipc"]["healthy"]
+        await relay.start()
+        for _ in range(50):
+            if mirror.connected:
+                break
+            await asyncio.sleep(0.05)
+        assert mirror.connected
+    finally:
+        await mirror.stop()
+        await relay.close()
+        await uplink.close()
+        await reader.close()
+        await writer.close()
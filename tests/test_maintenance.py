@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ems.store.database import Database
+from ems.store.maintenance import AUTO_VACUUM_INCREMENTAL, SQLiteMaintenance
+from ems.utils.config import MaintenanceConfig
+from ems.utils.models import Measurement
+
+
+@pytest.mark.asyncio
+async def test_maintenance_checkpoints_and_reclaims_pages(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    old = datetime.now(timezone.utc) - timedelta(days=60)
+    await db.insert_measurements(
+        [
+            Measurement(
+                timestamp_utc=old,
+                plant_id="plant",
+                device_id="dev",
+                metric=f"METRIC_{i}",
+                value=float(i),
+                unit="kW",
+                source="x" * 60,
+            )
+            for i in range(5000)
+        ]
+    )
+    await db.purge_old_measurements(retention_days=30)
+    config = MaintenanceConfig(
+        wal_passive_mb=0, wal_truncate_mb=1000, low_load_hours=[3], vacuum_min_free_pages=1
+    )
+    maintenance = SQLiteMaintenance(db, config)
+
+    busy_hour = await maintenance.run(now=datetime(2026, 1, 1, 12, tzinfo=timezone.utc))
+    assert "checkpoint_passive" in busy_hour.runs
+    assert "incremental_vacuum" not in busy_hour.runs
+    assert busy_hour.auto_vacuum == AUTO_VACUUM_INCREMENTAL
+    free_before = busy_hour.freelist_pages
+    assert free_before > 0
+
+    quiet_hour = await maintenance.run(now=datetime(2026, 1, 1, 3, tzinfo=timezone.utc))
+    assert {"checkpoint_truncate", "incremental_vacuum", "analyze"} <= set(quiet_hour.runs)
+    assert quiet_hour.freelist_pages < free_before
+    assert quiet_hour.wal_bytes == 0
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_page_stats_work_on_read_only_database(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    reader = Database(str(tmp_path / "db.sqlite"), read_only=True)
+    await reader.connect()
+    assert await reader.page_stats() == await db.page_stats()
+    await reader.close()
+    await db.close()
+
+
+def test_low_load_hours_follow_plant_timezone(tmp_path):
+    config = MaintenanceConfig(low_load_hours=[3])
+    db = Database(str(tmp_path / "db.sqlite"))
+    maintenance = SQLiteMaintenance(db, config, tz="Europe/Berlin")
+    # 03:00 in Berlin is 02:00 UTC in winter and 01:00 UTC in summer.
+    assert maintenance.in_low_load_window(datetime(2026, 1, 15, 2, tzinfo=timezone.utc))
+    assert not maintenance.in_low_load_window(datetime(2026, 1, 15, 3, tzinfo=timezone.utc))
+    assert maintenance.in_low_load_window(datetime(2026, 7, 15, 1, tzinfo=timezone.utc))
@@ -0,0 +1,120 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pyarrow.dataset as ds
+import pytest
+
+from ems.core.executor import WorkerPool
+from ems.store.database import Database
+from ems.store.exporter import WATERMARK, ParquetExporter
+from ems.utils.models import Measurement
+
+
+def _batch(start, count, device_id):
+    return [
+        Measurement(
+            timestamp_utc=start + timedelta(seconds=30 * i),
+            plant_id="plant",
+            device_id=device_id,
+            metric="AC_P",
+            value=float(i),
+            unit="kW",
+            source="test",
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_pool", [False, True])
+async def test_parquet_export_is_exactly_once_and_partitioned(tmp_path, use_pool):
+    pool = WorkerPool(max_workers=1) if use_pool else None
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    start = datetime(2026, 3, 1, 23, 0, tzinfo=timezone.utc)
+    await db.insert_measurements(_batch(start, 1200, "inv-1") + _batch(start, 300, "inv-2"))
+    exporter = ParquetExporter(db, str(tmp_path / "exports"), page_size=256, pool=pool)
+    first = await exporter.export()
+    assert {p.parent.parent.name for p in first} == {"date=2026-03-01", "date=2026-03-02"}
+    assert await exporter.export() == []
+
+    await db.insert_measurements(_batch(start + timedelta(days=1), 10, "inv-2"))
+    assert len(await exporter.export()) == 1
+
+    dataset = ds.dataset(tmp_path / "exports", format="parquet", partitioning="hive")
+    table = dataset.to_table()
+    assert table.num_rows == 1510
+    assert len(set(table.column("id").to_pylist())) == 1510
+    inv2 = dataset.to_table(filter=ds.field("device_id") == "inv-2")
+    assert inv2.num_rows == 310
+    if pool is not None:
+        assert pool.stats.completed > 0 and pool.stats.in_flight == 0
+        pool.shutdown()
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_parquet_export_closes_past_days_and_keeps_late_rows(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    start = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+    for day in range(3):
+        await db.insert_measurements(_batch(start + timedelta(days=day), 100, "inv-1"))
+    # A late row for the first day arrives after the stream has moved on.
+    await db.insert_measurements(_batch(start + timedelta(hours=1), 1, "inv-1"))
+    exporter = ParquetExporter(db, str(tmp_path / "exports"), page_size=64)
+    paths = await exporter.export()
+    first_day = sorted(p.name for p in paths if p.parent.parent.name == "date=2026-03-01")
+    assert first_day == ["part-000000000001.parquet", "part-000000000301.parquet"]
+    table = ds.dataset(tmp_path / "exports", format="parquet", partitioning="hive").to_table()
+    assert table.num_rows == 301
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_measurement_ids_are_not_reused_after_delete(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    start = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    await db.insert_measurements(_batch(start, 10, "inv-1"))
+    exporter = ParquetExporter(db, str(tmp_path / "exports"))
+    await exporter.export()
+    await db.purge_old_measurements(retention_days=1)
+    await db.insert_measurements(_batch(start + timedelta(days=2), 5, "inv-1"))
+    assert await db.max_measurement_id() == 15
+    assert len(await exporter.export()) == 1
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_connect_rebuilds_measurements_without_autoincrement(tmp_path):
+    path = tmp_path / "db.sqlite"
+    db = Database(str(path))
+    await db.connect()
+    start = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    await db.insert_measurements(_batch(start, 3, "inv-1"))
+    await db.set_watermark(WATERMARK, 3)
+    await db.close()
+    # Recreate the table the way databases from before AUTOINCREMENT were laid out.
+    with sqlite3.connect(path) as conn:
+        (sql,) = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'measurements'"
+        ).fetchone()
+        conn.execute("ALTER TABLE measurements RENAME TO old")
+        for (index,) in conn.execute("SELECT name FROM pragma_index_list('old')").fetchall():
+            conn.execute(f"DROP INDEX {index}")
+        conn.execute(sql.replace("AUTOINCREMENT", ""))
+        conn.execute("INSERT INTO measurements SELECT * FROM old")
+        conn.execute("DROP TABLE old")
+        conn.execute("DELETE FROM measurements WHERE id = 3")
+
+    await db.connect()
+    await db.insert_measurements(_batch(start + timedelta(hours=1), 1, "inv-1"))
+    rows = [row for page in [p async for p in db.iter_measurements()] for row in page]
+    assert [row.id for row in rows] == [1, 2, 4]
+    await db.close()
+    with sqlite3.connect(path) as conn:
+        (sql,) = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'measurements'"
+        ).fetchone()
+    assert "AUTOINCREMENT" in sql
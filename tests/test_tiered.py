@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ems.core.executor import WorkerPool
+from ems.store.database import BUFFERED_ID, Database
+from ems.store.tiered import WriteBuffer
+from ems.utils.models import Measurement
+
+
+def _measurement(metric: str, value: float) -> Measurement:
+    return Measurement(
+        timestamp_utc=datetime.now(timezone.utc),
+        plant_id="plant",
+        device_id="dev",
+        metric=metric,
+        value=value,
+        source="test",
+    )
+
+
+@pytest.mark.asyncio
+async def test_write_buffer_batches_commits_and_replays_journal(tmp_path):
+    journal = tmp_path / "tmpfs" / "measurements.journal"
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    buffer = WriteBuffer(db, max_buffer_kb=1024, journal_path=str(journal))
+    db.use_write_buffer(buffer)
+    for i in range(5):
+        await db.insert_measurements([_measurement("AC_P", float(i))])
+    # Buffered rows are visible to API reads before they reach SQLite.
+    assert len(await db.measurements_for_device("dev")) == 5
+    pages = [page async for page in db.iter_measurements()]
+    assert [row.id for row in pages[0]] == [BUFFERED_ID] * 5
+    assert await buffer.flush() == 5
+    assert buffer.stats.write_reduction == 5.0
+    assert not journal.exists()
+
+    # Simulate a crash: journal written, process gone before the flush.
+    await db.insert_measurements([_measurement("AC_Q", 1.0)])
+    with journal.open("ab") as fh:
+        fh.write(b'{"torn": ')
+    restarted = WriteBuffer(db, journal_path=str(journal))
+    assert await restarted.recover() == 1
+    stored = [row for page in [p async for p in db.iter_measurements()] for row in page]
+    assert [row.metric for row in stored] == ["AC_P"] * 5 + ["AC_Q"]
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_write_buffer_flush_is_visible_and_replay_idempotent(tmp_path):
+    journal = tmp_path / "tmpfs" / "measurements.journal"
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    buffer = WriteBuffer(db, journal_path=str(journal))
+    db.use_write_buffer(buffer)
+    await db.insert_measurements([_measurement("AC_P", 1.0), _measurement("AC_Q", 2.0)])
+    write_measurements = db.write_measurements
+    left_behind = {}
+
+    async def commit_then_crash(measurements, watermark=None):
+        # Rows stay readable while the commit is in flight.
+        assert len(await db.latest_measurements()) == 2
+        await write_measurements(measurements, watermark=watermark)
+        # Keep the rotated journal as if the process died before unlinking it.
+        for path in journal.parent.glob("*.flushing.*"):
+            left_behind[path] = path.read_bytes()
+
+    db.write_measurements = commit_then_crash
+    assert await buffer.flush() == 2
+    del db.write_measurements
+    for path, data in left_behind.items():
+        path.write_bytes(data)
+    assert left_behind
+
+    restarted = WriteBuffer(db, journal_path=str(journal))
+    assert await restarted.recover() == 0
+    assert not list(journal.parent.iterdir())
+    stored = [row for page in [p async for p in db.iter_measurements()] for row in page]
+    assert len(stored) == 2
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_buffered_rows_merge_into_scans_and_aggregates(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    pool = WorkerPool(max_workers=1)
+    buffer = WriteBuffer(db, journal_path=str(tmp_path / "journal"), pool=pool)
+    db.use_write_buffer(buffer)
+    since = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    samples = [
+        _measurement(metric, value).model_copy(
+            update={"timestamp_utc": since + timedelta(seconds=value)}
+        )
+        for metric, value in [("AC_P", 1.0), ("AC_Q", 2.0), ("AC_P", 3.0), ("AC_Q", 4.0)]
+    ]
+    await db.insert_measurements(samples[:2])
+    await buffer.flush()
+    # Two buffered rows share a timestamp, so a page boundary falls between equal keys.
+    late = _measurement("AC_P", 5.0).model_copy(update={"timestamp_utc": samples[3].timestamp_utc})
+    await db.insert_measurements([*samples[2:], late])
+
+    # A cursor that lands on a buffered row resumes without gaps or repeats.
+    pages = [page async for page in db.iter_measurements(since=since, page_size=2)]
+    assert [row.value for page in pages for row in page] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    streamed = [row async for page in db.stream_measurements(since=since) for row in page]
+    assert [row.value for row in streamed] == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+    aggregates = [
+        row async for row in db.iter_window_aggregates(since, since + timedelta(hours=1), 3600)
+    ]
+    by_metric = {row.metric: row for row in aggregates}
+    assert by_metric["AC_P"].count == 3 and by_metric["AC_P"].last == 5.0
+    assert by_metric["AC_P"].min == 1.0 and by_metric["AC_P"].avg == 3.0
+    assert by_metric["AC_Q"].count == 2
+    assert buffer.stats.flushes == 1
+    pool.shutdown()
+    await db.close()
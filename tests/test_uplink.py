@@ -0,0 +1,334 @@
+import gzip
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import orjson
+import pyarrow as pa
+import pytest
+from support.ingest_standin import IngestStandIn
+
+from ems.store.database import Database
+from ems.uplink.backlog import merge_windows
+from ems.uplink.encoding import decode_body, encode_body, pack_batches
+from ems.uplink.publisher import UplinkPublisher
+from ems.utils.config import UplinkConfig
+from ems.utils.models import Measurement, Quality
+
+
+def _sample(ts, metric, value, quality=Quality.GOOD, device_id="inv-1"):
+    return Measurement(
+        timestamp_utc=ts,
+        plant_id="plant",
+        device_id=device_id,
+        metric=metric,
+        value=value,
+        unit="kW",
+        quality=quality,
+        source="test",
+    )
+
+
+@pytest.mark.asyncio
+async def test_uplink_payload_is_aggregated_per_minute(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    start = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+    samples = [_sample(start + timedelta(seconds=5 * i), "AC_P", float(i)) for i in range(24)]
+    samples.append(_sample(start + timedelta(seconds=10), "AC_P", 50.0, Quality.UNCERTAIN))
+    samples += [
+        _sample(start + timedelta(milliseconds=400 * i), "AC_P", 1.0, device_id="inv-2")
+        for i in range(700)
+    ]
+    await db.insert_measurements(samples)
+    publisher = UplinkPublisher(db, UplinkConfig(url="https://uplink.example.com", api_key="key"))
+    header, series = await publisher._build_payload(start, start + timedelta(minutes=5))
+    await publisher.close()
+
+    assert header["quality_levels"] == ["GOOD", "UNCERTAIN", "BAD"]
+    inv1, inv2 = series
+    assert inv1["t"] == [0, 60]
+    assert inv1["avg"][0] == pytest.approx((sum(range(12)) + 50.0) / 13)
+    assert (inv1["min"][0], inv1["max"][0], inv1["last"], inv1["count"]) == (
+        0.0,
+        50.0,
+        [11.0, 23.0],
+        [13, 12],
+    )
+    assert inv1["quality"] == [1, 0]
+    # 700 raw samples collapse into five minute buckets instead of being truncated.
+    assert sum(inv2["count"]) == 700
+    assert len(inv2["t"]) == 5
+    await db.close()
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_pack_batches_respects_max_size(compression):
+    header = {"plant_id": "plant", "ts_start": "2026-03-01T12:00:00+00:00"}
+    series = [
+        {
+            "device_id": f"inv-{d}",
+            "metric": f"M{m}",
+            "unit": "kW",
+            "t": list(range(0, 300, 60)),
+            "avg": [d * 1.37 + m * i for i in range(5)],
+            "quality": [0] * 5,
+        }
+        for d in range(20)
+        for m in range(30)
+    ]
+    batches = pack_batches(header, series, 4096, "json", compression)
+    assert len(batches) > 1
+    assert all(len(body) <= 4096 for _, body, _ in batches)
+    assert [part["part"] for part, _, _ in batches] == list(range(len(batches)))
+    decoded = []
+    for _, body, raw_size in batches:
+        raw = (
+            gzip.decompress(body)
+            if compression == "gzip"
+            else pa.decompress(body, decompressed_size=raw_size, codec="zstd", asbytes=True)
+        )
+        decoded.extend(orjson.loads(raw)["series"])
+    assert decoded == series
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_decode_body_streams_frames_and_enforces_limit(compression):
+    payload = {"series": [{"t": list(range(1000))}]}
+    raw = orjson.dumps(payload)
+    # A streaming writer leaves the content size out of the zstd frame header.
+    sink = pa.BufferOutputStream()
+    with pa.CompressedOutputStream(sink, compression) as stream:
+        stream.write(raw)
+    body = sink.getvalue().to_pybytes()
+    assert decode_body(body, "application/json", compression) == payload
+    assert decode_body(body, "application/json", compression, len(raw)) == payload
+    with pytest.raises(ValueError):
+        decode_body(body, "application/json", compression, max_output_size=len(raw) - 1)
+
+
+@pytest.mark.asyncio
+async def test_publish_window_posts_compressed_bodies(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    await db.insert_measurements(
+        [_sample(now - timedelta(seconds=10 * i), f"M{i % 7}", float(i)) for i in range(1, 30)]
+    )
+    ingest = IngestStandIn()
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=ingest))
+    publisher = UplinkPublisher(
+        db,
+        UplinkConfig(url="https://uplink.example.com", api_key="key", max_batch_kb=1),
+        client=client,
+    )
+    await publisher.publish_window()
+    await publisher.close()
+    assert publisher.stats.backlog_rows == publisher.stats.backlog_bytes == 0
+
+    series = [s for batch in ingest.stats.batches for s in batch["series"]]
+    assert {s["metric"] for s in series} == {f"M{i}" for i in range(7)}
+    assert publisher.stats.bytes_sent == ingest.stats.bytes_received
+    assert publisher.stats.compression_ratio > 1
+    assert await db.pending_uplink() == []
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_backlog_drains_concurrently_with_bulk_acks(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    start = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    for i in range(120):
+        body, _ = encode_body({"window": i, "series": []}, "json", "gzip")
+        await db.enqueue_uplink(
+            {"window": i},
+            start + timedelta(minutes=5 * i),
+            start + timedelta(minutes=5 * (i + 1)),
+            body=body,
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+    ingest = IngestStandIn(latency_s=0.01, failure_rate=0.1, seed=7)
+    config = UplinkConfig(
+        url="https://uplink.example.com",
+        api_key="key",
+        max_in_flight=8,
+        drain_page_size=40,
+        backoff_initial_s=0,
+    )
+    publisher = UplinkPublisher(
+        db, config, client=httpx.AsyncClient(transport=httpx.ASGITransport(app=ingest))
+    )
+    attempts = 0
+    while pending := await db.pending_uplink():
+        assert publisher.stats.backlog_rows == (len(pending) if attempts else 0)
+        attempts += 1
+        await publisher.flush()
+        assert attempts < 50
+    assert publisher.stats.backlog_rows == publisher.stats.backlog_bytes == 0
+    await publisher.close()
+
+    assert attempts > 1
+    assert publisher.stats.failed_posts == ingest.stats.rejected > 0
+    assert sorted(batch["window"] for batch in ingest.stats.batches) == list(range(120))
+    assert 1 < ingest.stats.max_concurrent <= 8
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_drain_backs_off(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    now = datetime.now(timezone.utc)
+    await db.enqueue_uplink({"window": 0}, now, now)
+    ingest = IngestStandIn(failure_rate=1.0)
+    publisher = UplinkPublisher(
+        db,
+        UplinkConfig(url="https://uplink.example.com", api_key="key", backoff_initial_s=30),
+        client=httpx.AsyncClient(transport=httpx.ASGITransport(app=ingest)),
+    )
+    assert await publisher.flush() == 0
+    assert publisher.stats.backlog_rows == 1
+    assert 15 <= publisher.stats.backoff_s <= 30
+    assert await publisher.flush() == 0
+    assert ingest.stats.requests == 1
+    await publisher.close()
+    await db.close()
+
+
+async def _queue_windows(db, start, count, max_bytes=65536):
+    for i in range(count):
+        ts_start = start + timedelta(minutes=5 * i)
+        header = {
+            "plant_id": "plant",
+            "ts_start": ts_start.isoformat(),
+            "ts_end": (ts_start + timedelta(minutes=5)).isoformat(),
+            "sample_period_s": 60,
+            "quality_levels": ["GOOD", "UNCERTAIN", "BAD"],
+        }
+        series = [
+            {
+                "device_id": "inv-1",
+                "metric": metric,
+                "unit": "kW",
+                "t": [0, 60, 120, 180, 240],
+                "quality": [0, 0, 0, 0, 2],
+                "avg": [1.0, 2.0, 3.0, 4.0, 5.0],
+                "min": [0.0] * 5,
+                "max": [9.0] * 5,
+                "last": [1.0, 2.0, 3.0, 4.0, 5.0],
+                "count": [12] * 5,
+            }
+            for metric in ("AC_P", "AC_Q")
+        ]
+        for part, body, _ in pack_batches(header, series, max_bytes, "json", "gzip"):
+            await db.enqueue_uplink(
+                part,
+                ts_start,
+                ts_start + timedelta(minutes=5),
+                body=body,
+                headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+            )
+
+
+@pytest.mark.asyncio
+async def test_backlog_compaction_merges_and_downsamples(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    now = datetime(2026, 3, 10, tzinfo=timezone.utc)
+    await _queue_windows(db, now - timedelta(days=2), 36)
+    await _queue_windows(db, now - timedelta(hours=2), 12)
+    config = UplinkConfig(url="https://uplink.example.com", api_key="key", max_batch_kb=4)
+    ingest = IngestStandIn()
+    publisher = UplinkPublisher(
+        db, config, client=httpx.AsyncClient(transport=httpx.ASGITransport(app=ingest))
+    )
+    assert await publisher.compact_backlog(now=now) == 48
+    rows, _, _ = await db.uplink_backlog()
+    assert rows == 2
+    assert await publisher.flush() == 2
+    await publisher.close()
+
+    old, recent = ingest.stats.batches
+    assert (old["sample_period_s"], old["merged_windows"]) == (900, 36)
+    assert (recent["sample_period_s"], recent["merged_windows"]) == (60, 12)
+    for batch, windows in ((old, 36), (recent, 12)):
+        for series in batch["series"]:
+            assert sum(series["count"]) == windows * 60
+            assert set(series["quality"]) == {0, 2} or set(series["quality"]) == {2}
+    assert old["series"][0]["t"][:2] == [0, 900]
+    assert old["series"][0]["avg"][0] == pytest.approx(3.0)
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_backlog_compaction_as_windows_age(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    now = datetime(2026, 3, 10, tzinfo=timezone.utc)
+    await _queue_windows(db, now - timedelta(days=2), 36)
+    # Not aligned to the 900 s grid, so buckets straddle window boundaries.
+    await _queue_windows(db, now - timedelta(minutes=115), 12)
+    config = UplinkConfig(url="https://uplink.example.com", api_key="key", max_batch_kb=64)
+    ingest = IngestStandIn()
+    publisher = UplinkPublisher(
+        db, config, client=httpx.AsyncClient(transport=httpx.ASGITransport(app=ingest))
+    )
+    assert await publisher.compact_backlog(now=now) == 48
+    assert (await db.uplink_backlog())[0] == 2
+    # A day later the recent windows are old too and merge with the downsampled batch.
+    assert await publisher.compact_backlog(now=now + timedelta(days=1)) == 2
+    assert (await db.uplink_backlog())[0] == 1
+    assert await publisher.flush() == 1
+    await publisher.close()
+
+    (batch,) = ingest.stats.batches
+    assert (batch["sample_period_s"], batch["merged_windows"]) == (900, 48)
+    origin = int(datetime.fromisoformat(batch["ts_start"]).timestamp())
+    assert origin == int((now - timedelta(days=2)).timestamp())
+    for series in batch["series"]:
+        assert series["t"] == sorted(set(series["t"]))
+        assert all((origin + offset) % 900 == 0 for offset in series["t"])
+        assert sum(series["count"]) == 48 * 60
+    await db.close()
+
+
+def test_merge_windows_refuses_mixed_periods():
+    def window(period):
+        header = {
+            "plant_id": "plant",
+            "ts_start": "2026-03-10T00:00:00+00:00",
+            "ts_end": "2026-03-10T00:15:00+00:00",
+            "sample_period_s": period,
+            "quality_levels": ["GOOD", "UNCERTAIN", "BAD"],
+        }
+        ((_, body, _),) = pack_batches(header, [], 1 << 20, "json", "gzip")
+        return body, "application/json", "gzip"
+
+    with pytest.raises(ValueError):
+        merge_windows([window(900), window(60)], 1 << 20, "json", "gzip")
+    merged = merge_windows([window(900), window(60)], 1 << 20, "json", "gzip", 900)
+    assert merged[0][0]["sample_period_s"] == 900
+
+
+@pytest.mark.asyncio
+async def test_backlog_budget_drops_oldest(tmp_path):
+    db = Database(str(tmp_path / "db.sqlite"))
+    await db.connect()
+    start = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    await _queue_windows(db, start, 10, max_bytes=256)
+    budget = 1000
+    config = UplinkConfig(
+        url="https://uplink.example.com",
+        api_key="key",
+        max_batch_kb=1,
+        backlog_downsample_after_h=None,
+        backlog_max_mb=budget / 1024 / 1024,
+    )
+    publisher = UplinkPublisher(db, config)
+    await publisher.compact_backlog(now=start)
+    await publisher.close()
+    pending = await db.pending_uplink()
+    assert publisher.stats.dropped_batches > 0
+    assert 0 < publisher.stats.backlog_bytes <= budget
+    assert pending[-1].ts_end.replace(tzinfo=timezone.utc) == start + timedelta(minutes=50)
+    await db.close()